@@ -6,12 +6,15 @@ from contextlib import asynccontextmanager
 from typing import List, Optional, Any, Callable, Awaitable
 # --- FINE MODIFICA ---
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
 
+from app.compaction import MemoryCompactor
 from app.llm import LLM
 from app.logger import logger
 from app.sandbox.client import SANDBOX_CLIENT
 from app.schema import ROLE_TYPE, AgentState, Memory, Message
+from app.token_ledger import usage_scope
+from app.tracing import traced_callback, tracer
 from app.utils.scratchpad import Scratchpad
 
 
@@ -56,10 +59,18 @@ class BaseAgent(BaseModel, ABC):
     # --- FINE MODIFICA ---
 
 
+    _memory_compactor: Optional[MemoryCompactor] = PrivateAttr(default=None)
+
     class Config:
         arbitrary_types_allowed = True
         extra = "allow"  # Allow extra fields for flexibility in subclasses
 
+    @field_validator("callback_handler")
+    @classmethod
+    def trace_callback_handler(cls, handler):
+        """Record every send to the frontend as a tracing span."""
+        return traced_callback(handler)
+
     @model_validator(mode="after")
     def initialize_agent(self) -> "BaseAgent":
         """Initialize agent with default settings if not provided."""
@@ -108,6 +119,13 @@ class BaseAgent(BaseModel, ABC):
 
     async def run(self, request: Optional[str] = None, scratchpad: Optional[Scratchpad] = None) -> str:
         """Execute the agent's main loop asynchronously."""
+        with usage_scope(agent=self.name), tracer.span("agent.run", agent=self.name) as span:
+            result = await self._run(request, scratchpad)
+            if span:
+                span.set(steps=self.current_step, state=str(self.state.value))
+            return result
+
+    async def _run(self, request: Optional[str], scratchpad: Optional[Scratchpad]) -> str:
         if self.state not in [AgentState.IDLE, AgentState.AWAITING_USER_INPUT]:
             raise RuntimeError(f"Cannot run agent from state: {self.state}")
 
@@ -127,13 +145,17 @@ class BaseAgent(BaseModel, ABC):
                 if self.callback_handler:
                     await self.callback_handler("thought", f"Inizio lo step {self.current_step}: sto decidendo la prossima azione...")
 
-                step_result = await self.step()
+                with tracer.span("agent.step", agent=self.name, step=self.current_step):
+                    await self.compact_memory()
+                    step_result = await self.step()
 
                 # --- INIZIO BLOCCO MODIFICATO ---
                 # Dobbiamo gestire correttamente l'oggetto ToolResult restituito dal passo.
                 # Se c'è un output, lo aggiungiamo alla nostra lista di risultati.
-                if step_result and step_result.output:
-                    final_answers.append(str(step_result.output))
+                # ReActAgent.step restituisce una stringa anziché un ToolResult.
+                step_output = getattr(step_result, "output", step_result)
+                if step_output:
+                    final_answers.append(str(step_output))
                 # --- FINE BLOCCO MODIFICATO ---
 
                 if hasattr(step_result, "system") and step_result.system == "AWAITING_USER_INPUT":
@@ -157,6 +179,41 @@ class BaseAgent(BaseModel, ABC):
         # Restituisce l'ultimo output valido, o un messaggio di completamento se non è stato generato un output specifico.
         return final_answers[-1] if final_answers else "Compito completato."
 
+    def close_pending_tool_calls(self, content: str) -> int:
+        """
+        Answer the tool calls of the last assistant message that have no result yet,
+        e.g. after the run was cancelled, so that the history stays a valid request.
+
+        Returns:
+            The number of tool messages added
+        """
+        answered = set()
+        for message in reversed(self.memory.messages):
+            if message.role == "tool":
+                answered.add(message.tool_call_id)
+            elif message.role == "assistant":
+                pending = [
+                    call for call in message.tool_calls or [] if call.id not in answered
+                ]
+                for call in pending:
+                    self.update_memory(
+                        "tool", content, tool_call_id=call.id, name=call.function.name
+                    )
+                return len(pending)
+        return 0
+
+    async def compact_memory(self) -> None:
+        """Keep the memory under the token budget of the agent's model."""
+        if self._memory_compactor is None or self._memory_compactor.llm is not self.llm:
+            self._memory_compactor = MemoryCompactor(self.llm)
+        await self._memory_compactor.compact(
+            self.memory, reserved_tokens=self.prompt_overhead_tokens()
+        )
+
+    def prompt_overhead_tokens(self) -> int:
+        """Tokens sent with every request besides the memory (system prompt, tool schemas)."""
+        return 0
+
     @abstractmethod
     async def step(self) -> Any:
         """Execute a single step in the agent's workflow."""
@@ -1,8 +1,9 @@
+import asyncio
 import os
 import json
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
-from pydantic import Field, model_validator
+from pydantic import Field, PrivateAttr, model_validator
 
 from app.agent.browser import BrowserContextHelper
 from app.agent.toolcall import ToolCallAgent
@@ -15,6 +16,8 @@ from app.tool.idle import IdleTool
 from app.utils.tool_loader import load_tools_from_directory
 from app.tool.base import ToolResult
 from app.schema import ToolCall
+from app.tool.scheduler import ToolCallScheduler
+from app.tracing import traced_callback
 
 
 TOOL_DIR = PROJECT_ROOT / "app" / "tool"
@@ -45,6 +48,7 @@ class Manus(ToolCallAgent):
 
     connected_servers: Dict[str, str] = Field(default_factory=dict)
     _initialized: bool = False
+    _streamed_executions: Optional[ToolCallScheduler] = PrivateAttr(default=None)
 
     @model_validator(mode="after")
     def initialize_helper(self) -> "Manus":
@@ -57,14 +61,26 @@ class Manus(ToolCallAgent):
 
         return self
 
+    def bind_callback_handler(self, handler: Callable[[str, Any], Awaitable[None]]) -> None:
+        """Attach the frontend callback to an agent created without one, e.g. pre-warmed."""
+        self.callback_handler = traced_callback(handler)
+        for tool in self.available_tools.tools:
+            tool.callback_handler = self.callback_handler
+
     # --- INIZIO BLOCCO MODIFICATO ---
     async def step(self) -> ToolResult:
         """
         Executes one step of the agent's thinking and action loop,
         adding communication for thoughts.
         """
-        should_continue = await self.think()
+        self._streamed_executions = None
+        try:
+            should_continue = await self.think()
+        except BaseException:
+            self._cancel_streamed_executions()
+            raise
         if not should_continue:
+            self._cancel_streamed_executions()
             last_message = self.memory.messages[-1]
             if self.callback_handler and last_message.content:
                 await self.callback_handler("summary", content=last_message.content)
@@ -77,7 +93,12 @@ class Manus(ToolCallAgent):
         if thought and self.callback_handler:
             await self.callback_handler("thought", content=thought)
 
-        results = await self.execute_tool_calls(tool_calls)
+        if self._streamed_executions:
+            # Tool calls already started executing while the response was streaming
+            results = await self._streamed_executions.gather()
+            self._streamed_executions = None
+        else:
+            results = await self.execute_tool_calls(tool_calls)
 
         for res in results:
             # CORREZIONE: Passa la rappresentazione stringa del risultato completo,
@@ -88,51 +109,77 @@ class Manus(ToolCallAgent):
         return sum(results, ToolResult())
     # --- FINE BLOCCO MODIFICATO ---
 
+    async def _on_tool_call_ready(self, tool_call: ToolCall) -> None:
+        """Start executing a streamed tool call while the rest of the response arrives.
+
+        The call only waits for the previous calls it conflicts with.
+        """
+        if self._streamed_executions is None:
+            self._streamed_executions = self._new_tool_scheduler()
+        self._submit_tool_call(self._streamed_executions, tool_call)
+
+    def _cancel_streamed_executions(self) -> None:
+        """Cancel tool calls started from a stream that did not complete."""
+        if self._streamed_executions:
+            self._streamed_executions.cancel()
+        self._streamed_executions = None
+
     async def execute_tool_calls(self, tool_calls: List[ToolCall]) -> List[ToolResult]:
         """
-        Executes tool calls sequentially, sending 'action' events to the frontend
-        before each execution.
+        Executes tool calls, running the independent ones concurrently and sending
+        'action' events to the frontend before each execution.
+
+        Results are returned in the order of `tool_calls`.
         """
-        results = []
         if not tool_calls:
-            return results
+            return []
 
+        scheduler = self._new_tool_scheduler()
         for tool_call in tool_calls:
-            tool_name = tool_call.function.name
+            self._submit_tool_call(scheduler, tool_call)
+        return await scheduler.gather()
+
+    def _submit_tool_call(self, scheduler: ToolCallScheduler, tool_call: ToolCall) -> asyncio.Task:
+        try:
+            tool_args_dict = json.loads(tool_call.function.arguments or '{}')
+        except json.JSONDecodeError:
+            tool_args_dict = {}
+        access = self.available_tools.access(tool_call.function.name, tool_args_dict)
+        return scheduler.submit(
+            access, lambda: self._execute_tool_call_with_events(tool_call, tool_args_dict)
+        )
 
-            try:
-                tool_args_dict = json.loads(tool_call.function.arguments or '{}')
-            except json.JSONDecodeError:
-                tool_args_dict = {}
-
-            if self.callback_handler:
-                title = f"⚙️ Esecuzione: {tool_name}"
-                if "file" in tool_name:
-                    title = f"📄 File: {tool_name}"
-                elif "browser" in tool_name:
-                    title = f"🌐 Browser: {tool_name}"
-                elif "shell" in tool_name or "bash" in tool_name:
-                    title = f">_ Terminale: {tool_name}"
-                elif "python" in tool_name:
-                    title = f"🐍 Python: {tool_name}"
-                elif "planning" in tool_name:
-                    title = f"📝 Planning: {tool_name}"
-
-                content = ", ".join(f"{k}='{v}'" for k, v in tool_args_dict.items())
-
-                await self.callback_handler(
-                    "action",
-                    title=title,
-                    content=content
-                )
-
-            result = await self.available_tools.execute(name=tool_name, tool_input=tool_args_dict)
-
-            result.tool_call_id = tool_call.id
-            result.name = tool_name
-            results.append(result)
-
-        return results
+    async def _execute_tool_call_with_events(self, tool_call: ToolCall, tool_args_dict: dict) -> ToolResult:
+        tool_name = tool_call.function.name
+
+        if self.callback_handler:
+            title = f"⚙️ Esecuzione: {tool_name}"
+            if "file" in tool_name:
+                title = f"📄 File: {tool_name}"
+            elif "browser" in tool_name:
+                title = f"🌐 Browser: {tool_name}"
+            elif "shell" in tool_name or "bash" in tool_name:
+                title = f">_ Terminale: {tool_name}"
+            elif "python" in tool_name:
+                title = f"🐍 Python: {tool_name}"
+            elif "planning" in tool_name:
+                title = f"📝 Planning: {tool_name}"
+
+            content = ", ".join(f"{k}='{v}'" for k, v in tool_args_dict.items())
+
+            await self.callback_handler(
+                "action",
+                title=title,
+                content=content
+            )
+
+        result = await self.available_tools.execute(
+            name=tool_name, tool_input=tool_args_dict, cache=self._tool_cache()
+        )
+
+        result.tool_call_id = tool_call.id
+        result.name = tool_name
+        return result
 
     @classmethod
     async def create(cls, **kwargs) -> "Manus":
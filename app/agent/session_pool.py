@@ -0,0 +1,295 @@
+"""Bounded pool of the agents serving user sessions.
+
+Each agent holds a tool collection, a browser context, MCP connections and its
+memory, so keeping one per session ever seen grows without bound in a long-running
+server. ``AgentSessionPool`` keeps at most ``max_sessions`` agents, evicting the
+least recently used idle one when full and, from a background sweep, those idle
+for longer than ``idle_timeout``. Evicted agents are cleaned up; their conversation
+history is kept (without screenshots) and restored into a fresh agent on the
+session's next request.
+
+Building an agent is slow (tool instances, search engine clients, MCP connections),
+so ``WarmAgentPool`` keeps a few ready agents that new sessions take immediately,
+refilling itself in the background.
+"""
+import asyncio
+import inspect
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
+
+from app import metrics
+from app.agent.base import BaseAgent
+from app.config import SessionPoolSettings, config
+from app.logger import logger
+from app.schema import Message
+from app.token_ledger import token_ledger
+
+
+LRU = "lru"
+IDLE = "idle"
+
+
+@dataclass
+class _Session:
+    agent: BaseAgent
+    last_used: float = field(default_factory=time.monotonic)
+    # Requests currently using the agent; such sessions are never evicted
+    leases: int = 0
+
+
+def message_bytes(message: Message) -> int:
+    """Approximate in-memory size of a message's payload."""
+    size = len(message.content or "") + len(message.base64_image or "")
+    for call in message.tool_calls or []:
+        size += len(call.function.arguments or "")
+    return size
+
+
+class AgentSessionPool:
+    """Agents by session id, bounded in number and idle time."""
+
+    def __init__(
+        self,
+        factory: Callable[[str], Union[BaseAgent, Awaitable[BaseAgent]]],
+        settings: Optional[SessionPoolSettings] = None,
+    ):
+        self.factory = factory
+        self.settings = settings or config.session_pool_config or SessionPoolSettings()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._creating: Dict[str, asyncio.Lock] = {}
+        self._snapshots: "OrderedDict[str, List[Message]]" = OrderedDict()
+        self.evictions: Dict[str, int] = {LRU: 0, IDLE: 0}
+        self.rehydrated = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    async def get(self, session_id: str) -> BaseAgent:
+        """The agent of a session, created (and rehydrated if evicted) when missing."""
+        session = await self._checkout(session_id)
+        await self._evict_overflow(keep=session_id)
+        return session.agent
+
+    @asynccontextmanager
+    async def lease(self, session_id: str) -> AsyncIterator[BaseAgent]:
+        """The agent of a session, protected from eviction while in use."""
+        session = await self._checkout(session_id)
+        session.leases += 1
+        try:
+            await self._evict_overflow(keep=session_id)
+            yield session.agent
+        finally:
+            session.leases -= 1
+            session.last_used = time.monotonic()
+
+    async def _checkout(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            # One creation per session even when its requests arrive together
+            lock = self._creating.setdefault(session_id, asyncio.Lock())
+            try:
+                async with lock:
+                    session = self._sessions.get(session_id)
+                    if session is None:
+                        session = await self._create(session_id)
+            finally:
+                if not lock.locked():
+                    self._creating.pop(session_id, None)
+        session.last_used = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def _create(self, session_id: str) -> _Session:
+        agent = self.factory(session_id)
+        if inspect.isawaitable(agent):
+            agent = await agent
+        history = self._snapshots.pop(session_id, None)
+        if history:
+            agent.memory.add_messages(history)
+            self.rehydrated += 1
+            logger.info(f"Rehydrated session {session_id} with {len(history)} messages")
+        else:
+            logger.info(f"Creating new agent for session: {session_id}")
+        session = self._sessions[session_id] = _Session(agent)
+        return session
+
+    async def _evict_overflow(self, keep: str) -> None:
+        while len(self._sessions) > self.settings.max_sessions:
+            victim = next(
+                (
+                    session_id
+                    for session_id, session in self._sessions.items()
+                    if session.leases == 0 and session_id != keep
+                ),
+                None,
+            )
+            if victim is None:
+                logger.warning(
+                    f"Session pool over capacity ({len(self._sessions)}/"
+                    f"{self.settings.max_sessions}): every session is in use"
+                )
+                return
+            await self.evict(victim, LRU)
+
+    async def evict(self, session_id: str, reason: str = LRU) -> bool:
+        """Clean up the agent of a session, keeping its history for rehydration."""
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._snapshot(session_id, session.agent)
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        metrics.SESSION_EVICTIONS.labels(reason).inc()
+        logger.info(f"Evicting {reason} session {session_id}")
+        try:
+            await session.agent.cleanup()
+        except Exception as e:
+            logger.error(f"Error cleaning up evicted session {session_id}: {e}")
+        return True
+
+    def _snapshot(self, session_id: str, agent: BaseAgent) -> None:
+        # Screenshots are by far the largest part of a history and are not needed to resume
+        self._snapshots[session_id] = [
+            message.model_copy(update={"base64_image": None})
+            if message.base64_image
+            else message
+            for message in agent.memory.messages
+        ]
+        self._snapshots.move_to_end(session_id)
+        while len(self._snapshots) > self.settings.max_snapshots:
+            forgotten, _ = self._snapshots.popitem(last=False)
+            token_ledger.drop(forgotten)
+
+    async def reap_idle(self, now: Optional[float] = None) -> int:
+        """Evict the sessions idle for longer than `idle_timeout`, returning how many."""
+        now = time.monotonic() if now is None else now
+
+        def is_idle(session: Optional[_Session]) -> bool:
+            return (
+                session is not None
+                and session.leases == 0
+                and now - session.last_used > self.settings.idle_timeout
+            )
+
+        evicted = 0
+        for session_id in [
+            sid for sid, session in self._sessions.items() if is_idle(session)
+        ]:
+            # Checked again: the session may have been used while others were cleaned up
+            if is_idle(self._sessions.get(session_id)):
+                evicted += await self.evict(session_id, IDLE)
+        return evicted
+
+    async def run_reaper(self) -> None:
+        """Sweep idle sessions forever; run it as a background task."""
+        while True:
+            await asyncio.sleep(self.settings.reap_interval)
+            try:
+                await self.reap_idle()
+            except Exception as e:
+                logger.error(f"Idle session sweep failed: {e}")
+
+    async def close(self) -> None:
+        """Clean up every agent."""
+        for session_id in list(self._sessions):
+            session = self._sessions.pop(session_id)
+            try:
+                await session.agent.cleanup()
+            except Exception as e:
+                logger.error(f"Error cleaning up session {session_id}: {e}")
+
+    def memory_bytes(self) -> int:
+        """Approximate size of the memories of the agents in the pool."""
+        return sum(
+            message_bytes(message)
+            for session in list(self._sessions.values())
+            for message in session.agent.memory.messages
+        )
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.settings.max_sessions,
+            "in_use": sum(1 for session in self._sessions.values() if session.leases),
+            "evicted_lru": self.evictions.get(LRU, 0),
+            "evicted_idle": self.evictions.get(IDLE, 0),
+            "rehydrated": self.rehydrated,
+            "snapshots": len(self._snapshots),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+class WarmAgentPool:
+    """Ready agents handed out to new sessions, refilled in the background up to `target`."""
+
+    def __init__(self, factory: Callable[[], Awaitable[BaseAgent]], target: int):
+        self.factory = factory
+        self.target = target
+        self._ready: Deque[BaseAgent] = deque()
+        self._refill: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def take(self) -> Optional[BaseAgent]:
+        """A ready agent, or None when the pool is empty; starts a refill either way."""
+        agent = self._ready.popleft() if self._ready else None
+        if agent is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.refill()
+        return agent
+
+    def refill(self) -> None:
+        """Top the pool up to `target` in the background, unless already doing so."""
+        if len(self._ready) >= self.target:
+            return
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.create_task(self._fill())
+
+    async def _fill(self) -> None:
+        while len(self._ready) < self.target:
+            try:
+                agent = await self.factory()
+            except Exception as e:
+                logger.error(f"Could not pre-warm an agent: {e}")
+                return
+            self._ready.append(agent)
+
+    async def close(self) -> None:
+        """Stop refilling and clean up the agents that were never handed out."""
+        if self._refill is not None:
+            self._refill.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._refill
+        while self._ready:
+            agent = self._ready.popleft()
+            try:
+                await agent.cleanup()
+            except Exception as e:
+                logger.error(f"Error cleaning up a pre-warmed agent: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "ready": len(self._ready),
+            "target": self.target,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -1,15 +1,31 @@
 import asyncio
 import json
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Tuple, Union
 
-from pydantic import Field
+from openai.types.chat import ChatCompletionMessage
+from pydantic import Field, PrivateAttr
 
 from app.agent.react import ReActAgent
+from app.config import config
 from app.exceptions import TokenLimitExceeded
+from app.llm import LLM
+from app.llm_router import model_router
 from app.logger import logger
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
-from app.schema import TOOL_CHOICE_TYPE, AgentState, Message, ToolCall, ToolChoice
+from app.schema import (
+    TOOL_CHOICE_TYPE,
+    AgentState,
+    Message,
+    ThinkMode,
+    ToolCall,
+    ToolChoice,
+)
 from app.tool import CreateChatCompletion, Terminate, ToolCollection
+from app.tool.base import ToolAccess
+from app.tool.result_cache import ToolResultCache
+from app.tool.scheduler import ToolCallScheduler
+from app.tracing import tracer
+from app.utils.scratchpad import Scratchpad
 
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
@@ -31,35 +47,93 @@ class ToolCallAgent(ReActAgent):
     special_tool_names: List[str] = Field(default_factory=lambda: [Terminate().name])
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
-    _current_base64_image: Optional[str] = None
+    think_mode: ThinkMode = Field(
+        default_factory=lambda: ThinkMode(config.agent_config.think_mode),
+        description="Two LLM requests per step (reasoning, then tools) or a single one",
+    )
+    stream_tool_calls: bool = Field(
+        default_factory=lambda: config.agent_config.stream_tool_calls,
+        description="Stream tool requests and hand out tool calls as soon as they complete",
+    )
+    max_parallel_tool_calls: int = Field(
+        default_factory=lambda: config.agent_config.max_parallel_tool_calls,
+        description="Maximum number of non-conflicting tool calls executed concurrently",
+    )
+    memoize_tool_results: bool = Field(
+        default_factory=lambda: config.agent_config.memoize_tool_results,
+        description="Reuse results of cacheable read-only tool calls within a run",
+    )
+    select_tools: bool = Field(
+        default_factory=lambda: config.tool_selection_config.enabled,
+        description="Send only the tool schemas relevant to each step",
+    )
+    _tool_result_cache: ToolResultCache = PrivateAttr(default_factory=ToolResultCache)
+    _step_llm: Optional[LLM] = PrivateAttr(default=None)
+    _light_streak: int = PrivateAttr(default=0)
+    _full_tools_next_step: bool = PrivateAttr(default=False)
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
 
     async def think(self) -> bool:
         """
-        Process current state and decide next actions using a two-step think-then-act process.
+        Process current state and decide next actions.
+
+        In ``ThinkMode.TWO_PHASE`` (the default) this is a two-step think-then-act process:
         1.  **Reasoning Step**: The agent first generates a textual "thought" about what to do next.
         2.  **Tool Selection Step**: Based on its thought, the agent then selects the appropriate tool(s) to use.
+
+        In ``ThinkMode.SINGLE_CALL`` a single tool request returns both the reasoning
+        content and the tool calls, halving the requests and input tokens per step.
         """
         if self.next_step_prompt:
             user_msg = Message.user_message(self.next_step_prompt)
             self.messages += [user_msg]
 
+        self._step_llm, decision = self.llm.route(
+            self.messages, self._light_streak, self.next_step_prompt
+        )
+        if decision is None:
+            return await self._think()
+
+        self._light_streak = self._light_streak + 1 if decision.light else 0
+        if decision.light:
+            logger.info(f"🪶 Routing step to '{decision.config_name}' ({decision.reason})")
+        with model_router.record(decision):
+            return await self._think()
+
+    async def _think(self) -> bool:
+        if self.think_mode == ThinkMode.SINGLE_CALL:
+            return await self._think_single_call()
+        return await self._think_two_phase()
+
+    @property
+    def step_llm(self) -> LLM:
+        """The LLM serving the current step, chosen by the model router"""
+        return self._step_llm or self.llm
+
+    def _system_msgs(self) -> Optional[List[Message]]:
+        """System messages sent with every request"""
+        return (
+            [Message.system_message(self.system_prompt)] if self.system_prompt else None
+        )
+
+    async def _think_two_phase(self) -> bool:
+        """Reasoning request through `ask`, then tool selection through `ask_tool`."""
         # --- REASONING STEP ---
         # First, ask the LLM to generate its reasoning without giving it tools.
         # This forces a text-only response detailing the plan.
         try:
             # We use `ask` here, which does not send tool parameters.
-            reasoning_text = await self.llm.ask(
-                messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
-                stream=False, # We need the full thought before proceeding
-            )
+            # We need the full thought before proceeding; when streaming, the partial
+            # thought is forwarded to the callback handler while it is generated.
+            with tracer.span("think.reasoning", agent=self.name, model=self.step_llm.model):
+                reasoning_text = await self.step_llm.ask(
+                    messages=self.messages,
+                    system_msgs=self._system_msgs(),
+                    stream=self.stream_tool_calls,
+                    on_content=self._on_content_delta if self.stream_tool_calls else None,
+                )
         except Exception as e:
             logger.error(f"🚨 Error during reasoning step: {e}")
             # If reasoning fails, we can't proceed.
@@ -73,42 +147,166 @@ class ToolCallAgent(ReActAgent):
         assistant_message = Message.assistant_message(content=reasoning_text)
         self.memory.add_message(assistant_message)
 
-
         # --- TOOL SELECTION STEP ---
         # Now, ask the LLM to select tools based on the reasoning it just provided.
+        # `ask_tool` gets the full message history (including the thought).
+        response = await self._ask_tool()
+        if self.state == AgentState.FINISHED:
+            return False
+
+        self.tool_calls = response.tool_calls if response and response.tool_calls else []
+        self._log_tool_selection()
+
+        # Update the original assistant message with the tool calls.
+        # This links the reasoning and the action together.
+        assistant_message.tool_calls = self.tool_calls
+
+        # If the tool choice was 'required' but no tools were chosen, it's an issue.
+        if self.tool_choices == ToolChoice.REQUIRED and not self.tool_calls:
+            return True  # Will be handled in act()
+
+        return bool(self.tool_calls)
+
+    async def _think_single_call(self) -> bool:
+        """One `ask_tool` request that returns both the reasoning and the tool calls."""
+        response = await self._ask_tool()
+        if self.state == AgentState.FINISHED:
+            return False
+
+        self.tool_calls = response.tool_calls if response and response.tool_calls else []
+        reasoning_text = response.content if response and response.content else ""
+
+        logger.info(f"✨ {self.name}'s thoughts: {reasoning_text}")
+        self._log_tool_selection()
+
+        assistant_message = (
+            Message.from_tool_calls(content=reasoning_text, tool_calls=self.tool_calls)
+            if self.tool_calls
+            else Message.assistant_message(content=reasoning_text)
+        )
+        self.memory.add_message(assistant_message)
+
+        if self.tool_choices == ToolChoice.REQUIRED and not self.tool_calls:
+            return True  # Will be handled in act()
+
+        return bool(self.tool_calls)
+
+    def prompt_overhead_tokens(self) -> int:
+        """System prompt and the full set of tool schemas, the most a step sends."""
+        system_tokens = (
+            self.llm.count_message_tokens(LLM.format_messages(self._system_msgs()))
+            if self.system_prompt
+            else 0
+        )
+        # Counted with the agent's own LLM, like the history by the compactor
+        return system_tokens + self.available_tools.count_schema_tokens(self.llm.count_tokens)
+
+    def _tools_tokens(self, names: Optional[List[str]] = None) -> int:
+        """Token cost of the tool schemas (of `names` only if given), cached by the tool collection."""
+        return self.available_tools.count_schema_tokens(self.step_llm.count_tokens, names)
+
+    def _tool_selection(self) -> Optional[List[str]]:
+        """
+        Names of the tools whose schemas are sent with this step, None for all of them.
+
+        Tools are ranked against the latest thought and user request; pinned tools,
+        special tools and the tools called in the previous step are always kept.
+        """
+        settings = config.tool_selection_config
+        if (
+            not self.select_tools
+            or self._full_tools_next_step
+            or len(self.available_tools.tools) <= settings.min_tools
+        ):
+            self._full_tools_next_step = False
+            return None
+
+        query = []
+        for message in reversed(self.messages):
+            if message.role == "assistant" and message.content and not query:
+                query.append(message.content)
+            elif message.role == "user" and message.content != self.next_step_prompt:
+                query.append(message.content or "")
+                break
+        always = [
+            *settings.pinned_tools,
+            *self.special_tool_names,
+            *(call.function.name for call in self.tool_calls),
+        ]
+        return self.available_tools.select("\n".join(query), settings.top_k, always)
+
+    async def _ask_tool(self) -> Optional[ChatCompletionMessage]:
+        """Send the tool selection request, finishing the agent on token limit errors."""
+        names = self._tool_selection()
+        tools_sent = len(names) if names is not None else len(self.available_tools.tools)
+        with tracer.span("think.ask_tool", agent=self.name, model=self.step_llm.model) as span:
+            response = await self._send_tool_request(names)
+            if span:
+                span.set(tools_sent=tools_sent)
+                if response:
+                    span.set(tool_calls=len(response.tool_calls or []))
+        if names is not None and response and response.tool_calls:
+            unsent = {call.function.name for call in response.tool_calls} - set(names)
+            if unsent & set(self.available_tools.tool_map):
+                # The calls still run; re-asking would disagree with streamed calls
+                # already handed out, so the next step gets every schema instead.
+                logger.info(f"🧰 Model called tools outside the selection: {sorted(unsent)}")
+                self._full_tools_next_step = True
+        return response
+
+    async def _send_tool_request(
+        self, names: Optional[List[str]] = None
+    ) -> Optional[ChatCompletionMessage]:
+        tools = self.available_tools.to_params(names)
         try:
-            # We use `ask_tool` here, providing the full message history (including the thought)
-            # and the available tools.
-            response = await self.llm.ask_tool(
-                messages=self.messages, # self.messages now includes the reasoning
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
-                tools=self.available_tools.to_params(),
+            if self.stream_tool_calls:
+                return await self.step_llm.ask_tool_stream(
+                    messages=self.messages,
+                    system_msgs=self._system_msgs(),
+                    tools=tools,
+                    tool_choice=self.tool_choices,
+                    tools_tokens=self._tools_tokens(names),
+                    on_content=self._on_content_delta,
+                    on_tool_call=self._on_tool_call_ready,
+                )
+            return await self.step_llm.ask_tool(
+                messages=self.messages,
+                system_msgs=self._system_msgs(),
+                tools=tools,
                 tool_choice=self.tool_choices,
+                tools_tokens=self._tools_tokens(names),
             )
         except ValueError:
             raise
         except Exception as e:
-            if hasattr(e, "__cause__") and isinstance(e.__cause__, TokenLimitExceeded):
-                token_limit_error = e.__cause__
-                logger.error(
-                    f"🚨 Token limit error (from RetryError): {token_limit_error}"
-                )
+            token_limit_error = (
+                e if isinstance(e, TokenLimitExceeded) else getattr(e, "__cause__", None)
+            )
+            if isinstance(token_limit_error, TokenLimitExceeded):
+                logger.error(f"🚨 Token limit error: {token_limit_error}")
                 self.memory.add_message(
                     Message.assistant_message(
                         f"Maximum token limit reached, cannot continue execution: {str(token_limit_error)}"
                     )
                 )
                 self.state = AgentState.FINISHED
-                return False
+                return None
             raise
 
-        self.tool_calls = response.tool_calls if response and response.tool_calls else []
+    async def _on_content_delta(self, delta: str) -> None:
+        """Forward a streamed piece of the agent's thought to the frontend"""
+        if self.callback_handler:
+            await self.callback_handler("thought_delta", content=delta)
+
+    async def _on_tool_call_ready(self, tool_call: ToolCall) -> None:
+        """Hook called for each streamed tool call as soon as its arguments are complete.
+
+        The default implementation does nothing: tool calls are executed in `act`.
+        Subclasses can override it to start execution while the stream continues.
+        """
 
-        # Log the selected tools
+    def _log_tool_selection(self) -> None:
+        """Log the selected tools"""
         logger.info(
             f"🛠️ {self.name} selected {len(self.tool_calls) if self.tool_calls else 0} tools to use based on its reasoning."
         )
@@ -118,16 +316,6 @@ class ToolCallAgent(ReActAgent):
             )
             logger.info(f"🔧 Tool arguments: {self.tool_calls[0].function.arguments}")
 
-        # Update the original assistant message with the tool calls.
-        # This links the reasoning and the action together.
-        assistant_message.tool_calls = self.tool_calls
-
-        # If the tool choice was 'required' but no tools were chosen, it's an issue.
-        if self.tool_choices == ToolChoice.REQUIRED and not self.tool_calls:
-            return True  # Will be handled in act()
-
-        return bool(self.tool_calls)
-
     async def act(self) -> str:
         """Execute tool calls and handle their results"""
         if not self.tool_calls:
@@ -137,13 +325,16 @@ class ToolCallAgent(ReActAgent):
             # Return last message content if no tool calls
             return self.messages[-1].content or "No content or commands to execute"
 
-        results = []
+        scheduler = self._new_tool_scheduler()
         for command in self.tool_calls:
-            # Reset base64_image for each tool call
-            self._current_base64_image = None
-
-            result = await self.execute_tool(command)
+            scheduler.submit(
+                self._tool_call_access(command),
+                lambda command=command: self._execute_tool_call(command),
+            )
+        outcomes = await scheduler.gather()
 
+        results = []
+        for command, (result, base64_image) in zip(self.tool_calls, outcomes):
             if self.max_observe:
                 result = result[: self.max_observe]
 
@@ -151,26 +342,46 @@ class ToolCallAgent(ReActAgent):
                 f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
             )
 
-            # Add tool response to memory
+            # Add tool response to memory, in the order the model requested the calls
             tool_msg = Message.tool_message(
                 content=result,
                 tool_call_id=command.id,
                 name=command.function.name,
-                base64_image=self._current_base64_image,
+                base64_image=base64_image,
             )
             self.memory.add_message(tool_msg)
             results.append(result)
 
         return "\n\n".join(results)
 
+    def _new_tool_scheduler(self) -> ToolCallScheduler:
+        return ToolCallScheduler(self.max_parallel_tool_calls)
+
+    def _tool_cache(self) -> Optional[ToolResultCache]:
+        """Memoized tool results of this agent's session, if enabled"""
+        return self._tool_result_cache if self.memoize_tool_results else None
+
+    def _tool_call_access(self, command: ToolCall) -> ToolAccess:
+        """Resources touched by a tool call, used to decide what can run concurrently"""
+        try:
+            args = json.loads(command.function.arguments or "{}")
+        except json.JSONDecodeError:
+            args = {}
+        return self.available_tools.access(command.function.name, args)
+
     async def execute_tool(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
+        observation, _ = await self._execute_tool_call(command)
+        return observation
+
+    async def _execute_tool_call(self, command: ToolCall) -> Tuple[str, Optional[str]]:
+        """Execute a single tool call, returning the observation and its base64 image if any"""
         if not command or not command.function or not command.function.name:
-            return "Error: Invalid command format"
+            return "Error: Invalid command format", None
 
         name = command.function.name
         if name not in self.available_tools.tool_map:
-            return f"Error: Unknown tool '{name}'"
+            return f"Error: Unknown tool '{name}'", None
 
         try:
             # Parse arguments
@@ -178,15 +389,15 @@ class ToolCallAgent(ReActAgent):
 
             # Execute the tool
             logger.info(f"🔧 Activating tool: '{name}'...")
-            result = await self.available_tools.execute(name=name, tool_input=args)
+            result = await self.available_tools.execute(
+                name=name, tool_input=args, cache=self._tool_cache()
+            )
 
             # Handle special tools
             await self._handle_special_tool(name=name, result=result)
 
-            # Check if result is a ToolResult with base64_image
-            if hasattr(result, "base64_image") and result.base64_image:
-                # Store the base64_image for later use in tool_message
-                self._current_base64_image = result.base64_image
+            # Keep the base64_image of a ToolResult for the tool message
+            base64_image = getattr(result, "base64_image", None) or None
 
             # Format result for display (standard case)
             observation = (
@@ -195,17 +406,17 @@ class ToolCallAgent(ReActAgent):
                 else f"Cmd `{name}` completed with no output"
             )
 
-            return observation
+            return observation, base64_image
         except json.JSONDecodeError:
             error_msg = f"Error parsing arguments for {name}: Invalid JSON format"
             logger.error(
                 f"📝 Oops! The arguments for '{name}' don't make sense - invalid JSON, arguments:{command.function.arguments}"
             )
-            return f"Error: {error_msg}"
+            return f"Error: {error_msg}", None
         except Exception as e:
             error_msg = f"⚠️ Tool '{name}' encountered a problem: {str(e)}"
             logger.exception(error_msg)
-            return f"Error: {error_msg}"
+            return f"Error: {error_msg}", None
 
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
@@ -229,6 +440,13 @@ class ToolCallAgent(ReActAgent):
     async def cleanup(self):
         """Clean up resources used by the agent's tools."""
         logger.info(f"🧹 Cleaning up resources for agent '{self.name}'...")
+        if self._tool_result_cache.hits:
+            logger.info(
+                f"♻️ {self._tool_result_cache.hits} tool calls reused cached results this session"
+            )
+        self._tool_result_cache = ToolResultCache()
+        if model_router.enabled:
+            logger.info(f"🪶 Model routing so far: {model_router.get_stats()}")
         for tool_name, tool_instance in self.available_tools.tool_map.items():
             if hasattr(tool_instance, "cleanup") and asyncio.iscoroutinefunction(
                 tool_instance.cleanup
@@ -242,9 +460,11 @@ class ToolCallAgent(ReActAgent):
                     )
         logger.info(f"✨ Cleanup complete for agent '{self.name}'.")
 
-    async def run(self, request: Optional[str] = None) -> str:
+    async def run(
+        self, request: Optional[str] = None, scratchpad: Optional[Scratchpad] = None
+    ) -> str:
         """Run the agent with cleanup when done."""
         try:
-            return await super().run(request)
+            return await super().run(request, scratchpad=scratchpad)
         finally:
             await self.cleanup()
@@ -1,46 +1,46 @@
+import asyncio
+import base64
+import functools
 import json
 import sys
+import threading
 import time
 import uuid
-from datetime import datetime
-from typing import Dict, List, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 
 import boto3
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
 
-# Global variables to track the current tool use ID across function calls
-# Tmp solution
-CURRENT_TOOLUSE_ID = None
+# Bedrock stop reasons mapped to OpenAI finish reasons
+FINISH_REASONS = {
+    "end_turn": "stop",
+    "stop_sequence": "stop",
+    "tool_use": "tool_calls",
+    "max_tokens": "length",
+    "guardrail_intervened": "content_filter",
+    "content_filtered": "content_filter",
+}
 
+# Marks the end of a cacheable prompt prefix
+CACHE_POINT = {"cachePoint": {"type": "default"}}
 
-# Class to handle OpenAI-style response formatting
-class OpenAIResponse:
-    def __init__(self, data):
-        # Recursively convert nested dicts and lists to OpenAIResponse objects
-        for key, value in data.items():
-            if isinstance(value, dict):
-                value = OpenAIResponse(value)
-            elif isinstance(value, list):
-                value = [
-                    OpenAIResponse(item) if isinstance(item, dict) else item
-                    for item in value
-                ]
-            setattr(self, key, value)
-
-    def model_dump(self, *args, **kwargs):
-        # Convert object to dict and add timestamp
-        data = self.__dict__
-        data["created_at"] = datetime.now().isoformat()
-        return data
+# Sentinel pushed by the stream reader thread once the event stream is exhausted
+_STREAM_END = object()
 
 
 # Main client class for interacting with Amazon Bedrock
 class BedrockClient:
-    def __init__(self):
+    def __init__(self, max_workers: Optional[int] = None):
         # Initialize Bedrock client, you need to configure AWS env first
         try:
             self.client = boto3.client("bedrock-runtime")
-            self.chat = Chat(self.client)
+            # boto3 is synchronous: calls run in a dedicated pool so they never block the event loop
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="bedrock"
+            )
+            self.chat = Chat(self.client, self.executor)
         except Exception as e:
             print(f"Error initializing Bedrock client: {e}")
             sys.exit(1)
@@ -48,14 +48,15 @@ class BedrockClient:
 
 # Chat interface class
 class Chat:
-    def __init__(self, client):
-        self.completions = ChatCompletions(client)
+    def __init__(self, client, executor: ThreadPoolExecutor):
+        self.completions = ChatCompletions(client, executor)
 
 
 # Core class handling chat completions functionality
 class ChatCompletions:
-    def __init__(self, client):
+    def __init__(self, client, executor: Optional[ThreadPoolExecutor] = None):
         self.client = client
+        self.executor = executor
 
     def _convert_openai_tools_to_bedrock_format(self, tools):
         # Convert OpenAI function calling format to Bedrock tool format
@@ -83,114 +84,208 @@ class ChatCompletions:
                 bedrock_tools.append(bedrock_tool)
         return bedrock_tools
 
-    def _convert_openai_messages_to_bedrock_format(self, messages):
-        # Convert OpenAI message format to Bedrock message format
+    @staticmethod
+    def _convert_openai_content_to_bedrock_format(content) -> List[dict]:
+        # Convert OpenAI message content (text or multimodal list) to Bedrock content blocks
+        if not content:
+            return []
+        if isinstance(content, str):
+            return [{"text": content}]
+
+        blocks = []
+        for item in content:
+            if isinstance(item, str):
+                blocks.append({"text": item})
+            elif item.get("type") == "text" and item.get("text"):
+                blocks.append({"text": item["text"]})
+            elif item.get("type") == "image_url":
+                url = item.get("image_url", {}).get("url", "")
+                if url.startswith("data:image/") and ";base64," in url:
+                    header, data = url.split(";base64,", 1)
+                    image_format = header[len("data:image/") :].replace("jpg", "jpeg")
+                    blocks.append(
+                        {
+                            "image": {
+                                "format": image_format,
+                                "source": {"bytes": base64.b64decode(data)},
+                            }
+                        }
+                    )
+        return blocks
+
+    def _convert_openai_messages_to_bedrock_format(
+        self, messages
+    ) -> Tuple[List[dict], List[dict]]:
+        # Convert OpenAI message format to Bedrock message format.
+        # Tool results are matched to their call through tool_call_id, so conversions
+        # are independent of each other and safe for concurrent sessions.
         bedrock_messages = []
         system_prompt = []
+        last_tool_use_id = None
         for message in messages:
-            if message.get("role") == "system":
+            role = message.get("role")
+            if role == "system":
                 system_prompt = [{"text": message.get("content")}]
-            elif message.get("role") == "user":
-                bedrock_message = {
-                    "role": message.get("role", "user"),
-                    "content": [{"text": message.get("content")}],
-                }
-                bedrock_messages.append(bedrock_message)
-            elif message.get("role") == "assistant":
-                bedrock_message = {
-                    "role": "assistant",
-                    "content": [{"text": message.get("content")}],
-                }
-                openai_tool_calls = message.get("tool_calls", [])
-                if openai_tool_calls:
-                    bedrock_tool_use = {
-                        "toolUseId": openai_tool_calls[0]["id"],
-                        "name": openai_tool_calls[0]["function"]["name"],
-                        "input": json.loads(
-                            openai_tool_calls[0]["function"]["arguments"]
-                        ),
+            elif role == "user":
+                bedrock_messages.append(
+                    {
+                        "role": "user",
+                        "content": self._convert_openai_content_to_bedrock_format(
+                            message.get("content")
+                        )
+                        or [{"text": "."}],
                     }
-                    bedrock_message["content"].append({"toolUse": bedrock_tool_use})
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = openai_tool_calls[0]["id"]
-                bedrock_messages.append(bedrock_message)
-            elif message.get("role") == "tool":
-                bedrock_message = {
-                    "role": "user",
-                    "content": [
+                )
+            elif role == "assistant":
+                content = self._convert_openai_content_to_bedrock_format(
+                    message.get("content")
+                )
+                for tool_call in message.get("tool_calls") or []:
+                    last_tool_use_id = tool_call["id"]
+                    content.append(
                         {
-                            "toolResult": {
-                                "toolUseId": CURRENT_TOOLUSE_ID,
-                                "content": [{"text": message.get("content")}],
+                            "toolUse": {
+                                "toolUseId": tool_call["id"],
+                                "name": tool_call["function"]["name"],
+                                "input": json.loads(
+                                    tool_call["function"]["arguments"] or "{}"
+                                ),
                             }
                         }
-                    ],
+                    )
+                bedrock_messages.append(
+                    {"role": "assistant", "content": content or [{"text": "."}]}
+                )
+            elif role == "tool":
+                tool_result = {
+                    "toolResult": {
+                        "toolUseId": message.get("tool_call_id") or last_tool_use_id,
+                        "content": [{"text": message.get("content") or "."}],
+                    }
                 }
-                bedrock_messages.append(bedrock_message)
+                previous = bedrock_messages[-1] if bedrock_messages else None
+                if (
+                    previous
+                    and previous["role"] == "user"
+                    and all("toolResult" in block for block in previous["content"])
+                ):
+                    # Results of parallel tool calls go into a single user turn
+                    previous["content"].append(tool_result)
+                else:
+                    bedrock_messages.append({"role": "user", "content": [tool_result]})
             else:
-                raise ValueError(f"Invalid role: {message.get('role')}")
+                raise ValueError(f"Invalid role: {role}")
         return system_prompt, bedrock_messages
 
-    def _convert_bedrock_response_to_openai_format(self, bedrock_response):
+    def _convert_bedrock_response_to_openai_format(
+        self, bedrock_response
+    ) -> ChatCompletion:
         # Convert Bedrock response format to OpenAI format
-        content = ""
-        if bedrock_response.get("output", {}).get("message", {}).get("content"):
-            content_array = bedrock_response["output"]["message"]["content"]
-            content = "".join(item.get("text", "") for item in content_array)
+        message = bedrock_response.get("output", {}).get("message", {})
+        content_array = message.get("content") or []
+        content = "".join(item.get("text", "") for item in content_array)
         if content == "":
             content = "."
 
         # Handle tool calls in response
-        openai_tool_calls = []
-        if bedrock_response.get("output", {}).get("message", {}).get("content"):
-            for content_item in bedrock_response["output"]["message"]["content"]:
-                if content_item.get("toolUse"):
-                    bedrock_tool_use = content_item["toolUse"]
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
-                    openai_tool_call = {
-                        "id": CURRENT_TOOLUSE_ID,
-                        "type": "function",
-                        "function": {
-                            "name": bedrock_tool_use["name"],
-                            "arguments": json.dumps(bedrock_tool_use["input"]),
-                        },
-                    }
-                    openai_tool_calls.append(openai_tool_call)
+        openai_tool_calls = [
+            {
+                "id": item["toolUse"]["toolUseId"],
+                "type": "function",
+                "function": {
+                    "name": item["toolUse"]["name"],
+                    "arguments": json.dumps(item["toolUse"]["input"]),
+                },
+            }
+            for item in content_array
+            if item.get("toolUse")
+        ]
 
+        usage = bedrock_response.get("usage", {})
         # Construct final OpenAI format response
         openai_format = {
             "id": f"chatcmpl-{uuid.uuid4()}",
             "created": int(time.time()),
             "object": "chat.completion",
+            "model": bedrock_response.get("model", "bedrock"),
             "system_fingerprint": None,
             "choices": [
                 {
-                    "finish_reason": bedrock_response.get("stopReason", "end_turn"),
+                    "finish_reason": FINISH_REASONS.get(
+                        bedrock_response.get("stopReason", "end_turn"), "stop"
+                    ),
                     "index": 0,
                     "message": {
                         "content": content,
-                        "role": bedrock_response.get("output", {})
-                        .get("message", {})
-                        .get("role", "assistant"),
-                        "tool_calls": openai_tool_calls
-                        if openai_tool_calls != []
-                        else None,
-                        "function_call": None,
+                        "role": "assistant",
+                        "tool_calls": openai_tool_calls or None,
                     },
                 }
             ],
-            "usage": {
-                "completion_tokens": bedrock_response.get("usage", {}).get(
-                    "outputTokens", 0
-                ),
-                "prompt_tokens": bedrock_response.get("usage", {}).get(
-                    "inputTokens", 0
-                ),
-                "total_tokens": bedrock_response.get("usage", {}).get("totalTokens", 0),
-            },
+            "usage": self._convert_usage(usage),
+        }
+        return ChatCompletion.model_validate(openai_format)
+
+    @staticmethod
+    def _convert_usage(usage: dict) -> dict:
+        # Bedrock reports cache reads and writes apart from inputTokens,
+        # OpenAI counts them in prompt_tokens and details the cached part
+        cache_read = usage.get("cacheReadInputTokens", 0)
+        prompt_tokens = (
+            usage.get("inputTokens", 0)
+            + cache_read
+            + usage.get("cacheWriteInputTokens", 0)
+        )
+        completion_tokens = usage.get("outputTokens", 0)
+        return {
+            "completion_tokens": completion_tokens,
+            "prompt_tokens": prompt_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cache_read},
         }
-        return OpenAIResponse(openai_format)
+
+    @staticmethod
+    def _build_request(
+        model: str,
+        messages: List[dict],
+        system_prompt: List[dict],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[dict]],
+        tool_choice: str,
+        prompt_cache: bool = False,
+    ) -> Dict[str, Any]:
+        if prompt_cache:
+            # Cache the system prompt, the tools and the history up to the last message
+            system_prompt = (
+                system_prompt + [CACHE_POINT] if system_prompt else system_prompt
+            )
+            tools = tools + [CACHE_POINT] if tools else tools
+            if messages:
+                last = messages[-1]
+                messages = messages[:-1] + [
+                    {**last, "content": last["content"] + [CACHE_POINT]}
+                ]
+        request = {
+            "modelId": model,
+            "system": system_prompt,
+            "messages": messages,
+            "inferenceConfig": {"temperature": temperature, "maxTokens": max_tokens},
+        }
+        if tools:
+            tool_config = {"tools": tools}
+            if tool_choice == "required":
+                tool_config["toolChoice"] = {"any": {}}
+            elif tool_choice == "auto":
+                tool_config["toolChoice"] = {"auto": {}}
+            request["toolConfig"] = tool_config
+        return request
+
+    async def _run_in_executor(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
 
     async def _invoke_bedrock(
         self,
@@ -200,22 +295,29 @@ class ChatCompletions:
         temperature: float,
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
+        prompt_cache: bool = False,
         **kwargs,
-    ) -> OpenAIResponse:
+    ) -> ChatCompletion:
         # Non-streaming invocation of Bedrock model
         (
             system_prompt,
             bedrock_messages,
         ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
+        response = await self._run_in_executor(
+            self.client.converse,
+            **self._build_request(
+                model,
+                bedrock_messages,
+                system_prompt,
+                max_tokens,
+                temperature,
+                tools,
+                tool_choice,
+                prompt_cache,
+            ),
         )
-        openai_response = self._convert_bedrock_response_to_openai_format(response)
-        return openai_response
+        response["model"] = model
+        return self._convert_bedrock_response_to_openai_format(response)
 
     async def _invoke_bedrock_stream(
         self,
@@ -225,90 +327,166 @@ class ChatCompletions:
         temperature: float,
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
+        prompt_cache: bool = False,
         **kwargs,
-    ) -> OpenAIResponse:
-        # Streaming invocation of Bedrock model
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        # Streaming invocation of Bedrock model. The request itself is awaited here so
+        # errors (e.g. throttling) surface before any chunk is consumed.
         (
             system_prompt,
             bedrock_messages,
         ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse_stream(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
+        response = await self._run_in_executor(
+            self.client.converse_stream,
+            **self._build_request(
+                model,
+                bedrock_messages,
+                system_prompt,
+                max_tokens,
+                temperature,
+                tools,
+                tool_choice,
+                prompt_cache,
+            ),
         )
+        return self._stream_chunks(model, response.get("stream"))
 
-        # Initialize response structure
-        bedrock_response = {
-            "output": {"message": {"role": "", "content": []}},
-            "stopReason": "",
-            "usage": {},
-            "metrics": {},
-        }
-        bedrock_response_text = ""
-        bedrock_response_tool_input = ""
+    async def _stream_chunks(
+        self, model: str, stream
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        # Read the blocking event stream in the executor and yield OpenAI-style chunks
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
 
-        # Process streaming response
-        stream = response.get("stream")
-        if stream:
-            for event in stream:
-                if event.get("messageStart", {}).get("role"):
-                    bedrock_response["output"]["message"]["role"] = event[
-                        "messageStart"
-                    ]["role"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("text"):
-                    bedrock_response_text += event["contentBlockDelta"]["delta"]["text"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["text"], end="", flush=True
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 0:
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"text": bedrock_response_text}
-                    )
-                if event.get("contentBlockStart", {}).get("start", {}).get("toolUse"):
-                    bedrock_tool_use = event["contentBlockStart"]["start"]["toolUse"]
-                    tool_use = {
-                        "toolUseId": bedrock_tool_use["toolUseId"],
-                        "name": bedrock_tool_use["name"],
-                    }
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"toolUse": tool_use}
+        def put(item) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # The event loop was closed while the stream was still being read
+                stop.set()
+
+        def read_events():
+            try:
+                for event in stream or []:
+                    if stop.is_set():
+                        break
+                    put(event)
+            except Exception as e:
+                put(e)
+            finally:
+                if stream is not None and hasattr(stream, "close"):
+                    stream.close()
+                put(_STREAM_END)
+
+        loop.run_in_executor(self.executor, read_events)
+        chunk_id = f"chatcmpl-{uuid.uuid4()}"
+        # Bedrock content block index -> OpenAI tool call index
+        tool_indexes: Dict[int, int] = {}
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None, usage=None):
+            return ChatCompletionChunk.model_validate(
+                {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                    "usage": usage,
+                }
+            )
+
+        try:
+            finish_reason = None
+            while True:
+                event = await queue.get()
+                if event is _STREAM_END:
+                    break
+                if isinstance(event, Exception):
+                    raise event
+
+                if "contentBlockStart" in event:
+                    start = event["contentBlockStart"]
+                    tool_use = start.get("start", {}).get("toolUse")
+                    if tool_use:
+                        index = tool_indexes.setdefault(
+                            start["contentBlockIndex"], len(tool_indexes)
+                        )
+                        yield chunk(
+                            {
+                                "tool_calls": [
+                                    {
+                                        "index": index,
+                                        "id": tool_use["toolUseId"],
+                                        "type": "function",
+                                        "function": {
+                                            "name": tool_use["name"],
+                                            "arguments": "",
+                                        },
+                                    }
+                                ]
+                            }
+                        )
+                elif "contentBlockDelta" in event:
+                    block = event["contentBlockDelta"]
+                    delta = block.get("delta", {})
+                    if delta.get("text"):
+                        yield chunk({"content": delta["text"]})
+                    elif "toolUse" in delta:
+                        index = tool_indexes.setdefault(
+                            block["contentBlockIndex"], len(tool_indexes)
+                        )
+                        yield chunk(
+                            {
+                                "tool_calls": [
+                                    {
+                                        "index": index,
+                                        "function": {
+                                            "arguments": delta["toolUse"].get(
+                                                "input", ""
+                                            )
+                                        },
+                                    }
+                                ]
+                            }
+                        )
+                elif "messageStop" in event:
+                    finish_reason = FINISH_REASONS.get(
+                        event["messageStop"].get("stopReason"), "stop"
                     )
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("toolUse"):
-                    bedrock_response_tool_input += event["contentBlockDelta"]["delta"][
-                        "toolUse"
-                    ]["input"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["toolUse"]["input"],
-                        end="",
-                        flush=True,
+                    yield chunk({}, finish_reason=finish_reason)
+                elif "metadata" in event:
+                    usage = event["metadata"].get("usage", {})
+                    yield ChatCompletionChunk.model_validate(
+                        {
+                            "id": chunk_id,
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [],
+                            "usage": self._convert_usage(usage),
+                        }
                     )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 1:
-                    bedrock_response["output"]["message"]["content"][1]["toolUse"][
-                        "input"
-                    ] = json.loads(bedrock_response_tool_input)
-        print()
-        openai_response = self._convert_bedrock_response_to_openai_format(
-            bedrock_response
-        )
-        return openai_response
+        finally:
+            # Stop the reader thread at its next event if the consumer gave up early
+            stop.set()
 
     def create(
         self,
         model: str,
         messages: List[Dict[str, str]],
-        max_tokens: int,
-        temperature: float,
+        max_tokens: Optional[int] = None,
+        temperature: float = 1.0,
         stream: Optional[bool] = True,
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
-        # Main entry point for chat completion
+    ):
+        # Main entry point for chat completion, returns an awaitable like AsyncOpenAI:
+        # a ChatCompletion, or an async iterator of ChatCompletionChunk when streaming
+        max_tokens = max_tokens or kwargs.pop("max_completion_tokens", None) or 4096
         bedrock_tools = []
         if tools is not None:
             bedrock_tools = self._convert_openai_tools_to_bedrock_format(tools)
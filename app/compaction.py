@@ -0,0 +1,197 @@
+"""Token-budget-aware compaction of agent memory.
+
+The history sent with every request grows with each step. `MemoryCompactor` keeps
+it under a token budget derived from the model's context window: old image
+attachments are stripped, and once the budget is exceeded the oldest turns are
+dropped (or summarized with a cheaper model). The budget covers the whole prompt:
+the caller passes what the system prompt and tool schemas take as `reserved_tokens`. An assistant message with
+`tool_calls` and the tool results answering it are always kept or removed together.
+"""
+from typing import List, Optional
+
+from app.config import MemorySettings, config
+from app.llm import LLM, MULTIMODAL_MODELS
+from app.logger import logger
+from app.schema import Memory, Message, Role
+
+
+SUMMARY_PREFIX = "Summary of earlier steps:"
+
+SUMMARY_MESSAGE_CHARS = 2000
+
+SUMMARY_PROMPT = (
+    "Summarize the following agent history for the agent that will continue the task. "
+    "Keep facts, decisions, file paths, URLs, results of tool calls and open problems; "
+    "drop pleasantries and repeated content. Answer in at most {max_tokens} tokens.\n\n"
+    "{history}"
+)
+
+
+def group_segments(messages: List[Message]) -> List[List[Message]]:
+    """
+    Split messages into segments that must be kept or removed as a whole.
+
+    An assistant message with tool calls forms one segment together with the tool
+    messages answering it; every other message is a segment of its own.
+    """
+    segments: List[List[Message]] = []
+    pending_ids: set = set()
+    for message in messages:
+        if message.role == Role.TOOL and message.tool_call_id in pending_ids:
+            segments[-1].append(message)
+            pending_ids.discard(message.tool_call_id)
+            continue
+        segments.append([message])
+        pending_ids = (
+            {call.id for call in message.tool_calls}
+            if message.role == Role.ASSISTANT and message.tool_calls
+            else set()
+        )
+    return segments
+
+
+class MemoryCompactor:
+    """Keeps an agent's memory under a token budget."""
+
+    def __init__(
+        self,
+        llm: LLM,
+        settings: Optional[MemorySettings] = None,
+        summary_llm: Optional[LLM] = None,
+    ):
+        self.llm = llm
+        self.settings = settings or config.memory_config or MemorySettings()
+        self.summary_llm = summary_llm
+        if self.settings.summarize and summary_llm is None:
+            self.summary_llm = (
+                LLM(config_name=self.settings.summary_llm)
+                if self.settings.summary_llm
+                else llm
+            )
+
+    @property
+    def token_budget(self) -> Optional[int]:
+        """Prompt token budget, None if neither a budget nor a context window is set"""
+        if self.settings.token_budget:
+            return self.settings.token_budget
+        context_window = getattr(self.llm, "context_window", None)
+        if context_window:
+            return int(context_window * self.settings.context_ratio)
+        return None
+
+    def count_tokens(self, messages: List[Message]) -> int:
+        """Token count of messages as they would be sent to the model"""
+        supports_images = self.llm.model in MULTIMODAL_MODELS
+        return self.llm.count_message_tokens(
+            LLM.format_messages(messages, supports_images)
+        )
+
+    def strip_images(self, messages: List[Message]) -> int:
+        """Remove image attachments except the most recent ones, returning how many were removed"""
+        kept = 0
+        removed = 0
+        for message in reversed(messages):
+            if not message.base64_image:
+                continue
+            if kept < self.settings.keep_images:
+                kept += 1
+                continue
+            message.base64_image = None
+            removed += 1
+        return removed
+
+    async def compact(self, memory: Memory, reserved_tokens: int = 0) -> bool:
+        """
+        Compact `memory` in place if it is over budget.
+
+        Args:
+            memory: History to compact
+            reserved_tokens: Tokens of the prompt sent besides the history (system
+                prompt, tool schemas), taken from the budget
+
+        Returns:
+            True if messages were removed or summarized
+        """
+        self.strip_images(memory.messages)
+
+        budget = self.token_budget
+        if budget is None:
+            return False
+        budget -= reserved_tokens
+        total = self.count_tokens(memory.messages)
+        if total <= budget:
+            return False
+
+        segments = group_segments(memory.messages)
+
+        # The system prompt and the task are always kept
+        head_end = 0
+        while head_end < len(segments) and segments[head_end][0].role == Role.SYSTEM:
+            head_end += 1
+        if head_end < len(segments) and segments[head_end][0].role == Role.USER:
+            head_end += 1
+
+        # So are the most recent messages
+        tail_start = len(segments)
+        recent = 0
+        while tail_start > head_end and (
+            recent < self.settings.keep_recent_messages or tail_start == len(segments)
+        ):
+            tail_start -= 1
+            recent += len(segments[tail_start])
+
+        # Leave room for the summary that replaces the removed messages
+        target = budget - (
+            self.settings.summary_max_tokens if self.settings.summarize else 0
+        )
+        removed: List[Message] = []
+        cut = head_end
+        while cut < tail_start and total > target:
+            total -= self.count_tokens(segments[cut])
+            removed.extend(segments[cut])
+            cut += 1
+        if not removed:
+            logger.warning(
+                f"Memory is over its token budget ({total} > {budget}) but only protected messages remain"
+            )
+            return False
+
+        head = [m for segment in segments[:head_end] for m in segment]
+        rest = [m for segment in segments[cut:] for m in segment]
+        summary = await self._summarize(removed) if self.settings.summarize else None
+
+        before = len(memory.messages)
+        memory.messages = head + ([summary] if summary else []) + rest
+        logger.info(
+            f"Compacted memory from {before} to {len(memory.messages)} messages "
+            f"({'summarized' if summary else 'dropped'} {len(removed)}), "
+            f"~{self.count_tokens(memory.messages)} tokens for a budget of {budget}"
+        )
+        return True
+
+    async def _summarize(self, messages: List[Message]) -> Optional[Message]:
+        """Summarize removed messages, returning None if the summary request fails"""
+        lines = []
+        for message in messages:
+            text = message.content or ""
+            if message.tool_calls:
+                calls = ", ".join(
+                    f"{call.function.name}({call.function.arguments})"
+                    for call in message.tool_calls
+                )
+                text = f"{text}\n[tool calls: {calls}]".strip()
+            lines.append(f"{message.role}: {text[:SUMMARY_MESSAGE_CHARS]}")
+
+        prompt = SUMMARY_PROMPT.format(
+            max_tokens=self.settings.summary_max_tokens, history="\n\n".join(lines)
+        )
+        try:
+            summary = await self.summary_llm.ask(
+                [Message.user_message(prompt)], stream=False
+            )
+        except Exception as e:
+            logger.warning(
+                f"Memory summarization failed, dropping messages instead: {e}"
+            )
+            return None
+        return Message.user_message(f"{SUMMARY_PREFIX}\n{summary}")
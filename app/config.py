@@ -28,6 +28,103 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    requests_per_minute: Optional[int] = Field(
+        None,
+        description="Requests per minute allowed for this config (None for unlimited)",
+    )
+    tokens_per_minute: Optional[int] = Field(
+        None,
+        description="Tokens per minute allowed for this config (None for unlimited)",
+    )
+    max_concurrent_requests: Optional[int] = Field(
+        None,
+        description="Maximum in-flight requests for this config (None for unlimited)",
+    )
+    max_retries: int = Field(
+        6,
+        description="Maximum retries of transient errors (rate limits, timeouts, 5xx)",
+    )
+    max_connections: int = Field(
+        100, description="Maximum HTTP connections in the pool shared per base_url"
+    )
+    max_keepalive_connections: int = Field(
+        20, description="Maximum idle keep-alive connections kept in the pool"
+    )
+    keepalive_expiry: float = Field(
+        60.0, description="Seconds an idle keep-alive connection is kept open"
+    )
+    http2: bool = Field(False, description="Use HTTP/2 for requests to the provider")
+    connect_timeout: float = Field(10.0, description="HTTP connect timeout in seconds")
+    read_timeout: float = Field(600.0, description="HTTP read timeout in seconds")
+    context_window: Optional[int] = Field(
+        None, description="Context window of the model in tokens, used to budget memory"
+    )
+    prompt_cache_hints: bool = Field(
+        False,
+        description="Mark the stable prompt prefix for the provider's cache (Bedrock cache points, OpenAI prompt_cache_key)",
+    )
+    fallback_config: Optional[str] = Field(
+        None,
+        description="Name of another [llm.*] config for hedged requests and fail-over (None to hedge on this config)",
+    )
+    fallback_after_retries: int = Field(
+        1,
+        description="Retries of 5xx errors and timeouts before failing over to fallback_config",
+    )
+    hedge_percentile: Optional[float] = Field(
+        None,
+        description="Latency percentile of ask_tool after which a hedged duplicate is sent (None to disable hedging)",
+    )
+    hedge_min_samples: int = Field(
+        20, description="Latency samples needed before requests are hedged"
+    )
+    hedge_min_delay: float = Field(
+        1.0, description="Minimum seconds to wait before sending a hedged duplicate"
+    )
+    hedge_tokens_per_minute: int = Field(
+        50000, description="Maximum input tokens per minute spent on hedged duplicates"
+    )
+
+
+class LLMCacheSettings(BaseModel):
+    enabled: bool = Field(False, description="Cache LLM responses on disk")
+    path: str = Field(
+        str(PROJECT_ROOT / "cache" / "llm_responses.sqlite"),
+        description="SQLite database file for cached responses",
+    )
+    max_entries: int = Field(10000, description="Maximum number of cached responses")
+    max_size_mb: float = Field(
+        512.0, description="Maximum total size of cached responses"
+    )
+    ttl_seconds: Optional[float] = Field(
+        None, description="Seconds before a cached response expires (None for never)"
+    )
+
+
+class MemorySettings(BaseModel):
+    token_budget: Optional[int] = Field(
+        None,
+        description="Token budget for the prompt: history, system prompt and tool schemas "
+        "(None to derive it from the model's context_window)",
+    )
+    context_ratio: float = Field(
+        0.6, description="Share of the model's context_window the prompt may use"
+    )
+    keep_recent_messages: int = Field(
+        10, description="Most recent messages that are never compacted"
+    )
+    keep_images: int = Field(
+        2, description="Number of most recent image attachments kept in the history"
+    )
+    summarize: bool = Field(
+        False, description="Summarize compacted messages instead of dropping them"
+    )
+    summary_llm: Optional[str] = Field(
+        None, description="LLM config used for summaries (None for the agent's LLM)"
+    )
+    summary_max_tokens: int = Field(
+        1024, description="Target length in tokens of a summary of compacted messages"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -60,12 +157,186 @@ class SearchSettings(BaseModel):
     )
 
 
+class PrefetchSettings(BaseModel):
+    enabled: bool = Field(
+        False,
+        description="Prefetch the top search result pages while the agent decides",
+    )
+    top_k: int = Field(3, description="Number of top results prefetched per search")
+    max_concurrency: int = Field(
+        3, description="Maximum number of pages fetched at once"
+    )
+    ttl_seconds: float = Field(
+        120.0, description="Seconds a prefetched page stays usable"
+    )
+    max_entries: int = Field(32, description="Maximum number of prefetched pages kept")
+    max_page_bytes: int = Field(
+        2_000_000, description="Pages larger than this are not kept"
+    )
+    timeout: float = Field(
+        10.0, description="Timeout in seconds of a single page fetch"
+    )
+    serve_navigation: bool = Field(
+        True,
+        description="Serve the main document of browser navigations from prefetched pages",
+    )
+
+
+class TracingSettings(BaseModel):
+    enabled: bool = Field(False, description="Record tracing spans and export traces")
+    output_dir: str = Field(
+        "traces",
+        description="Directory of exported traces, relative to the project root",
+    )
+    formats: List[str] = Field(
+        default_factory=lambda: ["chrome", "otlp"],
+        description="Export formats: 'chrome' (trace-event JSON) and/or 'otlp' (OTLP JSON)",
+    )
+    max_spans_per_trace: int = Field(
+        100000, description="Spans kept per trace, later ones are dropped"
+    )
+
+
+class RoutingSettings(BaseModel):
+    enabled: bool = Field(
+        False, description="Route simple agent steps to a lighter LLM config"
+    )
+    light_config: str = Field(
+        "light", description="Name of the [llm.*] config serving simple steps"
+    )
+    light_tools: List[str] = Field(
+        default_factory=lambda: [
+            "shell_view",
+            "shell_wait",
+            "file_read",
+            "file_find_by_name",
+            "browser_view",
+            "idle",
+        ],
+        description="Tools whose results are simple to follow up on: a step after only these goes to light_config",
+    )
+    max_history_messages: int = Field(
+        60, description="Longer histories always use the full model"
+    )
+    max_consecutive_light_steps: int = Field(
+        5,
+        description="After this many light steps in a row the next one uses the full model",
+    )
+    classifier_threshold: float = Field(
+        0.5, description="Minimum score of a custom step classifier for the light model"
+    )
+
+
+class ToolSelectionSettings(BaseModel):
+    enabled: bool = Field(
+        False, description="Send only the tool schemas relevant to each step"
+    )
+    top_k: int = Field(8, description="Most relevant tools sent per step")
+    pinned_tools: List[str] = Field(
+        default_factory=lambda: ["terminate", "idle", "message_ask_user"],
+        description="Tools sent with every step when the agent has them",
+    )
+    min_tools: int = Field(
+        16, description="Collections with at most this many tools are always sent whole"
+    )
+
+
+class SessionPoolSettings(BaseModel):
+    max_sessions: int = Field(
+        32,
+        description="Agent sessions kept in memory, least recently used ones are evicted",
+    )
+    idle_timeout: float = Field(
+        1800.0, description="Seconds without requests after which a session is evicted"
+    )
+    reap_interval: float = Field(
+        60.0, description="Seconds between idle session sweeps"
+    )
+    max_snapshots: int = Field(
+        1000,
+        description="Conversation histories of evicted sessions kept for rehydration",
+    )
+    warm_agents: int = Field(
+        0, description="Ready agents kept for new sessions, 0 to build them on demand"
+    )
+
+
+class TaskQueueSettings(BaseModel):
+    max_concurrent_runs: int = Field(
+        8, description="Agent runs executing at the same time"
+    )
+    max_queued_runs: int = Field(
+        32, description="Agent runs waiting for a slot, further requests are rejected"
+    )
+    retry_after: float = Field(
+        10.0,
+        description="Retry hint (seconds) for rejected requests before run times are known",
+    )
+
+
+class WebSocketSettings(BaseModel):
+    max_pending_events: int = Field(
+        256,
+        description="Events queued per connection before the slow consumer policy applies",
+    )
+    coalesce_window: float = Field(
+        0.05,
+        description="Seconds bursts of terminal/editor/thought events are gathered into one frame",
+    )
+    max_batch_events: int = Field(
+        64, description="Events sent in one batched frame at most"
+    )
+    slow_consumer_policy: str = Field(
+        "drop",
+        description="'drop': drop intermediate terminal/editor/thought events; 'disconnect': close the connection",
+    )
+    send_timeout: float = Field(
+        10.0,
+        description="Seconds a frame may take to send before the client is disconnected",
+    )
+    per_message_deflate: bool = Field(
+        True,
+        description="Offer permessage-deflate compression when the app is run directly",
+    )
+    ui_deltas: bool = Field(
+        True,
+        description="Send editor, terminal and plan updates as versioned deltas against the previous state",
+    )
+    max_ui_streams: int = Field(
+        64,
+        description="Editor/terminal/plan streams remembered per connection for deltas",
+    )
+
+
 class RunflowSettings(BaseModel):
     use_data_analysis_agent: bool = Field(
         default=False, description="Enable data analysis agent in run flow"
     )
 
 
+class AgentSettings(BaseModel):
+    think_mode: str = Field(
+        default="two_phase",
+        description="How ToolCallAgent decides each step: 'two_phase' (separate reasoning "
+        "and tool-selection requests) or 'single_call' (one tool request returning both)",
+    )
+    stream_tool_calls: bool = Field(
+        default=False,
+        description="Stream tool requests, forwarding reasoning deltas to the callback handler "
+        "and dispatching each tool call as soon as its arguments are complete",
+    )
+    max_parallel_tool_calls: int = Field(
+        default=4,
+        description="Maximum number of non-conflicting tool calls of a step executed "
+        "concurrently (1 executes them one after another)",
+    )
+    memoize_tool_results: bool = Field(
+        default=True,
+        description="Reuse the results of cacheable read-only tool calls (file reads, "
+        "searches, browser views) repeated with the same arguments within a run",
+    )
+
+
 class BrowserSettings(BaseModel):
     headless: bool = Field(False, description="Whether to run browser in headless mode")
     disable_security: bool = Field(
@@ -167,6 +438,36 @@ class AppConfig(BaseModel):
     run_flow_config: Optional[RunflowSettings] = Field(
         None, description="Run flow configuration"
     )
+    agent_config: Optional[AgentSettings] = Field(
+        None, description="Agent configuration"
+    )
+    llm_cache_config: Optional[LLMCacheSettings] = Field(
+        None, description="LLM response cache configuration"
+    )
+    memory_config: Optional[MemorySettings] = Field(
+        None, description="Agent memory compaction configuration"
+    )
+    prefetch_config: Optional[PrefetchSettings] = Field(
+        None, description="Search result prefetch configuration"
+    )
+    tracing_config: Optional[TracingSettings] = Field(
+        None, description="Tracing configuration"
+    )
+    routing_config: Optional[RoutingSettings] = Field(
+        None, description="Model routing configuration"
+    )
+    tool_selection_config: Optional[ToolSelectionSettings] = Field(
+        None, description="Tool schema selection configuration"
+    )
+    session_pool_config: Optional[SessionPoolSettings] = Field(
+        None, description="Agent session pool configuration"
+    )
+    task_queue_config: Optional[TaskQueueSettings] = Field(
+        None, description="Agent run admission configuration"
+    )
+    websocket_config: Optional[WebSocketSettings] = Field(
+        None, description="WebSocket outbound queue configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -224,6 +525,24 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "requests_per_minute": base_llm.get("requests_per_minute"),
+            "tokens_per_minute": base_llm.get("tokens_per_minute"),
+            "max_concurrent_requests": base_llm.get("max_concurrent_requests"),
+            "max_retries": base_llm.get("max_retries", 6),
+            "max_connections": base_llm.get("max_connections", 100),
+            "max_keepalive_connections": base_llm.get("max_keepalive_connections", 20),
+            "keepalive_expiry": base_llm.get("keepalive_expiry", 60.0),
+            "http2": base_llm.get("http2", False),
+            "connect_timeout": base_llm.get("connect_timeout", 10.0),
+            "read_timeout": base_llm.get("read_timeout", 600.0),
+            "context_window": base_llm.get("context_window"),
+            "prompt_cache_hints": base_llm.get("prompt_cache_hints", False),
+            "fallback_config": base_llm.get("fallback_config"),
+            "fallback_after_retries": base_llm.get("fallback_after_retries", 1),
+            "hedge_percentile": base_llm.get("hedge_percentile"),
+            "hedge_min_samples": base_llm.get("hedge_min_samples", 20),
+            "hedge_min_delay": base_llm.get("hedge_min_delay", 1.0),
+            "hedge_tokens_per_minute": base_llm.get("hedge_tokens_per_minute", 50000),
         }
 
         # handle browser config.
@@ -283,6 +602,57 @@ class Config:
             run_flow_settings = RunflowSettings(**run_flow_config)
         else:
             run_flow_settings = RunflowSettings()
+
+        agent_config = raw_config.get("agent")
+        if agent_config:
+            agent_settings = AgentSettings(**agent_config)
+        else:
+            agent_settings = AgentSettings()
+        llm_cache_config = raw_config.get("llm_cache")
+        if llm_cache_config:
+            llm_cache_settings = LLMCacheSettings(**llm_cache_config)
+        else:
+            llm_cache_settings = LLMCacheSettings()
+        memory_config = raw_config.get("memory")
+        if memory_config:
+            memory_settings = MemorySettings(**memory_config)
+        else:
+            memory_settings = MemorySettings()
+        prefetch_config = raw_config.get("prefetch")
+        if prefetch_config:
+            prefetch_settings = PrefetchSettings(**prefetch_config)
+        else:
+            prefetch_settings = PrefetchSettings()
+        tracing_config = raw_config.get("tracing")
+        if tracing_config:
+            tracing_settings = TracingSettings(**tracing_config)
+        else:
+            tracing_settings = TracingSettings()
+        routing_config = raw_config.get("routing")
+        if routing_config:
+            routing_settings = RoutingSettings(**routing_config)
+        else:
+            routing_settings = RoutingSettings()
+        tool_selection_config = raw_config.get("tool_selection")
+        if tool_selection_config:
+            tool_selection_settings = ToolSelectionSettings(**tool_selection_config)
+        else:
+            tool_selection_settings = ToolSelectionSettings()
+        session_pool_config = raw_config.get("session_pool")
+        if session_pool_config:
+            session_pool_settings = SessionPoolSettings(**session_pool_config)
+        else:
+            session_pool_settings = SessionPoolSettings()
+        task_queue_config = raw_config.get("task_queue")
+        if task_queue_config:
+            task_queue_settings = TaskQueueSettings(**task_queue_config)
+        else:
+            task_queue_settings = TaskQueueSettings()
+        websocket_config = raw_config.get("websocket")
+        if websocket_config:
+            websocket_settings = WebSocketSettings(**websocket_config)
+        else:
+            websocket_settings = WebSocketSettings()
         config_dict = {
             "llm": {
                 "default": default_settings,
@@ -296,6 +666,16 @@ class Config:
             "search_config": search_settings,
             "mcp_config": mcp_settings,
             "run_flow_config": run_flow_settings,
+            "agent_config": agent_settings,
+            "llm_cache_config": llm_cache_settings,
+            "memory_config": memory_settings,
+            "prefetch_config": prefetch_settings,
+            "tracing_config": tracing_settings,
+            "routing_config": routing_settings,
+            "tool_selection_config": tool_selection_settings,
+            "session_pool_config": session_pool_settings,
+            "task_queue_config": task_queue_settings,
+            "websocket_config": websocket_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -326,6 +706,56 @@ class Config:
         """Get the Run Flow configuration"""
         return self._config.run_flow_config
 
+    @property
+    def agent_config(self) -> AgentSettings:
+        """Get the Agent configuration"""
+        return self._config.agent_config
+
+    @property
+    def llm_cache_config(self) -> LLMCacheSettings:
+        """Get the LLM response cache configuration"""
+        return self._config.llm_cache_config
+
+    @property
+    def memory_config(self) -> MemorySettings:
+        """Get the agent memory compaction configuration"""
+        return self._config.memory_config
+
+    @property
+    def prefetch_config(self) -> PrefetchSettings:
+        """Get the search result prefetch configuration"""
+        return self._config.prefetch_config
+
+    @property
+    def tracing_config(self) -> TracingSettings:
+        """Get the tracing configuration"""
+        return self._config.tracing_config
+
+    @property
+    def routing_config(self) -> RoutingSettings:
+        """Get the model routing configuration"""
+        return self._config.routing_config
+
+    @property
+    def tool_selection_config(self) -> ToolSelectionSettings:
+        """Get the tool schema selection configuration"""
+        return self._config.tool_selection_config
+
+    @property
+    def session_pool_config(self) -> SessionPoolSettings:
+        """Get the agent session pool configuration"""
+        return self._config.session_pool_config
+
+    @property
+    def task_queue_config(self) -> TaskQueueSettings:
+        """Get the agent run admission configuration"""
+        return self._config.task_queue_config
+
+    @property
+    def websocket_config(self) -> WebSocketSettings:
+        """Get the WebSocket outbound queue configuration"""
+        return self._config.websocket_config
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
@@ -0,0 +1,198 @@
+"""Non-blocking delivery of agent events to a WebSocket client.
+
+Agents and tools ``await`` their callback handler inline, so sending straight to
+the socket would let a slow or stalled browser slow down tool execution and the
+agent loop. An ``EventChannel`` instead queues events per connection and a
+background task sends them:
+
+- streamed thought deltas are concatenated and a newer ``code_editor`` event (the
+  whole file) replaces a pending one;
+- bursts of terminal, editor and thought events are gathered for
+  ``coalesce_window`` seconds and sent as one ``{"type": "batch", "events": [...]}``
+  frame;
+- when ``max_pending_events`` are waiting, the slow consumer policy either drops
+  the oldest of those intermediate events or disconnects the client;
+- editor, terminal and plan updates are encoded as deltas against what this
+  client was last sent (see ``app.ui_state``). Encoding happens when a frame is
+  built, so events merged away or dropped never break a client's version chain.
+"""
+import asyncio
+import json
+from collections import deque
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from app import metrics
+from app.config import WebSocketSettings, config
+from app.logger import logger
+from app.ui_state import UIStateTracker
+
+
+# Events that only show progress: batched, and dropped first for slow clients
+COALESCED_EVENTS = frozenset({"terminal_output", "code_editor", "thought_delta"})
+DISCONNECT = "disconnect"
+# Close code "Try Again Later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class EventChannel:
+    """Outbound event queue of one WebSocket connection, drained by a sender task."""
+
+    def __init__(
+        self,
+        send_text: Callable[[str], Awaitable[None]],
+        close: Callable[[int], Awaitable[None]],
+        settings: Optional[WebSocketSettings] = None,
+        on_closed: Optional[Callable[["EventChannel"], None]] = None,
+    ):
+        self.settings = settings or config.websocket_config or WebSocketSettings()
+        self._send_text = send_text
+        self._close = close
+        self._on_closed = on_closed
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+        # Set when everything queued has been sent
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._sender: Optional[asyncio.Task] = None
+        self.closed = False
+        self.dropped = 0
+        self.ui_state = (
+            UIStateTracker(self.settings.max_ui_streams)
+            if self.settings.ui_deltas
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def start(self) -> None:
+        self._sender = asyncio.create_task(self._run())
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """Queue an event without waiting for the client."""
+        if self.closed:
+            return
+        if self._merge(event):
+            return
+        if (
+            len(self._pending) >= self.settings.max_pending_events
+            and not self._make_room()
+        ):
+            return
+        self._pending.append(event)
+        self._ready.set()
+        self._idle.clear()
+
+    def _merge(self, event: Dict[str, Any]) -> bool:
+        """Fold an event into the last pending one when the client only needs the result."""
+        if not self._pending:
+            return False
+        last = self._pending[-1]
+        kind = event.get("type")
+        if kind != last.get("type"):
+            return False
+        if kind == "thought_delta" and set(event) == set(last):
+            last["content"] = f"{last.get('content') or ''}{event.get('content') or ''}"
+            return True
+        if kind == "code_editor" and event.get("path") == last.get("path"):
+            self._pending[-1] = event
+            metrics.WEBSOCKET_DROPPED_EVENTS.labels("superseded").inc()
+            return True
+        return False
+
+    def _make_room(self) -> bool:
+        """Apply the slow consumer policy to a full queue; False if the event must be dropped."""
+        if self.settings.slow_consumer_policy == DISCONNECT:
+            self._disconnect_slow("queue full")
+            return False
+        for index, pending in enumerate(self._pending):
+            if pending.get("type") in COALESCED_EVENTS:
+                del self._pending[index]
+                self.dropped += 1
+                metrics.WEBSOCKET_DROPPED_EVENTS.labels("slow_consumer").inc()
+                return True
+        # Only final events (responses, errors) are waiting: keep them up to a hard limit
+        if len(self._pending) >= 2 * self.settings.max_pending_events:
+            self._disconnect_slow("queue full of undroppable events")
+            return False
+        return True
+
+    def resync(self, stream_id: Optional[str] = None) -> None:
+        """Send a stream (or all of them) again in full, after the client lost track of it."""
+        if self.ui_state is None:
+            return
+        # A pending update of the stream will go out as the snapshot itself
+        pending = {UIStateTracker.stream_id(event) for event in self._pending}
+        for event in self.ui_state.resync(stream_id):
+            if UIStateTracker.stream_id(event) not in pending:
+                self.publish(event)
+
+    def _disconnect_slow(self, reason: str) -> None:
+        logger.warning(f"Disconnecting slow WebSocket client ({reason})")
+        metrics.WEBSOCKET_SLOW_DISCONNECTS.inc()
+        asyncio.ensure_future(self.close(SLOW_CONSUMER_CLOSE_CODE))
+
+    def _next_frame(self) -> Dict[str, Any]:
+        events: List[Dict[str, Any]] = []
+        while self._pending and len(events) < self.settings.max_batch_events:
+            events.append(self._encode(self._pending.popleft()))
+        if not self._pending:
+            self._ready.clear()
+        if len(events) == 1:
+            metrics.WEBSOCKET_FRAMES.labels("event").inc()
+            return events[0]
+        metrics.WEBSOCKET_FRAMES.labels("batch").inc()
+        return {"type": "batch", "events": events}
+
+    def _encode(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        if self.ui_state is None:
+            return event
+        encoded = self.ui_state.encode(event)
+        if "mode" in encoded:
+            metrics.WEBSOCKET_UI_UPDATES.labels(encoded["mode"]).inc()
+        return encoded
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                if self._pending[0].get("type") in COALESCED_EVENTS:
+                    # Progress events come in bursts: give the rest of the burst a moment
+                    await asyncio.sleep(self.settings.coalesce_window)
+                frame = self._next_frame()
+                text = json.dumps(frame, ensure_ascii=False, default=str)
+                try:
+                    await asyncio.wait_for(
+                        self._send_text(text), self.settings.send_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self._disconnect_slow(
+                        f"send took over {self.settings.send_timeout}s"
+                    )
+                    return
+                if not self._pending:
+                    self._idle.set()
+        except Exception as e:
+            logger.warning(f"Could not send to WebSocket client: {e}")
+            asyncio.ensure_future(self.close())
+
+    async def close(self, code: int = 1000) -> None:
+        """Stop sending and close the connection; pending events are discarded."""
+        if self.closed:
+            return
+        self.closed = True
+        self._pending.clear()
+        self._idle.set()
+        if self._sender is not None and self._sender is not asyncio.current_task():
+            self._sender.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sender
+        with suppress(Exception):
+            await self._close(code)
+        if self._on_closed:
+            self._on_closed(self)
+
+    async def drain(self) -> None:
+        """Wait until every queued event has been sent or the channel is closed."""
+        await self._idle.wait()
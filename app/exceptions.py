@@ -11,3 +11,7 @@ class OpenManusError(Exception):
 
 class TokenLimitExceeded(OpenManusError):
     """Exception raised when the token limit is exceeded"""
+
+
+class LLMStreamInterrupted(OpenManusError):
+    """Exception raised when a streamed response fails after part of it was already consumed"""
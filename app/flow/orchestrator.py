@@ -1,11 +1,12 @@
 # --- INIZIO MODIFICA: Aggiunta import necessari ---
-from typing import Dict, List, Union, Callable, Awaitable
+from typing import Any, Dict, List, Optional, Union, Callable, Awaitable
 # --- FINE MODIFICA ---
 
 from app.agent.base import BaseAgent
 from app.flow.base import BaseFlow
 from app.utils.scratchpad import Scratchpad
 from app.logger import logger
+from app.tracing import traced_callback
 
 class OrchestratorFlow(BaseFlow):
     """
@@ -13,23 +14,27 @@ class OrchestratorFlow(BaseFlow):
     using a shared scratchpad.
     """
 
+    callback_handler: Optional[Callable[[str, Any], Awaitable[None]]] = None
+
     # --- INIZIO MODIFICA: Aggiunta del metodo __init__ ---
     def __init__(self,
                  agents: Dict[str, BaseAgent],
-                 primary_agent_name: str,
+                 primary_agent_key: Optional[str] = None,
                  callback_handler: Callable[[str, any], Awaitable[None]] = None):
         """
         Inizializza l'OrchestratorFlow.
 
         Args:
             agents: Un dizionario di tutti gli agenti disponibili per il flusso.
-            primary_agent_name: Il nome dell'agente che funge da orchestratore.
+            primary_agent_key: Il nome dell'agente che funge da orchestratore.
             callback_handler: La funzione asincrona per inviare messaggi al frontend.
         """
         # Chiama il costruttore della classe base per impostare gli agenti
-        super().__init__(agents, primary_agent_name)
-
-        self.callback_handler = callback_handler
+        super().__init__(
+            agents,
+            primary_agent_key=primary_agent_key,
+            callback_handler=traced_callback(callback_handler),
+        )
 
         # Inietta il callback_handler in OGNI agente gestito da questo flusso.
         # Questo è il passaggio cruciale: ora sia l'agente primario che quelli
@@ -1,6 +1,14 @@
+import asyncio
+import hashlib
+import json
 import math
-from typing import Dict, List, Optional, Union
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
+import httpx
 import tiktoken
 from openai import (
     APIError,
@@ -10,17 +18,25 @@ from openai import (
     OpenAIError,
     RateLimitError,
 )
-from openai.types.chat import ChatCompletion, ChatCompletionMessage
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_random_exponential,
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionMessage,
+    ChatCompletionMessageToolCall,
 )
 
+from app import metrics
 from app.bedrock import BedrockClient
 from app.config import LLMSettings, config
-from app.exceptions import TokenLimitExceeded
+from app.exceptions import LLMStreamInterrupted, TokenLimitExceeded
+from app.llm_cache import LLMResponseCache
+from app.llm_hedging import FALLBACK, HEDGE, PRIMARY, LatencyWindow, hedged_request
+from app.llm_router import (
+    RouteDecision,
+    StepFeatures,
+    model_router,
+    record_routed_usage,
+)
+from app.llm_scheduler import LLMRequestScheduler, TokenBucket, is_failover_error
 from app.logger import logger  # Assuming a logger is set up in your app
 from app.schema import (
     ROLE_VALUES,
@@ -29,6 +45,8 @@ from app.schema import (
     Message,
     ToolChoice,
 )
+from app.token_ledger import current_session, record_usage
+from app.tracing import traced, tracer
 
 
 REASONING_MODELS = ["o1", "o3-mini"]
@@ -41,6 +59,9 @@ MULTIMODAL_MODELS = [
     "claude-3-haiku-20240307",
 ]
 
+ContentCallback = Callable[[str], Awaitable[None]]
+ToolCallCallback = Callable[[ChatCompletionMessageToolCall], Awaitable[None]]
+
 
 class TokenCounter:
     # Token constants
@@ -54,8 +75,17 @@ class TokenCounter:
     HIGH_DETAIL_TARGET_SHORT_SIDE = 768
     TILE_SIZE = 512
 
-    def __init__(self, tokenizer):
+    # Per-message cache constants
+    MESSAGE_CACHE_SIZE = 4096
+
+    def __init__(self, tokenizer, cache_size: int = MESSAGE_CACHE_SIZE):
         self.tokenizer = tokenizer
+        # LRU cache of per-message token counts keyed by a hash of the message,
+        # so a growing history only pays tokenization for newly added messages
+        self._message_cache: "OrderedDict[str, int]" = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def count_text(self, text: str) -> int:
         """Calculate tokens for a text string"""
@@ -144,31 +174,257 @@ class TokenCounter:
                 token_count += self.count_text(function.get("arguments", ""))
         return token_count
 
+    def count_single_message_tokens(self, message: dict) -> int:
+        """Calculate the number of tokens in a single message, without caching"""
+        tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+
+        # Add role tokens
+        tokens += self.count_text(message.get("role", ""))
+
+        # Add content tokens
+        if "content" in message:
+            tokens += self.count_content(message["content"])
+
+        # Add tool calls tokens
+        if "tool_calls" in message:
+            tokens += self.count_tool_calls(message["tool_calls"])
+
+        # Add name and tool_call_id tokens
+        tokens += self.count_text(message.get("name", ""))
+        tokens += self.count_text(message.get("tool_call_id", ""))
+
+        return tokens
+
+    @staticmethod
+    def _message_key(message: dict) -> str:
+        """Build a stable content hash for a formatted message"""
+        payload = json.dumps(message, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _cached_message_tokens(self, message: dict) -> int:
+        """Return the token count of a message, tokenizing only on cache miss"""
+        if self.cache_size <= 0:
+            self.cache_misses += 1
+            return self.count_single_message_tokens(message)
+
+        key = self._message_key(message)
+        tokens = self._message_cache.get(key)
+        if tokens is not None:
+            self.cache_hits += 1
+            self._message_cache.move_to_end(key)
+            return tokens
+
+        self.cache_misses += 1
+        tokens = self.count_single_message_tokens(message)
+        self._message_cache[key] = tokens
+        if len(self._message_cache) > self.cache_size:
+            self._message_cache.popitem(last=False)
+        return tokens
+
     def count_message_tokens(self, messages: List[dict]) -> int:
         """Calculate the total number of tokens in a message list"""
         total_tokens = self.FORMAT_TOKENS  # Base format tokens
 
         for message in messages:
-            tokens = self.BASE_MESSAGE_TOKENS  # Base tokens per message
+            total_tokens += self._cached_message_tokens(message)
 
-            # Add role tokens
-            tokens += self.count_text(message.get("role", ""))
+        return total_tokens
 
-            # Add content tokens
-            if "content" in message:
-                tokens += self.count_content(message["content"])
+    def cache_info(self) -> Dict[str, float]:
+        """Return hit/miss statistics for the per-message token cache"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self._message_cache),
+            "max_size": self.cache_size,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+        }
+
+    def clear_cache(self) -> None:
+        """Drop all cached message counts and reset the statistics"""
+        self._message_cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+def cached_prompt_tokens(usage) -> int:
+    """Prompt tokens a response reports as read from the provider's prefix cache"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def stable_tool_order(tools: Optional[List[dict]]) -> Optional[List[dict]]:
+    """Tools sorted by name, so the cacheable request prefix does not depend on registration order"""
+    if not tools:
+        return tools
+    return sorted(tools, key=lambda tool: tool.get("function", {}).get("name", ""))
+
+
+class ToolCallStreamAssembler:
+    """Assemble streamed tool call deltas into complete tool calls.
+
+    Argument fragments are scanned as they arrive, so a tool call is reported as
+    complete as soon as its JSON arguments close rather than when the stream ends.
+    Calls are always released in index order.
+    """
+
+    def __init__(self):
+        self._calls: Dict[int, dict] = {}
+        self._emitted = 0
+
+    def feed(self, delta_tool_calls: Optional[list]) -> List[ChatCompletionMessageToolCall]:
+        """Consume the tool call deltas of one chunk and return newly completed calls"""
+        for delta in delta_tool_calls or []:
+            call = self._calls.setdefault(
+                delta.index,
+                {
+                    "id": "",
+                    "name": "",
+                    "arguments": "",
+                    "depth": 0,
+                    "in_string": False,
+                    "escape": False,
+                    "closed": False,
+                },
+            )
+            if delta.id:
+                call["id"] = delta.id
+            function = delta.function
+            if function is None:
+                continue
+            if function.name:
+                call["name"] += function.name
+            if function.arguments:
+                call["arguments"] += function.arguments
+                if not call["closed"]:
+                    self._scan(call, function.arguments)
+        return self._release(final=False)
+
+    def finish(self) -> List[ChatCompletionMessageToolCall]:
+        """Release every remaining call once the stream has ended"""
+        return self._release(final=True)
+
+    @property
+    def tool_calls(self) -> List[ChatCompletionMessageToolCall]:
+        """All calls seen so far, in index order"""
+        return [self._build(self._calls[i]) for i in sorted(self._calls)]
 
-            # Add tool calls tokens
-            if "tool_calls" in message:
-                tokens += self.count_tool_calls(message["tool_calls"])
+    @staticmethod
+    def _scan(call: dict, fragment: str) -> None:
+        """Track JSON nesting so we know when the top-level object closes"""
+        for char in fragment:
+            if call["in_string"]:
+                if call["escape"]:
+                    call["escape"] = False
+                elif char == "\\":
+                    call["escape"] = True
+                elif char == '"':
+                    call["in_string"] = False
+            elif char == '"':
+                call["in_string"] = True
+            elif char in "{[":
+                call["depth"] += 1
+            elif char in "}]":
+                call["depth"] -= 1
+                if call["depth"] == 0:
+                    call["closed"] = True
+                    return
+
+    def _is_complete(self, call: dict) -> bool:
+        if not call["closed"]:
+            return False
+        try:
+            json.loads(call["arguments"])
+        except json.JSONDecodeError:
+            return False
+        return True
 
-            # Add name and tool_call_id tokens
-            tokens += self.count_text(message.get("name", ""))
-            tokens += self.count_text(message.get("tool_call_id", ""))
+    def _release(self, final: bool) -> List[ChatCompletionMessageToolCall]:
+        released = []
+        indexes = sorted(self._calls)
+        while self._emitted < len(indexes):
+            call = self._calls[indexes[self._emitted]]
+            if not final and not self._is_complete(call):
+                break
+            released.append(self._build(call))
+            self._emitted += 1
+        return released
 
-            total_tokens += tokens
+    @staticmethod
+    def _build(call: dict) -> ChatCompletionMessageToolCall:
+        return ChatCompletionMessageToolCall(
+            id=call["id"],
+            type="function",
+            function={"name": call["name"], "arguments": call["arguments"]},
+        )
 
-        return total_tokens
+
+class SharedHTTPClients:
+    """Process-wide httpx clients, one connection pool per provider endpoint and event loop.
+
+    Every `LLM` pointing at the same endpoint with the same pool settings reuses the
+    same warm keep-alive connections, so agents and sessions do not pay a TLS
+    handshake per client. Connections are bound to the loop that opened them, so
+    each running loop gets its own clients; those of a closed loop are dropped.
+    """
+
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, httpx.AsyncClient]]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    @staticmethod
+    def _key(llm_config: LLMSettings) -> tuple:
+        return (
+            (llm_config.base_url or "").rstrip("/"),
+            llm_config.http2,
+            llm_config.max_connections,
+            llm_config.max_keepalive_connections,
+            llm_config.keepalive_expiry,
+            llm_config.connect_timeout,
+            llm_config.read_timeout,
+        )
+
+    @classmethod
+    def get(cls, llm_config: LLMSettings) -> httpx.AsyncClient:
+        """Get (or create) the pooled client for the config on the running loop"""
+        loop = asyncio.get_running_loop()
+        for stale in [other for other in cls._clients if other.is_closed()]:
+            cls._clients.pop(stale, None)
+        clients = cls._clients.setdefault(loop, {})
+        key = cls._key(llm_config)
+        client = clients.get(key)
+        if client is None or client.is_closed:
+            http2 = llm_config.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning(
+                        "HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1"
+                    )
+                    http2 = False
+            client = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=llm_config.max_connections,
+                    max_keepalive_connections=llm_config.max_keepalive_connections,
+                    keepalive_expiry=llm_config.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(
+                    llm_config.read_timeout, connect=llm_config.connect_timeout
+                ),
+                follow_redirects=True,
+            )
+            clients[key] = client
+        return client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the pooled clients of the running loop, e.g. on application shutdown"""
+        clients = cls._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
 
 
 class LLM:
@@ -186,9 +442,10 @@ class LLM:
     def __init__(
         self, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
-        if not hasattr(self, "client"):  # Only initialize if not already initialized
+        if not hasattr(self, "_client"):  # Only initialize if not already initialized
             llm_config = llm_config or config.llm
             llm_config = llm_config.get(config_name, llm_config["default"])
+            self.config_name = config_name
             self.model = llm_config.model
             self.max_tokens = llm_config.max_tokens
             self.temperature = llm_config.temperature
@@ -200,11 +457,29 @@ class LLM:
             # Add token counting related attributes
             self.total_input_tokens = 0
             self.total_completion_tokens = 0
+            self.total_cached_tokens = 0
             self.max_input_tokens = (
                 llm_config.max_input_tokens
                 if hasattr(llm_config, "max_input_tokens")
                 else None
             )
+            self.context_window = llm_config.context_window
+            self.prompt_cache_hints = llm_config.prompt_cache_hints
+
+            # Hedging and fail-over of tool requests
+            self.fallback_config = llm_config.fallback_config
+            self.fallback_after_retries = llm_config.fallback_after_retries
+            self.hedge_percentile = llm_config.hedge_percentile
+            self.hedge_min_samples = llm_config.hedge_min_samples
+            self.hedge_min_delay = llm_config.hedge_min_delay
+            self.hedge_budget = TokenBucket(llm_config.hedge_tokens_per_minute)
+            self.tool_latency = LatencyWindow()
+            self.hedge_stats: Dict[str, int] = {
+                "hedged": 0,
+                "hedge_wins": 0,
+                "failovers": 0,
+                "wasted_tokens": 0,
+            }
 
             # Initialize tokenizer
             try:
@@ -213,57 +488,318 @@ class LLM:
                 # If the model is not in tiktoken's presets, use cl100k_base as default
                 self.tokenizer = tiktoken.get_encoding("cl100k_base")
 
-            if self.api_type == "azure":
-                self.client = AsyncAzureOpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key,
-                    api_version=self.api_version,
+            # OpenAI-compatible clients are built per event loop on first use, see `client`
+            self.llm_config = llm_config
+            self._client: Any = None
+            self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, Any]]" = (
+                weakref.WeakKeyDictionary()
+            )
+            if self.api_type == "aws":
+                self._client = BedrockClient(
+                    max_workers=llm_config.max_concurrent_requests
                 )
-            elif self.api_type == "aws":
-                self.client = BedrockClient()
-            else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+
+            self.scheduler = LLMRequestScheduler.for_config(config_name, llm_config)
+            self.response_cache = LLMResponseCache.from_settings(config.llm_cache_config)
 
             self.token_counter = TokenCounter(self.tokenizer)
 
+    @property
+    def client(self) -> Any:
+        """The provider client, bound to the pooled connections of the running loop"""
+        if self._client is not None:
+            return self._client
+        http_client = SharedHTTPClients.get(self.llm_config)
+        loop = asyncio.get_running_loop()
+        cached = self._loop_clients.get(loop)
+        if cached is not None and cached[0] is http_client:
+            return cached[1]
+        # Retries are owned by the shared scheduler, so the SDK must not retry on its own
+        if self.api_type == "azure":
+            client = AsyncAzureOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                api_version=self.api_version,
+                max_retries=0,
+                http_client=http_client,
+            )
+        else:
+            client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=http_client,
+            )
+        self._loop_clients[loop] = (http_client, client)
+        return client
+
+    @client.setter
+    def client(self, client: Any) -> None:
+        self._client = client
+
+    @traced("llm.count_tokens")
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
         if not text:
             return 0
         return len(self.tokenizer.encode(text))
 
+    @traced("llm.count_message_tokens")
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
-    def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
-        """Update token counts"""
+    def token_cache_info(self) -> Dict[str, float]:
+        """Return hit/miss statistics of the per-message token count cache"""
+        return self.token_counter.cache_info()
+
+    async def _cache_lookup(
+        self, kind: str, params: dict
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Return the response cache key for a request and the cached response, if any"""
+        if not self.response_cache:
+            return None, None
+        key = self.response_cache.make_key(
+            kind,
+            params["model"],
+            params["messages"],
+            tools=params.get("tools"),
+            tool_choice=params.get("tool_choice"),
+            temperature=params.get("temperature"),
+            max_tokens=params.get("max_tokens", params.get("max_completion_tokens")),
+        )
+        cached = await self.response_cache.aget(key)
+        self.response_cache.log_stats("hit" if cached is not None else "miss")
+        tracer.set_attributes(response_cache="hit" if cached is not None else "miss")
+        return key, cached
+
+    async def _cache_store(self, key: Optional[str], kind: str, value: str) -> None:
+        """Store a response under a key obtained from `_cache_lookup`"""
+        if key and self.response_cache:
+            await self.response_cache.aset(key, kind, value)
+
+    @staticmethod
+    def _replayed_tool_message(cached: str) -> ChatCompletionMessage:
+        """
+        A cached tool response with new tool call ids.
+
+        The same response may be replayed several times in one history, and providers
+        reject histories where tool call ids repeat.
+        """
+        message = ChatCompletionMessage.model_validate_json(cached)
+        for tool_call in message.tool_calls or []:
+            tool_call.id = f"call_{uuid.uuid4().hex[:24]}"
+        return message
+
+    def _with_cache_hints(self, params: dict) -> dict:
+        """
+        Mark the stable request prefix for the provider's prompt cache.
+
+        Bedrock gets cache points after the system prompt, the tools and the history.
+        OpenAI caches prefixes automatically; a `prompt_cache_key` derived from the
+        system prompt and tools routes requests sharing them to the same cache.
+        """
+        if self.api_type == "aws":
+            return {**params, "prompt_cache": True}
+        if self.api_type in ("", "openai"):
+            hasher = hashlib.sha256()
+            messages = params.get("messages") or []
+            if messages and messages[0].get("role") == "system":
+                hasher.update(str(messages[0].get("content")).encode())
+            for tool in params.get("tools") or []:
+                hasher.update(tool.get("function", {}).get("name", "").encode())
+            extra_body = {**params.get("extra_body", {}), "prompt_cache_key": hasher.hexdigest()[:32]}
+            return {**params, "extra_body": extra_body}
+        return params
+
+    async def _create(
+        self,
+        params: dict,
+        input_tokens: int,
+        failover_retries: Optional[int] = None,
+        **overrides,
+    ):
+        """
+        Send a chat completion request through the shared, rate-limited scheduler.
+
+        `failover_retries`, when set, caps the retries of errors a fallback config can
+        take over (5xx, timeouts); rate limits keep the config's own retries.
+        """
+        start = time.perf_counter()
+        stream = bool(overrides.get("stream", params.get("stream", False)))
+        if stream and self.api_type != "aws" and "stream_options" not in params:
+            # Without it OpenAI streams carry no usage (and no cached token count);
+            # the Bedrock adapter always reports it
+            overrides = {**overrides, "stream_options": {"include_usage": True}}
+        if self.prompt_cache_hints:
+            params = self._with_cache_hints(params)
+        try:
+            response = await self.scheduler.submit(
+                lambda: self.client.chat.completions.create(**params, **overrides),
+                estimated_tokens=input_tokens + self.max_tokens,
+                fail_fast=is_failover_error if failover_retries is not None else None,
+                fail_fast_retries=failover_retries or 0,
+                stream=stream,
+            )
+        except Exception:
+            metrics.LLM_REQUEST_FAILURES.labels(self.config_name, self.model).inc()
+            raise
+        if stream:
+            # Streams are timed until their last chunk
+            return metrics.timed_stream(response, self.config_name, self.model, start)
+        metrics.observe_llm_request(self.config_name, self.model, False, start)
+        return response
+
+    def _backup_llm(self) -> Optional["LLM"]:
+        """The LLM receiving hedged duplicates and fail-overs, None when both are off"""
+        if self.fallback_config and self.fallback_config != self.config_name:
+            if self.fallback_config not in LLM._instances and self.fallback_config not in config.llm:
+                logger.warning(f"Unknown fallback_config '{self.fallback_config}', ignoring it")
+                self.fallback_config = None
+            else:
+                return LLM(self.fallback_config)
+        return self if self.hedge_percentile is not None else None
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Seconds after which a tool request is hedged, None until enough latencies are known"""
+        if self.hedge_percentile is None or len(self.tool_latency) < max(1, self.hedge_min_samples):
+            return None
+        return max(self.hedge_min_delay, self.tool_latency.percentile(self.hedge_percentile))
+
+    async def _create_hedged(self, params: dict, input_tokens: int) -> Tuple[ChatCompletion, "LLM"]:
+        """
+        Send a tool request, hedging it when slow and failing over when the provider errors.
+
+        Returns the response and the LLM that produced it, whose counters must be updated.
+        """
+        backup_llm = self._backup_llm()
+        if backup_llm is None:
+            return await self._create(params, input_tokens), self
+
+        fails_over = backup_llm is not self
+        start = time.perf_counter()
+
+        async def primary():
+            response = await self._create(
+                params,
+                input_tokens,
+                failover_retries=self.fallback_after_retries if fails_over else None,
+            )
+            self.tool_latency.add(time.perf_counter() - start)
+            return response
+
+        async def backup():
+            return await backup_llm._create({**params, "model": backup_llm.model}, input_tokens)
+
+        def may_hedge() -> bool:
+            # Hedges draw from a per-minute token budget so a slow provider cannot double the bill
+            now = time.monotonic()
+            if self.hedge_budget.time_until(input_tokens, now) > 0:
+                return False
+            self.hedge_budget.consume(input_tokens, now)
+            self.hedge_stats["hedged"] += 1
+            metrics.LLM_HEDGES.labels(self.config_name, "hedged").inc()
+            return True
+
+        def on_loser(label: str, task) -> None:
+            if label == PRIMARY:
+                # A lower bound, but dropping slow primaries would bias the percentile down
+                self.tool_latency.add(time.perf_counter() - start)
+            response = None
+            if task.done() and not task.cancelled() and task.exception() is None:
+                response = task.result()
+            # Providers bill the prompt of a cancelled request
+            wasted = response.usage.total_tokens if response and response.usage else input_tokens
+            self.hedge_stats["wasted_tokens"] += wasted
+            metrics.LLM_HEDGE_WASTED_TOKENS.labels(self.config_name).inc(wasted)
+
+        response, winner = await hedged_request(
+            primary,
+            backup,
+            self._hedge_delay(),
+            may_hedge,
+            can_fail_over=is_failover_error if fails_over else None,
+            on_loser=on_loser,
+        )
+        if winner == HEDGE:
+            self.hedge_stats["hedge_wins"] += 1
+            metrics.LLM_HEDGES.labels(self.config_name, "hedge_won").inc()
+        elif winner == FALLBACK:
+            self.hedge_stats["failovers"] += 1
+            metrics.LLM_HEDGES.labels(self.config_name, "failover").inc()
+        if winner != PRIMARY:
+            tracer.set_attributes(llm_winner=winner, llm_config=backup_llm.config_name)
+        return response, self if winner == PRIMARY else backup_llm
+
+    def route(
+        self,
+        messages: List[Message],
+        light_streak: int = 0,
+        next_step_prompt: Optional[str] = None,
+    ) -> Tuple["LLM", Optional[RouteDecision]]:
+        """
+        The LLM that should serve the next agent step, and the routing decision.
+
+        Returns this LLM and no decision when routing is disabled.
+        """
+        if not model_router.enabled:
+            return self, None
+        decision = model_router.decide(
+            StepFeatures.from_messages(messages, light_streak, next_step_prompt),
+            self.config_name,
+        )
+        if not decision.light or decision.config_name == self.config_name:
+            return self, decision
+        if decision.config_name not in LLM._instances and decision.config_name not in config.llm:
+            logger.warning(f"Routing light_config '{decision.config_name}' is not configured")
+            return self, RouteDecision(self.config_name, "light_config_missing")
+        return LLM(decision.config_name), decision
+
+    def update_token_count(
+        self, input_tokens: int, completion_tokens: int = 0, cached_tokens: int = 0
+    ) -> None:
+        """Update token counts, `cached_tokens` being the input tokens read from the prompt cache"""
         # Only track tokens if max_input_tokens is set
         self.total_input_tokens += input_tokens
         self.total_completion_tokens += completion_tokens
+        self.total_cached_tokens += cached_tokens
+        record_usage(self.config_name, input_tokens, completion_tokens, cached_tokens)
+        record_routed_usage(input_tokens, completion_tokens)
+        tracer.add_to_current(
+            input_tokens=input_tokens, completion_tokens=completion_tokens, cached_tokens=cached_tokens
+        )
+        metrics.count_tokens(
+            self.config_name, self.model, input_tokens, completion_tokens, cached_tokens
+        )
         logger.info(
-            f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
+            f"Token usage: Input={input_tokens} (cached={cached_tokens}), Completion={completion_tokens}, "
             f"Cumulative Input={self.total_input_tokens}, Cumulative Completion={self.total_completion_tokens}, "
             f"Total={input_tokens + completion_tokens}, Cumulative Total={self.total_input_tokens + self.total_completion_tokens}"
         )
 
+    def _used_input_tokens(self) -> int:
+        """Input tokens counted against the budget: the session's if any, else the process's"""
+        session = current_session()
+        if session is not None:
+            return session.input_tokens(self.config_name)
+        return self.total_input_tokens
+
     def check_token_limit(self, input_tokens: int) -> bool:
         """Check if token limits are exceeded"""
         if self.max_input_tokens is not None:
-            return (self.total_input_tokens + input_tokens) <= self.max_input_tokens
+            return (self._used_input_tokens() + input_tokens) <= self.max_input_tokens
         # If max_input_tokens is not set, always return True
         return True
 
     def get_limit_error_message(self, input_tokens: int) -> str:
         """Generate error message for token limit exceeded"""
-        if (
-            self.max_input_tokens is not None
-            and (self.total_input_tokens + input_tokens) > self.max_input_tokens
-        ):
-            return f"Request may exceed input token limit (Current: {self.total_input_tokens}, Needed: {input_tokens}, Max: {self.max_input_tokens})"
+        used = self._used_input_tokens()
+        if self.max_input_tokens is not None and (used + input_tokens) > self.max_input_tokens:
+            return f"Request may exceed input token limit (Current: {used}, Needed: {input_tokens}, Max: {self.max_input_tokens})"
 
         return "Token limit exceeded"
 
     @staticmethod
+    @traced("llm.format_messages")
     def format_messages(
         messages: List[Union[dict, Message]], supports_images: bool = False
     ) -> List[dict]:
@@ -351,19 +887,13 @@ class LLM:
 
         return formatted_messages
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
     async def ask(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        on_content: Optional[ContentCallback] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -373,6 +903,7 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            on_content: Optional coroutine receiving streamed text deltas instead of stdout
 
         Returns:
             str: The generated response
@@ -415,47 +946,67 @@ class LLM:
             )
             # --- END CORRECTION ---
 
+            cache_key, cached = await self._cache_lookup("ask", params)
+            if cached is not None:
+                if stream and on_content:
+                    await on_content(cached)
+                return cached
+
             if not stream:
                 # Non-streaming request
-                response = await self.client.chat.completions.create(
-                    **params, stream=False
-                )
+                response = await self._create(params, input_tokens, stream=False)
 
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
 
                 # Update token counts
                 self.update_token_count(
-                    response.usage.prompt_tokens, response.usage.completion_tokens
+                    response.usage.prompt_tokens,
+                    response.usage.completion_tokens,
+                    cached_prompt_tokens(response.usage),
                 )
 
+                await self._cache_store(cache_key, "ask", response.choices[0].message.content)
                 return response.choices[0].message.content
 
-            # Streaming request, For streaming, update estimated token count before making the request
-            self.update_token_count(input_tokens)
-
-            response = await self.client.chat.completions.create(**params, stream=True)
+            response = await self._create(params, input_tokens, stream=True)
 
             collected_messages = []
             completion_text = ""
+            usage = None
             async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
                 chunk_message = chunk.choices[0].delta.content or ""
                 collected_messages.append(chunk_message)
                 completion_text += chunk_message
-                print(chunk_message, end="", flush=True)
+                if on_content:
+                    if chunk_message:
+                        await on_content(chunk_message)
+                else:
+                    print(chunk_message, end="", flush=True)
 
-            print()  # Newline after streaming
+            if not on_content:
+                print()  # Newline after streaming
             full_response = "".join(collected_messages).strip()
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
 
-            # estimate completion tokens for streaming response
-            completion_tokens = self.count_tokens(completion_text)
-            logger.info(
-                f"Estimated completion tokens for streaming response: {completion_tokens}"
-            )
-            self.total_completion_tokens += completion_tokens
+            if usage:
+                self.update_token_count(
+                    usage.prompt_tokens, usage.completion_tokens, cached_prompt_tokens(usage)
+                )
+            else:
+                # estimate completion tokens for streaming response
+                completion_tokens = self.count_tokens(completion_text)
+                logger.info(
+                    f"Estimated completion tokens for streaming response: {completion_tokens}"
+                )
+                self.update_token_count(input_tokens, completion_tokens)
 
+            await self._cache_store(cache_key, "ask", full_response)
             return full_response
 
         except TokenLimitExceeded:
@@ -477,13 +1028,6 @@ class LLM:
             logger.exception(f"Unexpected error in ask")
             raise
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
     async def ask_with_images(
         self,
         messages: List[Union[dict, Message]],
@@ -587,7 +1131,7 @@ class LLM:
 
             # Handle non-streaming request
             if not stream:
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create(params, input_tokens)
 
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
@@ -597,7 +1141,7 @@ class LLM:
 
             # Handle streaming request
             self.update_token_count(input_tokens)
-            response = await self.client.chat.completions.create(**params)
+            response = await self._create(params, input_tokens)
 
             collected_messages = []
             async for chunk in response:
@@ -631,13 +1175,75 @@ class LLM:
             logger.error(f"Unexpected error in ask_with_images: {e}")
             raise
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+    def _prepare_tool_request(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]],
+        timeout: int,
+        tools: Optional[List[dict]],
+        tool_choice: TOOL_CHOICE_TYPE,  # type: ignore
+        temperature: Optional[float],
+        tools_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> Tuple[dict, int]:
+        """Validate and format a tool request, returning its params and input tokens"""
+        # Validate tool_choice
+        if tool_choice not in TOOL_CHOICE_VALUES:
+            raise ValueError(f"Invalid tool_choice: {tool_choice}")
+
+        # Check if the model supports images
+        supports_images = self.model in MULTIMODAL_MODELS
+
+        # Format messages
+        if system_msgs:
+            system_msgs = self.format_messages(system_msgs, supports_images)
+            messages = system_msgs + self.format_messages(messages, supports_images)
+        else:
+            messages = self.format_messages(messages, supports_images)
+
+        # Calculate input token count
+        input_tokens = self.count_message_tokens(messages)
+
+        # If there are tools, calculate token count for tool descriptions
+        # unless the caller already knows it (see ToolCollection.count_schema_tokens)
+        if tools_tokens is None:
+            tools_tokens = 0
+            for tool in tools or []:
+                tools_tokens += self.count_tokens(str(tool))
+
+        input_tokens += tools_tokens
+
+        # Check if token limits are exceeded
+        if not self.check_token_limit(input_tokens):
+            error_message = self.get_limit_error_message(input_tokens)
+            # Raise a special exception that won't be retried
+            raise TokenLimitExceeded(error_message)
+
+        # Validate tools if provided
+        if tools:
+            for tool in tools:
+                if not isinstance(tool, dict) or "type" not in tool:
+                    raise ValueError("Each tool must be a dict with 'type' field")
+
+        # Set up the completion request, system prompt and tools first as a stable cacheable prefix
+        params = {
+            "model": self.model,
+            "messages": messages,
+            "tools": stable_tool_order(tools),
+            "tool_choice": tool_choice,
+            "timeout": timeout,
+            **kwargs,
+        }
+
+        # --- START CORRECTION ---
+        params["max_completion_tokens"] = self.max_tokens
+        params["temperature"] = (
+            temperature if temperature is not None else self.temperature
+        )
+        # --- END CORRECTION ---
+
+        return params, input_tokens
+
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
@@ -646,6 +1252,7 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        tools_tokens: Optional[int] = None,
         **kwargs,
     ) -> ChatCompletionMessage | None:
         """
@@ -658,6 +1265,7 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            tools_tokens: Precomputed token count of `tools`, counted here if omitted
             **kwargs: Additional completion arguments
 
         Returns:
@@ -670,64 +1278,23 @@ class LLM:
             Exception: For unexpected errors
         """
         try:
-            # Validate tool_choice
-            if tool_choice not in TOOL_CHOICE_VALUES:
-                raise ValueError(f"Invalid tool_choice: {tool_choice}")
-
-            # Check if the model supports images
-            supports_images = self.model in MULTIMODAL_MODELS
-
-            # Format messages
-            if system_msgs:
-                system_msgs = self.format_messages(system_msgs, supports_images)
-                messages = system_msgs + self.format_messages(messages, supports_images)
-            else:
-                messages = self.format_messages(messages, supports_images)
-
-            # Calculate input token count
-            input_tokens = self.count_message_tokens(messages)
-
-            # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
-
-            input_tokens += tools_tokens
-
-            # Check if token limits are exceeded
-            if not self.check_token_limit(input_tokens):
-                error_message = self.get_limit_error_message(input_tokens)
-                # Raise a special exception that won't be retried
-                raise TokenLimitExceeded(error_message)
-
-            # Validate tools if provided
-            if tools:
-                for tool in tools:
-                    if not isinstance(tool, dict) or "type" not in tool:
-                        raise ValueError("Each tool must be a dict with 'type' field")
-
-            # Set up the completion request
-            params = {
-                "model": self.model,
-                "messages": messages,
-                "tools": tools,
-                "tool_choice": tool_choice,
-                "timeout": timeout,
+            params, input_tokens = self._prepare_tool_request(
+                messages,
+                system_msgs,
+                timeout,
+                tools,
+                tool_choice,
+                temperature,
+                tools_tokens=tools_tokens,
                 **kwargs,
-            }
-
-            # --- START CORRECTION ---
-            params["max_completion_tokens"] = self.max_tokens
-            params["temperature"] = (
-                temperature if temperature is not None else self.temperature
             )
-            # --- END CORRECTION ---
+
+            cache_key, cached = await self._cache_lookup("ask_tool", params)
+            if cached is not None:
+                return self._replayed_tool_message(cached)
 
             params["stream"] = False  # Always use non-streaming for tool requests
-            response: ChatCompletion = await self.client.chat.completions.create(
-                **params
-            )
+            response, responder = await self._create_hedged(params, input_tokens)
 
             # Check if response is valid
             if not response.choices or not response.choices[0].message:
@@ -735,11 +1302,16 @@ class LLM:
                 # raise ValueError("Invalid or empty response from LLM")
                 return None
 
-            # Update token counts
-            self.update_token_count(
-                response.usage.prompt_tokens, response.usage.completion_tokens
+            # Update token counts of the config that answered
+            responder.update_token_count(
+                response.usage.prompt_tokens,
+                response.usage.completion_tokens,
+                cached_prompt_tokens(response.usage),
             )
 
+            await self._cache_store(
+                cache_key, "ask_tool", response.choices[0].message.model_dump_json()
+            )
             return response.choices[0].message
 
         except TokenLimitExceeded:
@@ -759,4 +1331,129 @@ class LLM:
             raise
         except Exception as e:
             logger.error(f"Unexpected error in ask_tool: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def ask_tool_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        timeout: int = 300,
+        tools: Optional[List[dict]] = None,
+        tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
+        temperature: Optional[float] = None,
+        on_content: Optional[ContentCallback] = None,
+        on_tool_call: Optional[ToolCallCallback] = None,
+        tools_tokens: Optional[int] = None,
+        **kwargs,
+    ) -> ChatCompletionMessage | None:
+        """
+        Streaming variant of `ask_tool` that assembles tool calls incrementally.
+
+        Content deltas are passed to `on_content` as they arrive, and each tool call
+        is passed to `on_tool_call` as soon as its JSON arguments close, so callers
+        can start executing it while the rest of the completion is still streaming.
+
+        Args:
+            messages: List of conversation messages
+            system_msgs: Optional system messages to prepend
+            timeout: Request timeout in seconds
+            tools: List of tools to use
+            tool_choice: Tool choice strategy
+            temperature: Sampling temperature for the response
+            on_content: Optional coroutine receiving content deltas
+            on_tool_call: Optional coroutine receiving each completed tool call
+            tools_tokens: Precomputed token count of `tools`, counted here if omitted
+            **kwargs: Additional completion arguments
+
+        Returns:
+            ChatCompletionMessage: The assembled response
+
+        Raises:
+            TokenLimitExceeded: If token limits are exceeded
+            LLMStreamInterrupted: If the stream fails after a tool call was handed out
+            ValueError: If tools, tool_choice, or messages are invalid
+            OpenAIError: If API call fails after retries
+        """
+        dispatched = 0
+        try:
+            params, input_tokens = self._prepare_tool_request(
+                messages,
+                system_msgs,
+                timeout,
+                tools,
+                tool_choice,
+                temperature,
+                tools_tokens=tools_tokens,
+                **kwargs,
+            )
+            cache_key, cached = await self._cache_lookup("ask_tool", params)
+            if cached is not None:
+                message = self._replayed_tool_message(cached)
+                if message.content and on_content:
+                    await on_content(message.content)
+                for tool_call in message.tool_calls or []:
+                    if on_tool_call:
+                        await on_tool_call(tool_call)
+                return message
+
+            params["stream"] = True
+            response = await self._create(params, input_tokens)
+
+            assembler = ToolCallStreamAssembler()
+            content_parts: List[str] = []
+            usage = None
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    if on_content:
+                        await on_content(delta.content)
+                for tool_call in assembler.feed(delta.tool_calls):
+                    if on_tool_call:
+                        await on_tool_call(tool_call)
+                    dispatched += 1
+
+            for tool_call in assembler.finish():
+                if on_tool_call:
+                    await on_tool_call(tool_call)
+                dispatched += 1
+
+            content = "".join(content_parts)
+            tool_calls = assembler.tool_calls
+            if not content and not tool_calls:
+                raise ValueError("Empty response from streaming LLM")
+
+            if usage:
+                self.update_token_count(
+                    usage.prompt_tokens, usage.completion_tokens, cached_prompt_tokens(usage)
+                )
+            else:
+                # estimate completion tokens for streaming response
+                completion_tokens = self.count_tokens(content) + sum(
+                    self.count_tokens(call.function.arguments) for call in tool_calls
+                )
+                self.update_token_count(input_tokens, completion_tokens)
+
+            message = ChatCompletionMessage(
+                role="assistant",
+                content=content or None,
+                tool_calls=tool_calls or None,
+            )
+            await self._cache_store(cache_key, "ask_tool", message.model_dump_json())
+            return message
+
+        except TokenLimitExceeded:
+            raise
+        except LLMStreamInterrupted:
+            raise
+        except Exception as e:
+            logger.error(f"Error in ask_tool_stream: {e}")
+            if dispatched:
+                raise LLMStreamInterrupted(
+                    f"Stream failed after {dispatched} tool call(s) were dispatched: {e}"
+                ) from e
+            raise
@@ -0,0 +1,241 @@
+"""Persistent, content-addressed cache of LLM responses.
+
+Responses are stored in SQLite under a hash of everything that determines them
+(model, formatted messages, tool schemas, tool_choice, temperature and max_tokens),
+so replaying the same orchestration returns the recorded responses without calling
+the provider. Entries expire after a TTL and the least recently used ones are
+evicted once the entry count or total size cap is exceeded.
+
+The LLM uses the `aget`/`aset` coroutines, which run the SQLite work in a thread so
+the event loop never waits on the disk. Hits only mark entries as used in memory;
+these access times are written in batches (those not yet written when the process
+exits are lost, which only affects the eviction order).
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import PROJECT_ROOT, LLMCacheSettings
+from app.logger import logger
+
+
+# Hits whose access time is kept in memory before it is written to the database
+ACCESS_FLUSH_EVERY = 64
+
+
+class LLMResponseCache:
+    """SQLite-backed LRU/TTL cache of LLM responses."""
+
+    _instances: Dict[str, "LLMResponseCache"] = {}
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = 10000,
+        max_size_mb: float = 512.0,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._conn.commit()
+        # Totals kept in memory so that inserts only scan the table when over a cap
+        self._count, self._size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        # key -> access time of hits not yet written
+        self._accessed: Dict[str, float] = {}
+
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0,
+        }
+
+    @classmethod
+    def from_settings(
+        cls, settings: Optional[LLMCacheSettings]
+    ) -> Optional["LLMResponseCache"]:
+        """Get the shared cache for the configured path, or None if caching is disabled"""
+        if not settings or not settings.enabled:
+            return None
+        path = Path(settings.path)
+        if not path.is_absolute():
+            path = PROJECT_ROOT / path
+        key = str(path.resolve())
+        if key not in cls._instances:
+            cls._instances[key] = cls(
+                path=path,
+                max_entries=settings.max_entries,
+                max_size_mb=settings.max_size_mb,
+                ttl_seconds=settings.ttl_seconds,
+            )
+        return cls._instances[key]
+
+    @staticmethod
+    def make_key(
+        kind: str,
+        model: str,
+        messages: List[dict],
+        tools: Optional[List[dict]] = None,
+        tool_choice: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """Hash the request fields that determine the response"""
+        payload = json.dumps(
+            {
+                "kind": kind,
+                "model": model,
+                "messages": messages,
+                "tools": tools or [],
+                "tool_choice": tool_choice,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for `key`, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            value, created, size = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                self._delete(key, size)
+                self._conn.commit()
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+
+            self._accessed[key] = now
+            if len(self._accessed) >= ACCESS_FLUSH_EVERY:
+                self._flush_accessed()
+                self._conn.commit()
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: str, kind: str, value: str) -> None:
+        """Store a response and evict old entries if the cache is over its caps"""
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, value, size, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, value, size, now, now),
+            )
+            self._accessed.pop(key, None)
+            if previous:
+                self._size -= previous[0]
+            else:
+                self._count += 1
+            self._size += size
+            self.stats["stores"] += 1
+            self._evict()
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        """`get` run in a worker thread"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, kind: str, value: str) -> None:
+        """`set` run in a worker thread"""
+        await asyncio.to_thread(self.set, key, kind, value)
+
+    def _delete(self, key: str, size: int) -> None:
+        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._accessed.pop(key, None)
+        self._count -= 1
+        self._size -= size
+
+    def _flush_accessed(self) -> None:
+        """Write the access times of recent hits"""
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until both caps are respected"""
+        if self._count <= self.max_entries and self._size <= self.max_size_bytes:
+            return
+        # Eviction order depends on the access times of recent hits
+        self._flush_accessed()
+        while self._count > self.max_entries or self._size > self.max_size_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._delete(*row)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._accessed.clear()
+            self._count = self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of the cache counters"""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    def log_stats(self, event: str) -> None:
+        """Log the cache statistics after a lookup"""
+        stats = self.get_stats()
+        logger.info(
+            f"LLM response cache {event}: hits={stats['hits']}, misses={stats['misses']}, "
+            f"hit_rate={stats['hit_rate']:.1%}, evictions={stats['evictions']}"
+        )
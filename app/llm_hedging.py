@@ -0,0 +1,113 @@
+"""Hedged LLM requests and fail-over to a fallback config.
+
+A tool request slower than a high percentile of recent latencies is usually stuck
+behind a slow replica rather than doing more work. ``hedged_request`` then sends a
+duplicate (to the fallback config, or to the same one), keeps whichever answers
+first and cancels the other. A primary failing with a 5xx error or a timeout is
+retried on the fallback right away.
+"""
+import asyncio
+import math
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.logger import logger
+
+
+T = TypeVar("T")
+
+PRIMARY = "primary"
+HEDGE = "hedge"
+FALLBACK = "fallback"
+
+
+class LatencyWindow:
+    """Latencies of the most recent requests, for percentile estimates."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(
+            len(ordered) - 1, max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+        )
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+async def hedged_request(
+    primary: Callable[[], Awaitable[T]],
+    backup: Callable[[], Awaitable[T]],
+    hedge_delay: Optional[float],
+    may_hedge: Callable[[], bool],
+    can_fail_over: Optional[Callable[[BaseException], bool]] = None,
+    on_loser: Optional[Callable[[str, asyncio.Task], None]] = None,
+) -> Tuple[T, str]:
+    """
+    Run `primary`, racing it against `backup` if it is slow or fails.
+
+    Args:
+        primary: Coroutine factory of the original request
+        backup: Coroutine factory of the duplicate / fail-over request
+        hedge_delay: Seconds before a duplicate is sent, None to never hedge
+        may_hedge: Called when the delay expires, False vetoes the hedge (e.g. budget spent)
+        can_fail_over: Whether an error of `primary` should be retried with `backup`
+        on_loser: Called with the label and task of every request that lost the race
+
+    Returns:
+        The first successful result and the label of the request that produced it
+        (``PRIMARY``, ``HEDGE`` or ``FALLBACK``)
+
+    Raises:
+        The error of the last request to fail when none succeeds
+    """
+    tasks: Dict[asyncio.Task, str] = {asyncio.ensure_future(primary()): PRIMARY}
+    backup_sent = False
+    hedge_considered = hedge_delay is None
+    winner = None
+    try:
+        while True:
+            timeout = None if hedge_considered else hedge_delay
+            done, _ = await asyncio.wait(
+                tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                hedge_considered = True
+                if may_hedge():
+                    logger.info(
+                        f"Hedging an LLM request still running after {timeout:.2f}s"
+                    )
+                    backup_sent = True
+                    tasks[asyncio.ensure_future(backup())] = HEDGE
+                continue
+
+            for task in done:
+                label = tasks.pop(task)
+                error = task.exception()
+                if error is None:
+                    winner = label
+                    return task.result(), label
+                if tasks:
+                    continue  # The other request may still succeed
+                if not backup_sent and can_fail_over and can_fail_over(error):
+                    logger.warning(
+                        f"LLM request failed ({type(error).__name__}: {error}), failing over"
+                    )
+                    backup_sent = True
+                    tasks[asyncio.ensure_future(backup())] = FALLBACK
+                    continue
+                raise error
+    finally:
+        for task, label in tasks.items():
+            if not task.cancel() and not task.cancelled():
+                task.exception()  # Finished in the same round as the winner, mark it retrieved
+            if winner is not None and on_loser:
+                on_loser(label, task)
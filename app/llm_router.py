@@ -0,0 +1,163 @@
+"""Routing of agent steps between the full model and a lighter LLM config.
+
+Many steps only follow up on a trivial observation: the output of a polled shell,
+a file that was just read, an idle tick. ``ModelRouter`` looks at cheap features of
+the pending step and sends those to ``[routing] light_config``, everything else to
+the agent's own model. Each decision is counted with the latency and tokens of the
+requests it covered, per route and reason, so the rules can be tuned from data.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app import metrics
+from app.config import RoutingSettings, config
+from app.schema import Message
+
+
+def _is_error(content: Optional[str]) -> bool:
+    return bool(content) and (
+        content.startswith("Error") or "executed:\nError" in content
+    )
+
+
+@dataclass
+class StepFeatures:
+    """Cheap features of the step an agent is about to take."""
+
+    last_tools: List[str]
+    last_tool_failed: bool
+    history_messages: int
+    light_streak: int = 0
+
+    @classmethod
+    def from_messages(
+        cls,
+        messages: List[Message],
+        light_streak: int = 0,
+        next_step_prompt: Optional[str] = None,
+    ) -> "StepFeatures":
+        """
+        Features from the history: the tool messages of the previous step, if any.
+
+        A user message after them (other than `next_step_prompt`, which the agent
+        appends before every step) is a new request: no tools are reported for it.
+        """
+        last_tools: List[str] = []
+        failed = False
+        index = len(messages) - 1
+        # Skip the next-step prompt appended before thinking
+        if (
+            next_step_prompt
+            and index >= 0
+            and messages[index].role == "user"
+            and messages[index].content == next_step_prompt
+        ):
+            index -= 1
+        while index >= 0 and messages[index].role == "tool":
+            last_tools.append(messages[index].name or "")
+            failed = failed or _is_error(messages[index].content)
+            index -= 1
+        return cls(
+            last_tools=last_tools[::-1],
+            last_tool_failed=failed,
+            history_messages=len(messages),
+            light_streak=light_streak,
+        )
+
+
+@dataclass
+class RouteDecision:
+    config_name: str
+    reason: str
+    light: bool = False
+
+
+@dataclass
+class RouteStats:
+    steps: int = 0
+    seconds: float = 0.0
+    input_tokens: int = 0
+    completion_tokens: int = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "steps": self.steps,
+            "avg_seconds": self.seconds / self.steps if self.steps else 0.0,
+            "input_tokens": self.input_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class ModelRouter:
+    """Chooses the LLM config of each step and records what the choices cost."""
+
+    def __init__(self, settings: Optional[RoutingSettings] = None):
+        self.settings = settings or config.routing_config or RoutingSettings()
+        # Optional step classifier returning the probability that the light model is enough
+        self.classifier: Optional[Callable[[StepFeatures], float]] = None
+        self.stats: Dict[Tuple[str, str], RouteStats] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.enabled
+
+    def decide(self, features: StepFeatures, full_config: str) -> RouteDecision:
+        settings = self.settings
+        light = RouteDecision(settings.light_config, "light_tools", light=True)
+        if not features.last_tools:
+            return RouteDecision(full_config, "new_task")
+        if features.last_tool_failed:
+            return RouteDecision(full_config, "tool_error")
+        if features.history_messages > settings.max_history_messages:
+            return RouteDecision(full_config, "long_history")
+        if features.light_streak >= settings.max_consecutive_light_steps:
+            return RouteDecision(full_config, "light_streak")
+        if self.classifier is not None:
+            if self.classifier(features) >= settings.classifier_threshold:
+                light.reason = "classifier"
+                return light
+            return RouteDecision(full_config, "classifier")
+        if all(name in settings.light_tools for name in features.last_tools):
+            return light
+        return RouteDecision(full_config, "default")
+
+    @contextmanager
+    def record(self, decision: RouteDecision):
+        """Attribute the time and tokens of the enclosed requests to a decision."""
+        stats = self.stats.setdefault(
+            (decision.config_name, decision.reason), RouteStats()
+        )
+        stats.steps += 1
+        metrics.LLM_ROUTED_STEPS.labels(
+            "light" if decision.light else "full", decision.reason
+        ).inc()
+        token = _current_route.set(stats)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+            _current_route.reset(token)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        return {
+            f"{config_name}/{reason}": stats.to_dict()
+            for (config_name, reason), stats in self.stats.items()
+        }
+
+
+_current_route: ContextVar[Optional[RouteStats]] = ContextVar("llm_route", default=None)
+
+
+def record_routed_usage(input_tokens: int, completion_tokens: int) -> None:
+    """Add the tokens of a request to the routing decision it was made under, if any."""
+    stats = _current_route.get()
+    if stats is not None:
+        stats.input_tokens += input_tokens
+        stats.completion_tokens += completion_tokens
+
+
+model_router = ModelRouter()
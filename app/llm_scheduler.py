@@ -0,0 +1,455 @@
+"""Process-wide, rate-limit-aware scheduling of LLM requests.
+
+Every `LLM` config shares one `LLMRequestScheduler`, so concurrent agents and web
+sessions draw from the same request/token budgets instead of each retrying on its
+own. Waiting requests are served in priority order, provider `Retry-After` hints
+pause the whole config, and only transient errors are retried. A streamed
+response holds its concurrency slot until it is consumed or closed.
+"""
+import asyncio
+import heapq
+import inspect
+import itertools
+import random
+import time
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from app.config import LLMSettings
+from app.logger import logger
+
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_BEDROCK_CODES = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "InternalServerException",
+}
+
+
+class RequestPriority(IntEnum):
+    """Scheduling priority of an LLM request, lower values are served first"""
+
+    INTERACTIVE = 0
+    NORMAL = 5
+    BACKGROUND = 10
+
+
+_current_priority: ContextVar[RequestPriority] = ContextVar(
+    "llm_request_priority", default=RequestPriority.NORMAL
+)
+
+
+@contextmanager
+def request_priority(priority: RequestPriority):
+    """Run the enclosed code (and the tasks it creates) with the given LLM priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> RequestPriority:
+    """Get the LLM request priority of the current context"""
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Continuous-refill token bucket sized for a per-minute budget."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken (requests above capacity wait for a full bucket)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Whether an LLM error is transient and worth retrying"""
+    if isinstance(
+        error,
+        (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError),
+    ):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES or error.status_code >= 500
+    # botocore ClientError carries the Bedrock error code in its response dict
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code") in RETRYABLE_BEDROCK_CODES
+    return False
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """Whether an LLM error means the provider is unhealthy (5xx, timeout, unreachable)"""
+    if isinstance(
+        error,
+        (
+            APITimeoutError,
+            APIConnectionError,
+            InternalServerError,
+            asyncio.TimeoutError,
+        ),
+    ):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code >= 500
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        return code in RETRYABLE_BEDROCK_CODES and code != "ThrottlingException"
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Extract the provider's Retry-After hint from an error, if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_NO_CHUNK = object()
+
+
+class HeldStream:
+    """
+    A streamed response that keeps its scheduler slot until it is exhausted, fails
+    or is closed.
+
+    The first chunk is read before the stream is handed out (see
+    `LLMRequestScheduler.submit`), so that errors before any output are retried.
+    """
+
+    def __init__(self, stream: Any, release: Callable[[], None]):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._release = release
+        self._first: Any = _NO_CHUNK
+        self._done = False
+
+    async def start(self) -> "HeldStream":
+        """Read the first chunk; on error the slot is released and the error raised"""
+        try:
+            self._first = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            await self.aclose()
+        except BaseException:
+            await self.aclose()
+            raise
+        return self
+
+    def __aiter__(self) -> "HeldStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._first is not _NO_CHUNK:
+            chunk, self._first = self._first, _NO_CHUNK
+            return chunk
+        if self._done:
+            raise StopAsyncIteration
+        try:
+            return await self._iterator.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self) -> None:
+        """Release the slot and close the underlying stream"""
+        if self._done:
+            return
+        self._done = True
+        self._release()
+        for close in (
+            getattr(self._iterator, "aclose", None),
+            getattr(self._stream, "close", None),
+        ):
+            if close is not None:
+                with suppress(Exception):
+                    result = close()
+                    if inspect.isawaitable(result):
+                        await result
+
+    def __del__(self) -> None:
+        # A stream dropped without being consumed or closed must not keep its slot
+        if not self._done:
+            self._done = True
+            self._release()
+
+
+class LLMRequestScheduler:
+    """Admits LLM requests for one config under shared rate limits and retries them."""
+
+    _instances: Dict[str, "LLMRequestScheduler"] = {}
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_concurrent_requests: Optional[int] = None,
+        max_retries: int = 6,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.name = name
+        self.request_bucket = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        )
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self._waiters: List[list] = []
+        self._sequence = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.stats: Dict[str, float] = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "failures": 0,
+            "queue_wait_seconds": 0.0,
+        }
+
+    @classmethod
+    def for_config(
+        cls, config_name: str, settings: LLMSettings
+    ) -> "LLMRequestScheduler":
+        """Get the process-wide scheduler for an LLM config"""
+        if config_name not in cls._instances:
+            cls._instances[config_name] = cls(
+                name=config_name,
+                requests_per_minute=settings.requests_per_minute,
+                tokens_per_minute=settings.tokens_per_minute,
+                max_concurrent_requests=settings.max_concurrent_requests,
+                max_retries=settings.max_retries,
+            )
+        return cls._instances[config_name]
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for admission"""
+        return len(self._waiters)
+
+    async def submit(
+        self,
+        request: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        priority: Optional[RequestPriority] = None,
+        max_retries: Optional[int] = None,
+        fail_fast: Optional[Callable[[BaseException], bool]] = None,
+        fail_fast_retries: int = 0,
+        stream: bool = False,
+    ) -> T:
+        """
+        Run `request` once admitted by the rate limits, retrying transient failures.
+
+        Args:
+            request: Zero-argument coroutine factory performing the API call
+            estimated_tokens: Tokens the request is expected to consume
+            priority: Scheduling priority, defaults to the priority of the current context
+            max_retries: Retries of transient errors, defaults to the config's max_retries
+            fail_fast: Errors retried only `fail_fast_retries` times, e.g. those another
+                config can take over; other transient errors keep `max_retries`
+            fail_fast_retries: Retries of the errors matched by `fail_fast`
+            stream: `request` returns an async iterator. It is returned as a `HeldStream`
+                keeping the concurrency slot until consumed or closed; errors up to its
+                first chunk are retried, later ones (after output was handed out) are raised
+
+        Returns:
+            The result of `request`
+
+        Raises:
+            The last error of `request` if it is not retryable or retries are exhausted
+        """
+        priority = current_priority() if priority is None else priority
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            await self._acquire(estimated_tokens, priority)
+            self.stats["requests"] += 1
+            release = self._release_once()
+            held = False
+            try:
+                result = await request()
+                if stream:
+                    result = await HeldStream(result, release).start()
+                    held = True
+                return result
+            except Exception as e:
+                limit = fail_fast_retries if fail_fast and fail_fast(e) else max_retries
+                if not is_retryable_error(e) or attempt >= limit:
+                    self.stats["failures"] += 1
+                    raise
+
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    # Full jitter exponential backoff
+                    delay = random.uniform(
+                        0, min(self.backoff_max, self.backoff_base * 2**attempt)
+                    )
+                if (
+                    isinstance(e, RateLimitError)
+                    or getattr(e, "status_code", None) == 429
+                ):
+                    # The provider is throttling this config: pause every request, not just ours
+                    self.stats["rate_limited"] += 1
+                    self.cooldown_until = max(
+                        self.cooldown_until, time.monotonic() + delay
+                    )
+                    delay = 0.0
+
+                attempt += 1
+                self.stats["retries"] += 1
+                logger.warning(
+                    f"LLM request for '{self.name}' failed ({type(e).__name__}: {e}), "
+                    f"retry {attempt}/{limit}"
+                )
+            finally:
+                if not held:
+                    release()
+
+            if delay:
+                await asyncio.sleep(delay)
+
+    def _event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._changed is None or self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        return self._changed
+
+    def _notify(self) -> None:
+        """Wake every waiter so the head of the queue re-checks the limits"""
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def _time_until_admission(self, tokens: int, now: float) -> Optional[float]:
+        """Seconds until a request can start, or None if it must wait for a release"""
+        if (
+            self.max_concurrent_requests
+            and self.in_flight >= self.max_concurrent_requests
+        ):
+            return None
+        wait = max(0.0, self.cooldown_until - now)
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.time_until(1, now))
+        if self.token_bucket and tokens:
+            wait = max(wait, self.token_bucket.time_until(tokens, now))
+        return wait
+
+    async def _acquire(self, tokens: int, priority: RequestPriority) -> None:
+        entry = [int(priority), next(self._sequence), tokens]
+        heapq.heappush(self._waiters, entry)
+        queued_at = time.monotonic()
+        try:
+            while True:
+                event = self._event()
+                timeout = None
+                if self._waiters[0] is entry:
+                    now = time.monotonic()
+                    timeout = self._time_until_admission(tokens, now)
+                    if timeout == 0:
+                        heapq.heappop(self._waiters)
+                        if self.request_bucket:
+                            self.request_bucket.consume(1, now)
+                        if self.token_bucket and tokens:
+                            self.token_bucket.consume(tokens, now)
+                        self.in_flight += 1
+                        self.stats["queue_wait_seconds"] += now - queued_at
+                        self._notify()
+                        return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._notify()
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._notify()
+
+    def _release_once(self) -> Callable[[], None]:
+        """A release callback that frees the slot at most once"""
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._release()
+
+        return release
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Snapshot of the scheduler counters"""
+        return {
+            **self.stats,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "cooling_down": self.cooldown_until > time.monotonic(),
+        }
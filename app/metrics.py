@@ -0,0 +1,223 @@
+"""Prometheus metrics of the agent runtime.
+
+Request-path metrics (LLM latency and tokens, tool durations, agent tasks) are
+updated in place with prometheus_client counters and histograms, a few
+microseconds per observation. Everything that can be read from existing state
+(LLM scheduler queues, sandbox/browser/shell occupancy) is only computed when
+``/metrics`` is scraped, so collection is cheap enough to leave on in production.
+"""
+import asyncio
+import time
+from typing import AsyncIterator, Iterable, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.logger import logger
+
+
+LLM_REQUEST_SECONDS = Histogram(
+    "openmanus_llm_request_duration_seconds",
+    "LLM request latency including scheduler queueing and retries, up to the last streamed chunk",
+    ["config_name", "model", "stream"],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+LLM_REQUEST_FAILURES = Counter(
+    "openmanus_llm_request_failures",
+    "LLM requests that failed after the scheduler's retries",
+    ["config_name", "model"],
+)
+LLM_TOKENS = Counter(
+    "openmanus_llm_tokens",
+    "Tokens sent to and generated by LLMs",
+    ["config_name", "model", "kind"],
+)
+LLM_HEDGES = Counter(
+    "openmanus_llm_hedges",
+    "Hedged duplicates sent, hedges that won the race and fail-overs to the fallback config",
+    ["config_name", "outcome"],
+)
+LLM_HEDGE_WASTED_TOKENS = Counter(
+    "openmanus_llm_hedge_wasted_tokens",
+    "Tokens spent on requests that lost a hedging race",
+    ["config_name"],
+)
+LLM_ROUTED_STEPS = Counter(
+    "openmanus_llm_routed_steps",
+    "Agent steps routed to the light or the full model, by rule",
+    ["route", "reason"],
+)
+TOOL_SECONDS = Histogram(
+    "openmanus_tool_duration_seconds",
+    "Tool execution duration",
+    ["tool", "outcome"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+AGENT_TASKS = Gauge(
+    "openmanus_agent_tasks",
+    "Agent tasks waiting to start or running",
+    ["state"],
+)
+AGENT_TASK_WAIT_SECONDS = Histogram(
+    "openmanus_agent_task_wait_seconds",
+    "Time agent tasks wait in the queue before running",
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+AGENT_TASKS_REJECTED = Counter(
+    "openmanus_agent_tasks_rejected", "Agent tasks rejected because the queue was full"
+)
+AGENT_TASKS_CANCELLED = Counter(
+    "openmanus_agent_tasks_cancelled",
+    "Agent tasks cancelled, running or still queued",
+    ["state"],
+)
+ACTIVE_SESSIONS = Gauge("openmanus_active_sessions", "Agent sessions kept in memory")
+SESSION_EVICTIONS = Counter(
+    "openmanus_session_evictions",
+    "Agent sessions evicted from memory, because the pool was full or they were idle",
+    ["reason"],
+)
+WARM_AGENTS = Gauge("openmanus_warm_agents", "Pre-warmed agents ready for new sessions")
+SESSION_MEMORY_BYTES = Gauge(
+    "openmanus_session_memory_bytes",
+    "Approximate size of the conversation memory of the agent sessions kept in memory",
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "openmanus_websocket_connections", "Open WebSocket connections"
+)
+WEBSOCKET_FRAMES = Counter(
+    "openmanus_websocket_frames",
+    "Frames sent to WebSocket clients, single events or batches",
+    ["kind"],
+)
+WEBSOCKET_DROPPED_EVENTS = Counter(
+    "openmanus_websocket_dropped_events",
+    "Events not sent to WebSocket clients: superseded by a newer one or dropped for a slow client",
+    ["reason"],
+)
+WEBSOCKET_SLOW_DISCONNECTS = Counter(
+    "openmanus_websocket_slow_disconnects",
+    "WebSocket clients disconnected for being too slow",
+)
+WEBSOCKET_UI_UPDATES = Counter(
+    "openmanus_websocket_ui_updates",
+    "Editor, terminal and plan updates sent to WebSocket clients, as snapshots or deltas",
+    ["mode"],
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "openmanus_event_loop_lag_seconds",
+    "How late the event loop wakes up a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def observe_llm_request(
+    config_name: str, model: str, stream: bool, start: float
+) -> None:
+    LLM_REQUEST_SECONDS.labels(config_name, model, str(stream).lower()).observe(
+        time.perf_counter() - start
+    )
+
+
+async def timed_stream(
+    stream: AsyncIterator, config_name: str, model: str, start: float
+) -> AsyncIterator:
+    """Yield from an LLM stream, observing the request latency once it is consumed."""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        observe_llm_request(config_name, model, True, start)
+        # Closing early (e.g. on cancellation) must close the request's own stream too
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def count_tokens(
+    config_name: str, model: str, prompt: int, completion: int, cached: int = 0
+) -> None:
+    if prompt:
+        LLM_TOKENS.labels(config_name, model, "prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels(config_name, model, "completion").inc(completion)
+    if cached:
+        LLM_TOKENS.labels(config_name, model, "cached").inc(cached)
+
+
+class RuntimeCollector(Collector):
+    """Metrics read from the runtime's own state at scrape time."""
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        # Imported lazily: these modules import this one
+        from app.llm_scheduler import LLMRequestScheduler
+
+        queued = GaugeMetricFamily(
+            "openmanus_llm_queued_requests",
+            "LLM requests waiting for admission by the scheduler",
+            labels=["config_name"],
+        )
+        in_flight = GaugeMetricFamily(
+            "openmanus_llm_in_flight_requests",
+            "LLM requests being sent",
+            labels=["config_name"],
+        )
+        for name, scheduler in list(LLMRequestScheduler._instances.items()):
+            queued.add_metric([name], scheduler.queue_depth)
+            in_flight.add_metric([name], scheduler.in_flight)
+        yield queued
+        yield in_flight
+
+        in_use = GaugeMetricFamily(
+            "openmanus_pool_in_use",
+            "Occupied slots of the sandbox, browser and shell session pools",
+            labels=["pool"],
+        )
+        for pool, value in _pool_occupancy():
+            in_use.add_metric([pool], value)
+        yield in_use
+
+
+def _pool_occupancy() -> Iterable[Tuple[str, float]]:
+    try:
+        from app.sandbox.client import SANDBOX_CLIENT
+
+        yield "sandbox", float(SANDBOX_CLIENT.sandbox is not None)
+    except Exception as e:  # docker is optional at runtime
+        logger.debug(f"Sandbox occupancy unavailable: {e}")
+    try:
+        from app.tool.browser_manager import browser_manager
+
+        yield "browser", float(browser_manager.context is not None)
+    except Exception as e:
+        logger.debug(f"Browser occupancy unavailable: {e}")
+    try:
+        from app.tool.shell_manager import shell_manager
+
+        yield "shell_sessions", float(len(shell_manager._sessions))
+    except Exception as e:
+        logger.debug(f"Shell session count unavailable: {e}")
+
+
+REGISTRY.register(RuntimeCollector())
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sample the event loop lag forever; run it as a background task."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+def render_latest() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with their content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
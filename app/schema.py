@@ -29,6 +29,13 @@ TOOL_CHOICE_VALUES = tuple(choice.value for choice in ToolChoice)
 TOOL_CHOICE_TYPE = Literal[TOOL_CHOICE_VALUES]  # type: ignore
 
 
+class ThinkMode(str, Enum):
+    """How a tool-calling agent decides its next action"""
+
+    TWO_PHASE = "two_phase"
+    SINGLE_CALL = "single_call"
+
+
 class AgentState(str, Enum):
     """Agent execution states"""
 
@@ -166,16 +173,20 @@ class Memory(BaseModel):
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
         self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._trim()
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
         self.messages.extend(messages)
-        # Optional: Implement message limit
+        self._trim()
+
+    def _trim(self) -> None:
+        """Keep at most max_messages, never starting with tool results cut off from their call"""
         if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+            messages = self.messages[-self.max_messages :]
+            while messages and messages[0].role == Role.TOOL:
+                messages.pop(0)
+            self.messages = messages
 
     def clear(self) -> None:
         """Clear all messages"""
@@ -0,0 +1,175 @@
+"""Ordering, admission control and cancellation of agent runs.
+
+Prompts of one session share one agent, so they run one after the other in the
+order they arrived. Across sessions at most ``max_concurrent_runs`` agents run at
+once and ``max_queued_runs`` more may wait; anything beyond that is rejected with
+``TaskQueueFull`` carrying a retry hint, instead of piling up unbounded work
+during a traffic spike. The running and queued prompts of a session can be
+cancelled.
+"""
+import asyncio
+import contextvars
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app import metrics
+from app.config import TaskQueueSettings, config
+from app.exceptions import OpenManusError
+from app.logger import logger
+
+
+class TaskQueueFull(OpenManusError):
+    """Raised when an agent run is rejected because too many are running or waiting"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Job:
+    session_id: str
+    run: Callable[[], Awaitable]
+    context: contextvars.Context
+    enqueued_at: float = field(default_factory=time.monotonic)
+    task: Optional[asyncio.Task] = None
+
+
+class AgentTaskQueue:
+    """Per-session FIFO queues of agent runs, under a global concurrency limit."""
+
+    def __init__(self, settings: Optional[TaskQueueSettings] = None):
+        self.settings = settings or config.task_queue_config or TaskQueueSettings()
+        self._queues: Dict[str, Deque[_Job]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._running: Dict[str, _Job] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Moving average of run durations, for retry hints
+        self._avg_run_seconds: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def session_depth(self, session_id: str) -> int:
+        """Runs of a session waiting behind the current one."""
+        return len(self._queues.get(session_id, ()))
+
+    def retry_after(self) -> float:
+        """Seconds a rejected client should wait, from the backlog and recent run times."""
+        if self._avg_run_seconds is None:
+            return self.settings.retry_after
+        rounds = (self.queued + 1) / max(1, self.settings.max_concurrent_runs)
+        return float(max(1, math.ceil(self._avg_run_seconds * rounds)))
+
+    def submit(self, session_id: str, run: Callable[[], Awaitable]) -> int:
+        """
+        Queue a run of a session, in the current context (priority, usage scope).
+
+        Returns:
+            The number of runs of the session ahead of this one
+
+        Raises:
+            TaskQueueFull: If `max_queued_runs` runs are already waiting
+        """
+        if self.queued >= self.settings.max_queued_runs:
+            metrics.AGENT_TASKS_REJECTED.inc()
+            raise TaskQueueFull(
+                f"Too many agent tasks waiting ({self.queued})", self.retry_after()
+            )
+        ahead = self.session_depth(session_id) + (session_id in self._running)
+        job = _Job(session_id, run, contextvars.copy_context())
+        self._queues.setdefault(session_id, deque()).append(job)
+        metrics.AGENT_TASKS.labels(state="queued").inc()
+        if session_id not in self._workers:
+            self._workers[session_id] = asyncio.create_task(self._drain(session_id))
+        return ahead
+
+    async def _drain(self, session_id: str) -> None:
+        """Run the queued runs of a session in order, each once a slot is free."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.settings.max_concurrent_runs)
+        queue = self._queues[session_id]
+        try:
+            while queue:
+                async with self._slots:
+                    if not queue:  # Cancelled while waiting for the slot
+                        break
+                    job = queue.popleft()
+                    metrics.AGENT_TASKS.labels(state="queued").dec()
+                    metrics.AGENT_TASK_WAIT_SECONDS.observe(
+                        time.monotonic() - job.enqueued_at
+                    )
+                    await self._execute(job)
+        finally:
+            # Nothing is awaited between the last check of the queue and here, so no
+            # run can be submitted to a worker that is exiting
+            self._workers.pop(session_id, None)
+            if not queue:
+                self._queues.pop(session_id, None)
+
+    async def _execute(self, job: _Job) -> None:
+        job.task = asyncio.create_task(job.run(), context=job.context)
+        self._running[job.session_id] = job
+        start = time.monotonic()
+        try:
+            with metrics.AGENT_TASKS.labels(state="running").track_inprogress():
+                # Waiting instead of awaiting: a cancelled run must not stop the worker
+                await asyncio.wait([job.task])
+        finally:
+            self._running.pop(job.session_id, None)
+        seconds = time.monotonic() - start
+        self._avg_run_seconds = (
+            seconds
+            if self._avg_run_seconds is None
+            else 0.8 * self._avg_run_seconds + 0.2 * seconds
+        )
+        if not job.task.cancelled() and job.task.exception() is not None:
+            logger.error(
+                f"Agent task of session {job.session_id} failed: {job.task.exception()}"
+            )
+
+    def cancel(self, session_id: str, queued: bool = True) -> Tuple[bool, int]:
+        """
+        Cancel the running run of a session and, unless `queued` is False, its queued ones.
+
+        Returns:
+            Whether a run was cancelled, and the number of queued runs dropped
+        """
+        dropped = 0
+        queue = self._queues.get(session_id)
+        if queued and queue:
+            dropped = len(queue)
+            queue.clear()
+            metrics.AGENT_TASKS.labels(state="queued").dec(dropped)
+            metrics.AGENT_TASKS_CANCELLED.labels("queued").inc(dropped)
+        job = self._running.get(session_id)
+        cancelled = bool(job and job.task and job.task.cancel())
+        if cancelled:
+            metrics.AGENT_TASKS_CANCELLED.labels("running").inc()
+        if cancelled or dropped:
+            logger.info(
+                f"Cancelled session {session_id}: running={cancelled}, queued={dropped}"
+            )
+        return cancelled, dropped
+
+    async def join(self) -> None:
+        """Wait until every queued and running run has finished."""
+        while self._workers:
+            await asyncio.wait(list(self._workers.values()))
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrent_runs": self.settings.max_concurrent_runs,
+            "max_queued_runs": self.settings.max_queued_runs,
+            "avg_run_seconds": round(self._avg_run_seconds or 0.0, 3),
+        }
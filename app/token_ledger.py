@@ -0,0 +1,159 @@
+"""Token usage attributed to the session and agent that made each LLM request.
+
+``LLM`` instances are shared per config by every session of the process, so
+their own counters are process-wide. Code serving a user session runs inside
+``usage_scope(session_id=...)`` and agents add their name with
+``usage_scope(agent=...)``; both travel with the context into the tasks they
+create. Every request is then also recorded in that session's ledger, and the
+``max_input_tokens`` budget of a config is enforced against the session's usage
+of that config instead of the process total.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class TokenUsage:
+    input_tokens: int = 0
+    completion_tokens: int = 0
+    requests: int = 0
+    # Input tokens served from the provider's prompt prefix cache
+    cached_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.completion_tokens
+
+    @property
+    def prefix_cache_hit_rate(self) -> float:
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+    def add(
+        self, input_tokens: int, completion_tokens: int, cached_tokens: int = 0
+    ) -> None:
+        self.input_tokens += input_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.requests += 1
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "input_tokens": self.input_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cached_tokens": self.cached_tokens,
+            "prefix_cache_hit_rate": round(self.prefix_cache_hit_rate, 4),
+            "requests": self.requests,
+        }
+
+
+@dataclass
+class SessionUsage:
+    """Token usage of one session, in total and by agent and LLM config."""
+
+    session_id: str
+    total: TokenUsage = field(default_factory=TokenUsage)
+    by_agent: Dict[str, TokenUsage] = field(default_factory=dict)
+    by_config: Dict[str, TokenUsage] = field(default_factory=dict)
+
+    def record(
+        self,
+        config_name: str,
+        agent: Optional[str],
+        input_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+    ) -> None:
+        counts = (input_tokens, completion_tokens, cached_tokens)
+        self.total.add(*counts)
+        self.by_config.setdefault(config_name, TokenUsage()).add(*counts)
+        self.by_agent.setdefault(agent or "unknown", TokenUsage()).add(*counts)
+
+    def input_tokens(self, config_name: str) -> int:
+        usage = self.by_config.get(config_name)
+        return usage.input_tokens if usage else 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            **self.total.to_dict(),
+            "by_agent": {name: u.to_dict() for name, u in self.by_agent.items()},
+            "by_config": {name: u.to_dict() for name, u in self.by_config.items()},
+        }
+
+
+class TokenLedger:
+    """Usage of every live session of the process."""
+
+    def __init__(self):
+        self._sessions: Dict[str, SessionUsage] = {}
+
+    def session(self, session_id: str) -> SessionUsage:
+        usage = self._sessions.get(session_id)
+        if usage is None:
+            usage = self._sessions[session_id] = SessionUsage(session_id)
+        return usage
+
+    def get(self, session_id: str) -> Optional[SessionUsage]:
+        return self._sessions.get(session_id)
+
+    def drop(self, session_id: str) -> Optional[SessionUsage]:
+        """Forget a session once it is closed."""
+        return self._sessions.pop(session_id, None)
+
+    def totals(self) -> TokenUsage:
+        """Sum over the live sessions."""
+        totals = TokenUsage()
+        for usage in self._sessions.values():
+            totals.input_tokens += usage.total.input_tokens
+            totals.completion_tokens += usage.total.completion_tokens
+            totals.cached_tokens += usage.total.cached_tokens
+            totals.requests += usage.total.requests
+        return totals
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+token_ledger = TokenLedger()
+
+# (session usage, agent name) of the running code
+_current_scope: ContextVar[Tuple[Optional[SessionUsage], Optional[str]]] = ContextVar(
+    "token_usage_scope", default=(None, None)
+)
+
+
+@contextmanager
+def usage_scope(session_id: Optional[str] = None, agent: Optional[str] = None):
+    """
+    Attribute the LLM requests of the enclosed code (and the tasks it creates).
+
+    Omitted arguments are inherited from the enclosing scope, so an agent scope
+    opened inside a session scope keeps the session.
+    """
+    session, current_agent = _current_scope.get()
+    if session_id is not None:
+        session = token_ledger.session(session_id)
+    token = _current_scope.set((session, agent or current_agent))
+    try:
+        yield session
+    finally:
+        _current_scope.reset(token)
+
+
+def current_session() -> Optional[SessionUsage]:
+    """The session usage of the current context, if any."""
+    return _current_scope.get()[0]
+
+
+def record_usage(
+    config_name: str, input_tokens: int, completion_tokens: int, cached_tokens: int = 0
+) -> None:
+    """Record a request in the session ledger of the current context, if any."""
+    session, agent = _current_scope.get()
+    if session is not None:
+        session.record(
+            config_name, agent, input_tokens, completion_tokens, cached_tokens
+        )
@@ -1,8 +1,51 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Callable, Awaitable
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Callable, Awaitable
 
 from pydantic import BaseModel, Field
 
+from app.config import config
+
+
+# Resource touched by tools that do not declare one: conflicts with every other call
+GLOBAL_RESOURCE = "*"
+
+
+@dataclass(frozen=True)
+class ToolAccess:
+    """Resources a tool call touches and whether it only reads them.
+
+    Resources are strings such as "browser", "shell:<id>" or "file:<path>". A
+    resource without ":" is a whole namespace, so "file" overlaps every "file:..."
+    resource. Two calls conflict when they overlap and at least one of them writes.
+    """
+
+    resources: FrozenSet[str]
+    read_only: bool = False
+
+    def conflicts_with(self, other: "ToolAccess") -> bool:
+        if self.read_only and other.read_only:
+            return False
+        return any(
+            _resources_overlap(mine, theirs)
+            for mine in self.resources
+            for theirs in other.resources
+        )
+
+
+def _resources_overlap(first: str, second: str) -> bool:
+    if GLOBAL_RESOURCE in (first, second) or first == second:
+        return True
+    return first == second.split(":", 1)[0] or second == first.split(":", 1)[0]
+
+
+def file_resource(path: Optional[str]) -> str:
+    """Resource name of a file, relative paths being resolved from the workspace"""
+    if not path:
+        return "file"
+    return "file:" + os.path.abspath(os.path.join(config.workspace_root, path))
+
 
 class BaseTool(ABC, BaseModel):
     name: str
@@ -10,6 +53,17 @@ class BaseTool(ABC, BaseModel):
     parameters: Optional[dict] = None
     callback_handler: Optional[Callable[[str, Any], Awaitable[None]]] = None
 
+    # Concurrency traits, used to run independent tool calls in parallel.
+    # Tools without a resource are executed alone.
+    read_only: bool = False
+    resource: Optional[str] = None
+
+    # Memoization traits. Results of read-only tools that opt in are reused within
+    # an agent session until a call writing the same resources invalidates them;
+    # `invalidates` lists resources made stale by a call besides the ones it writes.
+    cacheable: bool = False
+    invalidates: List[str] = Field(default_factory=list)
+
     class Config:
         arbitrary_types_allowed = True
         extra = "allow"
@@ -18,6 +72,16 @@ class BaseTool(ABC, BaseModel):
         """Execute the tool with given parameters."""
         return await self.execute(**kwargs)
 
+    def access(self, **kwargs) -> ToolAccess:
+        """Resources touched by a call with the given arguments.
+
+        Override to derive resources from the arguments (e.g. the file being edited).
+        """
+        return ToolAccess(
+            resources=frozenset({self.resource or GLOBAL_RESOURCE}),
+            read_only=self.read_only,
+        )
+
     @abstractmethod
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
@@ -4,6 +4,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserClickTool(BaseTool):
     name: str = "browser_click"
+    resource: str = "browser"
     description: str = "Simulates a click on an element on the current browser page by its index."
     parameters: dict = {
         "type": "object",
@@ -3,6 +3,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserConsoleExecTool(BaseTool):
     name: str = "browser_console_exec"
+    resource: str = "browser"
     description: str = "Executes custom JavaScript code in the browser console."
     parameters: dict = {
         "type": "object",
@@ -21,4 +22,4 @@ class BrowserConsoleExecTool(BaseTool):
             result = await page.evaluate(javascript)
             return ToolResult(output=f"JavaScript executed successfully. Return value: {result}")
         except Exception as e:
-            return ToolResult(error=f"Failed to execute JavaScript in console: {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to execute JavaScript in console: {str(e)}")
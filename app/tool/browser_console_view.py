@@ -2,9 +2,11 @@ from app.tool.base import BaseTool, ToolResult
 
 class BrowserConsoleViewTool(BaseTool):
     name: str = "browser_console_view"
+    read_only: bool = True
+    resource: str = "browser"
     description: str = "Views the output of the browser's console (currently simulated)."
     parameters: dict = {"type": "object", "properties": {}}
 
     async def execute(self) -> ToolResult:
         output = "Viewing browser console logs is not fully implemented in this version. Use `browser_console_exec` to return specific values from the page context (e.g., `return document.title`)."
-        return ToolResult(output=output)
\ No newline at end of file
+        return ToolResult(output=output)
@@ -4,6 +4,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserInputTool(BaseTool):
     name: str = "browser_input"
+    resource: str = "browser"
     description: str = "Overwrites text in editable elements on the current browser page. Use when filling content in input fields."
     parameters: dict = {
         "type": "object",
@@ -3,6 +3,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserMoveMouseTool(BaseTool):
     name: str = "browser_move_mouse"
+    resource: str = "browser"
     description: str = "Moves the mouse cursor to specified X and Y coordinates on the browser page."
     parameters: dict = {
         "type": "object",
@@ -25,4 +26,4 @@ class BrowserMoveMouseTool(BaseTool):
             await page.mouse.move(coordinate_x, coordinate_y)
             return ToolResult(output=f"Mouse moved to coordinates ({coordinate_x}, {coordinate_y}).")
         except Exception as e:
-            return ToolResult(error=f"Failed to move mouse: {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to move mouse: {str(e)}")
@@ -1,8 +1,12 @@
+from typing import Optional
+
 from app.tool.base import BaseTool, ToolResult
 from app.tool.browser_manager import browser_manager
+from app.tool.prefetch import PrefetchedPage, page_prefetcher, route_prefetched_document
 
 class BrowserNavigateTool(BaseTool):
     name: str = "browser_navigate"
+    resource: str = "browser"
     description: str = "Navigates the browser to a specified URL."
     parameters: dict = {
         "type": "object",
@@ -12,11 +16,32 @@ class BrowserNavigateTool(BaseTool):
         "required": ["url"]
     }
 
+    async def _prefetched_document(self, url: str) -> Optional[PrefetchedPage]:
+        """Prefetched main document of `url`, unless a redirect makes it unsafe to replay"""
+        if not page_prefetcher.settings.serve_navigation:
+            return None
+        prefetched = await page_prefetcher.get(url)
+        if prefetched is None or prefetched.redirected:
+            return None
+        return prefetched
+
+    async def _goto_prefetched(self, page, url: str, prefetched: PrefetchedPage) -> None:
+        """Navigate with the main document served from the prefetch, sub-resources load normally"""
+        unroute = await route_prefetched_document(page, prefetched)
+        try:
+            await page.goto(url)
+        finally:
+            await unroute()
+
     async def execute(self, url: str) -> ToolResult:
         try:
             # 1. Esegui la navigazione come prima
             page = await browser_manager.get_current_page()
-            await page.goto(url)
+            prefetched = await self._prefetched_document(url)
+            if prefetched:
+                await self._goto_prefetched(page, url, prefetched)
+            else:
+                await page.goto(url)
             await page.wait_for_load_state()
 
             # 2. Ottieni lo stato aggiornato della pagina
@@ -4,6 +4,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserPressKeyTool(BaseTool):
     name: str = "browser_press_key"
+    resource: str = "browser"
     description: str = "Simulates a key press (or key combination) on the current browser page."
     parameters: dict = {
         "type": "object",
@@ -25,4 +26,4 @@ class BrowserPressKeyTool(BaseTool):
             state = await browser_manager.get_current_state_for_agent()
             return ToolResult(output=f"Pressed key '{key}'.\n{state}")
         except Exception as e:
-            return ToolResult(error=f"Failed to press key '{key}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to press key '{key}': {str(e)}")
@@ -3,6 +3,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserRestartTool(BaseTool):
     name: str = "browser_restart"
+    resource: str = "browser"
     description: str = "Restarts the browser and navigates to a specified URL. Use when the browser state needs to be reset."
     parameters: dict = {
         "type": "object",
@@ -27,4 +28,4 @@ class BrowserRestartTool(BaseTool):
             state = await browser_manager.get_current_state_for_agent()
             return ToolResult(output=f"Browser restarted and navigated to {url}.\n{state}")
         except Exception as e:
-            return ToolResult(error=f"Failed to restart browser: {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to restart browser: {str(e)}")
@@ -4,6 +4,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserScrollUpTool(BaseTool):
     name: str = "browser_scroll_up"
+    resource: str = "browser"
     description: str = "Scrolls the current browser page upward, one viewport at a time."
     parameters: dict = {"type": "object", "properties": {}}
 
@@ -17,4 +18,4 @@ class BrowserScrollUpTool(BaseTool):
             state = await browser_manager.get_current_state_for_agent()
             return ToolResult(output=f"Scrolled up one page.\n{state}")
         except Exception as e:
-            return ToolResult(error=f"Failed to scroll up: {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to scroll up: {str(e)}")
@@ -4,6 +4,7 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserSelectOptionTool(BaseTool):
     name: str = "browser_select_option"
+    resource: str = "browser"
     description: str = "Selects an option from a dropdown list element on the current browser page by specifying indices."
     parameters: dict = {
         "type": "object",
@@ -34,4 +35,4 @@ class BrowserSelectOptionTool(BaseTool):
             state = await browser_manager.get_current_state_for_agent()
             return ToolResult(output=f"Selected option {option_index} from dropdown {index}.\n{state}")
         except Exception as e:
-            return ToolResult(error=f"Failed to select option from dropdown {index}: {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to select option from dropdown {index}: {str(e)}")
@@ -3,6 +3,9 @@ from app.tool.browser_manager import browser_manager
 
 class BrowserViewTool(BaseTool):
     name: str = "browser_view"
+    read_only: bool = True
+    cacheable: bool = True
+    resource: str = "browser"
     description: str = "Displays the content of the current browser page."
     parameters: dict = {"type": "object", "properties": {}}
 
@@ -11,6 +11,7 @@ from urllib.parse import urlparse
 
 from app.logger import logger
 from app.tool.base import BaseTool, ToolResult
+from app.tool.prefetch import normalize_url, page_prefetcher, route_prefetched_document
 
 
 class Crawl4aiTool(BaseTool):
@@ -21,6 +22,9 @@ class Crawl4aiTool(BaseTool):
     """
 
     name: str = "crawl4ai"
+    read_only: bool = True
+    cacheable: bool = True
+    resource: str = "web"
     description: str = """Web crawler that extracts clean, AI-ready content from web pages.
 
     Features:
@@ -132,14 +136,35 @@ class Crawl4aiTool(BaseTool):
             successful_count = 0
             failed_count = 0
 
+            # Pages prefetched after a search are still crawled at their own URL (so
+            # links resolve and scripts run), with the main document served from the
+            # prefetch instead of being downloaded again
+            prefetched_pages = {}
+
+            async def serve_prefetched(page, context=None, url=None, **kwargs):
+                prefetched = prefetched_pages.pop(normalize_url(url or ""), None)
+                if prefetched is not None:
+                    await route_prefetched_document(page, prefetched)
+                return page
+
             # Process each URL
             async with AsyncWebCrawler(config=browser_config) as crawler:
+                crawler.crawler_strategy.set_hook("before_goto", serve_prefetched)
                 for url in valid_urls:
                     try:
                         logger.info(f"🕷️ Crawling URL: {url}")
                         start_time = asyncio.get_event_loop().time()
 
-                        result = await crawler.arun(url=url, config=run_config)
+                        prefetched = (
+                            None if bypass_cache else await page_prefetcher.get(url)
+                        )
+                        # After a redirect the document belongs to another URL
+                        if prefetched and not prefetched.redirected:
+                            prefetched_pages[prefetched.url] = prefetched
+                        try:
+                            result = await crawler.arun(url=url, config=run_config)
+                        finally:
+                            prefetched_pages.clear()
 
                         end_time = asyncio.get_event_loop().time()
                         execution_time = end_time - start_time
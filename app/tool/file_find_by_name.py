@@ -4,6 +4,9 @@ from app.tool.base import BaseTool, ToolResult
 
 class FileFindByNameTool(BaseTool):
     name: str = "file_find_by_name"
+    read_only: bool = True
+    cacheable: bool = True
+    resource: str = "file"
     description: str = "Finds files by a filename pattern (using glob syntax) within a specified directory."
     parameters: dict = {
         "type": "object",
@@ -40,4 +43,4 @@ class FileFindByNameTool(BaseTool):
             return ToolResult(output="\n".join(results))
 
         except Exception as e:
-            return ToolResult(error=f"Failed to find files in '{path}' with pattern '{glob_pattern}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to find files in '{path}' with pattern '{glob_pattern}': {str(e)}")
@@ -1,9 +1,11 @@
 import os
 import re
-from app.tool.base import BaseTool, ToolResult
+from app.tool.base import BaseTool, ToolAccess, ToolResult, file_resource
 
 class FileFindInContentTool(BaseTool):
     name: str = "file_find_in_content"
+    read_only: bool = True
+    cacheable: bool = True
     description: str = "Searches for matching text within a file using a regular expression pattern."
     parameters: dict = {
         "type": "object",
@@ -20,6 +22,9 @@ class FileFindInContentTool(BaseTool):
         "required": ["file", "regex"]
     }
 
+    def access(self, file: str = None, **kwargs) -> ToolAccess:
+        return ToolAccess(resources=frozenset({file_resource(file)}), read_only=True)
+
     async def execute(self, file: str, regex: str) -> ToolResult:
         if not os.path.isabs(file):
             return ToolResult(error=f"Path '{file}' is not an absolute path.")
@@ -42,4 +47,4 @@ class FileFindInContentTool(BaseTool):
         except re.error as e:
             return ToolResult(error=f"Invalid regular expression: {str(e)}")
         except Exception as e:
-            return ToolResult(error=f"Failed to search in file '{file}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to search in file '{file}': {str(e)}")
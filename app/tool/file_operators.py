@@ -7,6 +7,7 @@ from typing import Optional, Protocol, Tuple, Union, runtime_checkable
 from app.config import SandboxSettings
 from app.exceptions import ToolError
 from app.sandbox.client import SANDBOX_CLIENT
+from app.tool.shell_manager import kill_process_group
 
 
 PathLike = Union[str, Path]
@@ -70,8 +71,12 @@ class LocalFileOperator(FileOperator):
         self, cmd: str, timeout: Optional[float] = 120.0
     ) -> Tuple[int, str, str]:
         """Run a shell command locally."""
+        # In its own process group, so that commands it spawns are killed with it
         process = await asyncio.create_subprocess_shell(
-            cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
         )
 
         try:
@@ -85,12 +90,19 @@ class LocalFileOperator(FileOperator):
             )
         except asyncio.TimeoutError as exc:
             try:
-                process.kill()
+                kill_process_group(process)
             except ProcessLookupError:
                 pass
             raise TimeoutError(
                 f"Command '{cmd}' timed out after {timeout} seconds"
             ) from exc
+        except asyncio.CancelledError:
+            # The agent run was cancelled: do not leave the command running
+            try:
+                kill_process_group(process)
+            except ProcessLookupError:
+                pass
+            raise
 
 
 class SandboxFileOperator(FileOperator):
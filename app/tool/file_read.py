@@ -1,8 +1,10 @@
 import os
-from app.tool.base import BaseTool, ToolResult
+from app.tool.base import BaseTool, ToolAccess, ToolResult, file_resource
 
 class FileReadTool(BaseTool):
     name: str = "file_read"
+    read_only: bool = True
+    cacheable: bool = True
     description: str = "Read file content. Use for checking file contents, analyzing logs, or reading configuration files."
     parameters: dict = {
         "type": "object",
@@ -23,6 +25,9 @@ class FileReadTool(BaseTool):
         "required": ["file"]
     }
 
+    def access(self, file: str = None, **kwargs) -> ToolAccess:
+        return ToolAccess(resources=frozenset({file_resource(file)}), read_only=True)
+
     async def execute(self, file: str, start_line: int = None, end_line: int = None) -> ToolResult:
         if not os.path.isabs(file):
             return ToolResult(error=f"Path '{file}' is not an absolute path.")
@@ -64,7 +69,8 @@ class FileReadTool(BaseTool):
                 await self.callback_handler(
                     "code_editor",
                     content=full_content,
-                    language=language
+                    language=language,
+                    path=file
                 )
             # --- FINE MODIFICA ---
 
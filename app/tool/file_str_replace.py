@@ -1,5 +1,5 @@
 import os
-from app.tool.base import BaseTool, ToolResult
+from app.tool.base import BaseTool, ToolAccess, ToolResult, file_resource
 
 class FileStrReplaceTool(BaseTool):
     name: str = "file_str_replace"
@@ -23,6 +23,9 @@ class FileStrReplaceTool(BaseTool):
         "required": ["file", "old_str", "new_str"]
     }
 
+    def access(self, file: str = None, **kwargs) -> ToolAccess:
+        return ToolAccess(resources=frozenset({file_resource(file)}))
+
     async def execute(self, file: str, old_str: str, new_str: str) -> ToolResult:
         if not os.path.isabs(file):
             return ToolResult(error=f"Path '{file}' is not an absolute path.")
@@ -56,7 +59,8 @@ class FileStrReplaceTool(BaseTool):
                 await self.callback_handler(
                     "code_editor",
                     content=new_content,
-                    language=language
+                    language=language,
+                    path=file
                 )
             # --- FINE MODIFICA ---
 
@@ -1,5 +1,5 @@
 import os
-from app.tool.base import BaseTool, ToolResult
+from app.tool.base import BaseTool, ToolAccess, ToolResult, file_resource
 from app.config import config
 
 class FileWriteTool(BaseTool):
@@ -25,6 +25,9 @@ class FileWriteTool(BaseTool):
         "required": ["file", "content"]
     }
 
+    def access(self, file: str = None, **kwargs) -> ToolAccess:
+        return ToolAccess(resources=frozenset({file_resource(file)}))
+
     async def execute(self, file: str, content: str, append: bool = False) -> ToolResult:
         if not os.path.isabs(file):
             file_path = os.path.join(config.workspace_root, file)
@@ -74,7 +77,8 @@ class FileWriteTool(BaseTool):
                 await self.callback_handler(
                     "code_editor",
                     content=full_content,
-                    language=language
+                    language=language,
+                    path=file_path
                 )
             # --- FINE MODIFICA 2 ---
 
@@ -3,6 +3,9 @@ from app.tool.web_search import WebSearch as InternalWebSearch
 
 class InfoSearchWebTool(BaseTool):
     name: str = "info_search_web"
+    read_only: bool = True
+    cacheable: bool = True
+    resource: str = "web"
     description: str = "Searches the web using a Google-like query with optional date range filtering for up-to-date information or references."
     parameters: dict = {
         "type": "object",
@@ -39,4 +42,4 @@ class InfoSearchWebTool(BaseTool):
             return ToolResult(output="\n".join(output_lines))
 
         except Exception as e:
-            return ToolResult(error=f"Web search failed for query '{query}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Web search failed for query '{query}': {str(e)}")
@@ -2,6 +2,7 @@ from app.tool.base import BaseTool, ToolResult
 
 class MessageNotifyUserTool(BaseTool):
     name: str = "message_notify_user"
+    resource: str = "user_notifications"
     description: str = "Sends an informational message to the user (acknowledgments, progress updates, task completions, etc.). Does not require a response."
     parameters: dict = {
         "type": "object",
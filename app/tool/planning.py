@@ -17,6 +17,7 @@ class PlanningTool(BaseTool):
     """
 
     name: str = "planning"
+    resource: str = "plan"
     description: str = _PLANNING_TOOL_DESCRIPTION
     parameters: dict = {
         "type": "object",
@@ -94,7 +95,8 @@ class PlanningTool(BaseTool):
 
         await self.callback_handler(
             "plan",
-            steps=plan_steps_for_frontend
+            steps=plan_steps_for_frontend,
+            plan_id=plan["plan_id"]
         )
 
     async def _create_plan(
@@ -0,0 +1,253 @@
+"""Speculative prefetch of search result pages.
+
+After a web search the agent usually opens one of the top results in the next
+step, after another LLM round trip. ``PagePrefetcher`` fetches the top result
+pages in the background while the model is deciding and keeps them for a short
+time, so ``crawl4ai``, ``WebContentFetcher`` and ``browser_navigate`` can use the
+prefetched copy instead of loading the page again. Browser-based consumers only
+take the main document from it (see ``route_prefetched_document``): the page keeps
+its real URL, and scripts and sub-resources load as in a normal navigation.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set
+from urllib.parse import urldefrag
+
+import httpx
+
+from app.config import PrefetchSettings, config
+from app.logger import logger
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+)
+
+
+@dataclass
+class PrefetchedPage:
+    url: str
+    final_url: str
+    status_code: int
+    content_type: str
+    html: str
+    fetched_at: float
+
+    @property
+    def redirected(self) -> bool:
+        return normalize_url(self.final_url) != normalize_url(self.url)
+
+
+def normalize_url(url: str) -> str:
+    """Cache key of a URL: fragments do not change the fetched document."""
+    return urldefrag(url.strip())[0]
+
+
+async def route_prefetched_document(
+    page, prefetched: PrefetchedPage
+) -> Callable[[], Awaitable[None]]:
+    """
+    Serve the next navigation of a Playwright `page` to the prefetched URL from the prefetch.
+
+    Only the main document is fulfilled, once; sub-resources load normally.
+    Returns a coroutine function removing the route.
+    """
+    served = False
+
+    async def fulfill(route):
+        nonlocal served
+        if served or route.request.resource_type != "document":
+            await route.continue_()
+            return
+        served = True
+        await route.fulfill(
+            status=prefetched.status_code,
+            content_type=prefetched.content_type,
+            body=prefetched.html,
+        )
+
+    # A predicate rather than the URL itself, which Playwright would read as a glob
+    def matches(request_url: str) -> bool:
+        return normalize_url(request_url) == prefetched.url
+
+    await page.route(matches, fulfill)
+
+    async def unroute() -> None:
+        await page.unroute(matches, fulfill)
+
+    return unroute
+
+
+class _Prefetch:
+    """A scheduled fetch, cancelled if it has not started when all its owners moved on."""
+
+    def __init__(self):
+        self.started = False
+        self.task: Optional[asyncio.Task] = None
+        self.owners: Set[Optional[str]] = set()
+
+
+class PagePrefetcher:
+    """
+    Short-lived cache of pages fetched ahead of time.
+
+    At most `max_concurrency` pages are fetched at once. A new search cancels the
+    prefetches of the same owner's earlier searches that have not started yet (a
+    URL scheduled by several owners is kept while one of them still wants it),
+    pages expire after `ttl_seconds` and the least recently used ones are dropped
+    above `max_entries`.
+    """
+
+    def __init__(self, settings: Optional[PrefetchSettings] = None):
+        self.settings = settings or config.prefetch_config or PrefetchSettings()
+        self._pages: "OrderedDict[str, PrefetchedPage]" = OrderedDict()
+        self._pending: Dict[str, _Prefetch] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.hits = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.enabled
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                timeout=self.settings.timeout,
+            )
+        return self._client
+
+    def schedule(self, urls: Iterable[str], owner: Optional[str] = None) -> int:
+        """
+        Start prefetching the top-k `urls` in the background, returns how many were scheduled.
+
+        Args:
+            urls: Search result URLs, best first
+            owner: Who the prefetches are for (e.g. the session), so that its next
+                search only supersedes its own prefetches
+        """
+        if not self.enabled:
+            return 0
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.settings.max_concurrency))
+
+        # The agent moved on: its earlier prefetches still waiting for a slot are not needed
+        for key, prefetch in list(self._pending.items()):
+            if prefetch.started or owner not in prefetch.owners:
+                continue
+            prefetch.owners.discard(owner)
+            if not prefetch.owners:
+                prefetch.task.cancel()
+                del self._pending[key]
+
+        scheduled = 0
+        for url in list(urls)[: self.settings.top_k]:
+            key = normalize_url(url)
+            if not key.startswith(("http://", "https://")):
+                continue
+            if key in self._pending:
+                self._pending[key].owners.add(owner)
+                continue
+            if self._fresh(key):
+                continue
+            prefetch = _Prefetch()
+            prefetch.owners.add(owner)
+            prefetch.task = asyncio.create_task(self._prefetch(key, prefetch))
+            self._pending[key] = prefetch
+            scheduled += 1
+        return scheduled
+
+    async def _prefetch(
+        self, url: str, prefetch: _Prefetch
+    ) -> Optional[PrefetchedPage]:
+        try:
+            async with self._semaphore:
+                prefetch.started = True
+                page = await self._fetch(url)
+            if page:
+                self._store(page)
+            return page
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Prefetch of {url} failed: {e}")
+            return None
+        finally:
+            if self._pending.get(url) is prefetch:
+                del self._pending[url]
+
+    async def _fetch(self, url: str) -> Optional[PrefetchedPage]:
+        response = await self._get_client().get(url)
+        content_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or "html" not in content_type:
+            return None
+        if len(response.content) > self.settings.max_page_bytes:
+            return None
+        return PrefetchedPage(
+            url=url,
+            final_url=str(response.url),
+            status_code=response.status_code,
+            content_type=content_type,
+            html=response.text,
+            fetched_at=time.monotonic(),
+        )
+
+    def _store(self, page: PrefetchedPage) -> None:
+        self._pages[page.url] = page
+        self._pages.move_to_end(page.url)
+        while len(self._pages) > self.settings.max_entries:
+            self._pages.popitem(last=False)
+
+    def _fresh(self, key: str) -> Optional[PrefetchedPage]:
+        page = self._pages.get(key)
+        if page and time.monotonic() - page.fetched_at > self.settings.ttl_seconds:
+            del self._pages[key]
+            return None
+        return page
+
+    async def get(self, url: str) -> Optional[PrefetchedPage]:
+        """
+        The prefetched copy of `url`, if any.
+
+        A fetch already in progress is awaited, a fetch still waiting for a slot is
+        cancelled since the caller is about to load the page itself.
+        """
+        if not self.enabled:
+            return None
+        key = normalize_url(url)
+        page = self._fresh(key)
+        if page is None and key in self._pending:
+            prefetch = self._pending[key]
+            if prefetch.started:
+                # Shielded: a cancelled caller must not cancel the shared fetch
+                page = await asyncio.shield(prefetch.task)
+            else:
+                prefetch.task.cancel()
+                del self._pending[key]
+        if page is not None:
+            self.hits += 1
+            if key in self._pages:
+                self._pages.move_to_end(key)
+            logger.info(f"⚡ Serving {url} from the search result prefetch")
+        return page
+
+    def cancel(self) -> None:
+        """Cancel every prefetch in progress."""
+        for prefetch in self._pending.values():
+            prefetch.task.cancel()
+        self._pending.clear()
+
+    async def aclose(self) -> None:
+        self.cancel()
+        self._pages.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+page_prefetcher = PagePrefetcher()
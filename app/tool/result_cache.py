@@ -0,0 +1,134 @@
+"""Session-scoped memoization of idempotent tool results."""
+import json
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.tool.base import ToolAccess, ToolResult
+
+
+# A frontend event sent through a tool's callback_handler: (event_type, kwargs)
+UIEvent = Tuple[str, Dict[str, Any]]
+# (mtime_ns, size) of each file read by a call, None for a missing file
+FileStamp = Tuple[Tuple[str, Optional[Tuple[int, int]]], ...]
+
+
+@dataclass
+class _Entry:
+    access: ToolAccess
+    result: ToolResult
+    events: Tuple[UIEvent, ...]
+    stamp: FileStamp
+
+
+class ToolResultCache:
+    """
+    Results of read-only tool calls keyed on tool name plus canonical arguments.
+
+    Entries remember the resources their call read, so a call writing any of
+    them (see `ToolAccess.conflicts_with`) drops the stale entries. A result
+    produced while an invalidation happened is not stored, since it may reflect
+    the state before the write.
+
+    Files can also change outside of tool calls, e.g. a log written by a
+    background process, so entries reading files keep their mtime and size and
+    are dropped when these changed.
+
+    Entries also keep the UI events (``(event_type, kwargs)``) the call sent to
+    the frontend, so a hit can show the same editor or browser update again.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(name: str, args: Dict[str, Any]) -> Optional[str]:
+        """Canonical key of a call, None when the arguments cannot be serialized."""
+        try:
+            return name + ":" + json.dumps(args, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def file_stamp(access: ToolAccess) -> FileStamp:
+        """Current mtime and size of the files in `access`, taken before a call runs."""
+        stamps = []
+        for resource in sorted(access.resources):
+            kind, _, path = resource.partition(":")
+            if kind != "file" or not path:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stamps.append((path, None))
+            else:
+                stamps.append((path, (stat.st_mtime_ns, stat.st_size)))
+        return tuple(stamps)
+
+    def get(self, key: str) -> Optional[ToolResult]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.stamp != self.file_stamp(entry.access):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # Callers tag results with their tool_call_id, never hand out the stored one
+        return entry.result.model_copy()
+
+    def events(self, key: str) -> List[UIEvent]:
+        """UI events recorded with an entry, to be replayed on a hit."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return []
+        return [(event_type, dict(kwargs)) for event_type, kwargs in entry.events]
+
+    def set(
+        self,
+        key: str,
+        access: ToolAccess,
+        result: ToolResult,
+        generation: int,
+        events: Sequence[UIEvent] = (),
+        stamp: Optional[FileStamp] = None,
+    ) -> None:
+        """
+        Store a result computed when the cache was at `generation`.
+
+        `stamp` is the `file_stamp` taken before the call ran, so a file changing
+        while it was read does not leave a stale entry; taken now if omitted.
+        """
+        if generation != self.generation or result.error:
+            return
+        if stamp is None:
+            stamp = self.file_stamp(access)
+        self._entries[key] = _Entry(access, result.model_copy(), tuple(events), stamp)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, access: ToolAccess) -> int:
+        """Drop the entries whose resources are written by `access`."""
+        self.generation += 1
+        stale = [
+            key
+            for key, entry in self._entries.items()
+            if access.conflicts_with(entry.access)
+        ]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
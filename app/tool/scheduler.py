@@ -0,0 +1,59 @@
+"""Concurrent execution of the independent tool calls of a step."""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from app.tool.base import ToolAccess
+
+
+class ToolCallScheduler:
+    """
+    Runs tool calls concurrently unless they conflict.
+
+    A submitted call waits for every earlier call it conflicts with (see
+    `ToolAccess.conflicts_with`), so calls touching the same resource keep the
+    model's order, and at most `max_concurrency` calls run at the same time.
+    Results are returned in submission order whatever the completion order.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None):
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency or 1))
+        self._submitted: List[Tuple[ToolAccess, asyncio.Task]] = []
+
+    def __len__(self) -> int:
+        return len(self._submitted)
+
+    def submit(
+        self, access: ToolAccess, factory: Callable[[], Awaitable[Any]]
+    ) -> asyncio.Task:
+        """Schedule `factory()` once the earlier conflicting calls are done."""
+        blockers = [
+            task
+            for previous, task in self._submitted
+            if not task.done() and access.conflicts_with(previous)
+        ]
+        task = asyncio.create_task(self._run(blockers, factory))
+        self._submitted.append((access, task))
+        return task
+
+    async def _run(
+        self, blockers: List[asyncio.Task], factory: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if blockers:
+            # Whatever the outcome of the previous calls
+            await asyncio.wait(blockers)
+        async with self._semaphore:
+            return await factory()
+
+    async def gather(self) -> List[Any]:
+        """Wait for every submitted call and return the results in submission order."""
+        try:
+            return list(await asyncio.gather(*(task for _, task in self._submitted)))
+        except BaseException:
+            self.cancel()
+            raise
+
+    def cancel(self) -> None:
+        """Cancel the calls that have not finished yet."""
+        for _, task in self._submitted:
+            task.cancel()
+        self._submitted = []
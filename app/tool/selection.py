@@ -0,0 +1,89 @@
+"""Relevance-based selection of the tool schemas sent with a request.
+
+Agents such as ``Manus`` register dozens of tools but use a handful per step, while
+every schema is paid for in input tokens and latency on every request.
+``ToolSelector`` ranks tools against the text of the current step with BM25 over
+their names, descriptions and parameters, entirely locally.
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.tool.base import BaseTool
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from if in into is it its of on or that the "
+    "this to use used using will with you your".split()
+)
+# Names say most about what a tool does
+NAME_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of a text, splitting snake_case names, without stopwords."""
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def tool_terms(tool: BaseTool) -> List[str]:
+    """Indexed terms of a tool: its name, description and parameter names/descriptions."""
+    terms = tokenize(tool.name) * NAME_WEIGHT + tokenize(tool.description or "")
+    properties = (tool.parameters or {}).get("properties") or {}
+    for name, spec in properties.items():
+        terms += tokenize(name)
+        if isinstance(spec, dict):
+            terms += tokenize(str(spec.get("description", "")))
+    return terms
+
+
+class ToolSelector:
+    """BM25 index over a fixed set of tools."""
+
+    def __init__(self, tools: Sequence[BaseTool], k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names = [tool.name for tool in tools]
+        self._term_freqs = [Counter(tool_terms(tool)) for tool in tools]
+        self._lengths = [sum(freqs.values()) for freqs in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if tools else 0.0
+        document_freqs: Counter = Counter()
+        for freqs in self._term_freqs:
+            document_freqs.update(freqs.keys())
+        count = len(tools)
+        self._idf = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in document_freqs.items()
+        }
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score of every tool matching at least one query term."""
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        scores: Dict[str, float] = {}
+        for name, freqs, length in zip(self.names, self._term_freqs, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+            for term in terms:
+                freq = freqs.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            if score > 0:
+                scores[name] = score
+        return scores
+
+    def select(
+        self, query: str, top_k: int, always: Iterable[str] = ()
+    ) -> Optional[List[str]]:
+        """
+        Names of the `top_k` tools most relevant to `query` plus the `always` ones.
+
+        Returns None when nothing in the query matches a tool, in which case the
+        caller should send every tool rather than guess.
+        """
+        scores = self.scores(query)
+        if not scores:
+            return None
+        ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        selected = set(ranked) | (set(always) & set(self.names))
+        return [name for name in self.names if name in selected]
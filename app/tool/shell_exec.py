@@ -1,11 +1,14 @@
 import asyncio
 import sys
-from app.tool.base import BaseTool, ToolResult
+from typing import List
+from app.tool.base import BaseTool, ToolAccess, ToolResult
 from app.tool.shell_manager import shell_manager
 from app.config import config
 
 class ShellExecTool(BaseTool):
     name: str = "shell_exec"
+    resource: str = "shell"
+    invalidates: List[str] = ["file"]
     description: str = "Execute a command in a new shell session. This runs the command in the background. Use 'shell_view' to check the output."
     parameters: dict = {
         "type": "object",
@@ -23,6 +26,10 @@ class ShellExecTool(BaseTool):
         "required": ["command"]
     }
 
+    def access(self, **kwargs) -> ToolAccess:
+        # Il comando può leggere o scrivere qualsiasi file: va ordinato rispetto ai tool sui file
+        return ToolAccess(resources=frozenset({"shell", "file"}))
+
     async def execute(self, command: str, exec_dir: str = None) -> ToolResult:
         if not exec_dir:
             exec_dir = str(config.workspace_root)
@@ -44,7 +51,9 @@ class ShellExecTool(BaseTool):
                 command,
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE,
-                cwd=exec_dir
+                cwd=exec_dir,
+                # Gruppo di processi proprio, per poter terminare anche i figli
+                start_new_session=True
             )
 
             session_id = shell_manager.create_session(command, process)
@@ -1,4 +1,4 @@
-from app.tool.base import BaseTool, ToolResult
+from app.tool.base import BaseTool, ToolAccess, ToolResult
 from app.tool.shell_manager import shell_manager
 
 class ShellKillProcessTool(BaseTool):
@@ -12,6 +12,10 @@ class ShellKillProcessTool(BaseTool):
         "required": ["id"]
     }
 
+    def access(self, id: str = None, **kwargs) -> ToolAccess:
+        # Il processo può scrivere file: va ordinato rispetto ai tool sui file
+        return ToolAccess(resources=frozenset({f"shell:{id}", "file"}))
+
     async def execute(self, id: str) -> ToolResult:
         session = shell_manager.get_session(id)
         if not session:
@@ -26,4 +30,4 @@ class ShellKillProcessTool(BaseTool):
             shell_manager.remove_session(id)
             return ToolResult(output=f"Successfully killed process in session '{id}'.")
         except Exception as e:
-            return ToolResult(error=f"Failed to kill process in session '{id}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to kill process in session '{id}': {str(e)}")
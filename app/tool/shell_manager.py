@@ -1,12 +1,34 @@
 import asyncio
+import os
+import signal
 import uuid
-from typing import Dict
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Esecuzione (il task di un prompt) per conto della quale il codice avvia i processi,
+# così che annullarla termini solo quelli e non i server avviati dai prompt precedenti
+shell_owner: ContextVar[Optional[str]] = ContextVar("shell_owner", default=None)
+
+
+def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """
+    Termina un processo avviato con start_new_session=True insieme ai suoi figli.
+
+    `process.kill()` colpirebbe solo la shell `/bin/sh -c`: i comandi composti
+    (`cmd &`, pipeline) continuerebbero a girare.
+    """
+    if hasattr(os, "killpg"):
+        os.killpg(process.pid, signal.SIGKILL)
+    else:
+        process.kill()
+
 
 # Questa classe rappresenta un singolo processo/sessione di terminale
 class ShellSession:
-    def __init__(self, command: str, process: asyncio.subprocess.Process):
+    def __init__(self, command: str, process: asyncio.subprocess.Process, owner: Optional[str] = None):
         self.command = command
         self.process = process
+        self.owner = owner
         self.output = ""
         self.error = ""
         self.return_code = None
@@ -38,7 +60,7 @@ class ShellManager:
 
     def create_session(self, command: str, process: asyncio.subprocess.Process) -> str:
         session_id = str(uuid.uuid4())
-        self._sessions[session_id] = ShellSession(command, process)
+        self._sessions[session_id] = ShellSession(command, process, owner=shell_owner.get())
         return session_id
 
     def get_session(self, session_id: str) -> ShellSession | None:
@@ -48,5 +70,23 @@ class ShellManager:
         if session_id in self._sessions:
             del self._sessions[session_id]
 
+    def kill_sessions(self, owner: str) -> int:
+        """Termina i processi ancora attivi avviati per conto di un'esecuzione (vedi `shell_owner`)."""
+        killed = 0
+        for session_id, session in list(self._sessions.items()):
+            if session.owner != owner:
+                continue
+            # Anche se la shell è già uscita, i processi lanciati in background
+            # possono essere ancora vivi nel suo gruppo
+            running = session.process.returncode is None
+            try:
+                kill_process_group(session.process)
+                if running:
+                    killed += 1
+            except ProcessLookupError:
+                pass
+            self.remove_session(session_id)
+        return killed
+
 # Creiamo un'istanza globale che i nostri strumenti potranno usare
-shell_manager = ShellManager()
\ No newline at end of file
+shell_manager = ShellManager()
@@ -1,8 +1,10 @@
-from app.tool.base import BaseTool, ToolResult
+from typing import List
+from app.tool.base import BaseTool, ToolAccess, ToolResult
 from app.tool.shell_manager import shell_manager
 
 class ShellViewTool(BaseTool):
     name: str = "shell_view"
+    invalidates: List[str] = ["file"]
     description: str = "Views the output of a running or completed shell session."
     parameters: dict = {
         "type": "object",
@@ -12,6 +14,10 @@ class ShellViewTool(BaseTool):
         "required": ["id"]
     }
 
+    def access(self, id: str = None, **kwargs) -> ToolAccess:
+        # Il processo osservato può scrivere file: non è una sola lettura
+        return ToolAccess(resources=frozenset({f"shell:{id}", "file"}))
+
     async def execute(self, id: str) -> ToolResult:
         # --- INIZIO MODIFICA: Invia l'evento 'action' al frontend ---
         if self.callback_handler:
@@ -45,7 +51,8 @@ class ShellViewTool(BaseTool):
             if self.callback_handler:
                 await self.callback_handler(
                     "terminal_output",
-                    content=output_for_frontend.strip()
+                    content=output_for_frontend.strip(),
+                    shell_id=id
                 )
 
             return ToolResult(output=output_for_agent)
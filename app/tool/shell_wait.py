@@ -1,9 +1,11 @@
 import asyncio
-from app.tool.base import BaseTool, ToolResult
+from typing import List
+from app.tool.base import BaseTool, ToolAccess, ToolResult
 from app.tool.shell_manager import shell_manager
 
 class ShellWaitTool(BaseTool):
     name: str = "shell_wait"
+    invalidates: List[str] = ["file"]
     description: str = "Waits for a running process in a shell session to complete for a specified duration."
     parameters: dict = {
         "type": "object",
@@ -20,6 +22,10 @@ class ShellWaitTool(BaseTool):
         "required": ["id", "seconds"]
     }
 
+    def access(self, id: str = None, **kwargs) -> ToolAccess:
+        # Durante l'attesa il processo può scrivere file: non è una sola lettura
+        return ToolAccess(resources=frozenset({f"shell:{id}", "file"}))
+
     async def execute(self, id: str, seconds: int) -> ToolResult:
         session = shell_manager.get_session(id)
         if not session:
@@ -42,4 +48,4 @@ class ShellWaitTool(BaseTool):
         except asyncio.TimeoutError:
             return ToolResult(output=f"Process in session '{id}' did not finish within {seconds} seconds. It is still running.")
         except Exception as e:
-            return ToolResult(error=f"Error waiting for session '{id}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Error waiting for session '{id}': {str(e)}")
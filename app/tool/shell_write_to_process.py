@@ -1,8 +1,10 @@
-from app.tool.base import BaseTool, ToolResult
+from typing import List
+from app.tool.base import BaseTool, ToolAccess, ToolResult
 from app.tool.shell_manager import shell_manager
 
 class ShellWriteToProcessTool(BaseTool):
     name: str = "shell_write_to_process"
+    invalidates: List[str] = ["file"]
     description: str = "Sends input to a running process in a specified shell session, with an option to simulate pressing Enter."
     parameters: dict = {
         "type": "object",
@@ -24,6 +26,10 @@ class ShellWriteToProcessTool(BaseTool):
         "required": ["id", "input"]
     }
 
+    def access(self, id: str = None, **kwargs) -> ToolAccess:
+        # Il processo può scrivere file: va ordinato rispetto ai tool sui file
+        return ToolAccess(resources=frozenset({f"shell:{id}", "file"}))
+
     async def execute(self, id: str, input: str, press_enter: bool = True) -> ToolResult:
         session = shell_manager.get_session(id)
         if not session or session.process.returncode is not None:
@@ -42,4 +48,4 @@ class ShellWriteToProcessTool(BaseTool):
             else:
                 return ToolResult(error=f"Session '{id}' does not have a STDIN to write to.")
         except Exception as e:
-            return ToolResult(error=f"Failed to write to process in session '{id}': {str(e)}")
\ No newline at end of file
+            return ToolResult(error=f"Failed to write to process in session '{id}': {str(e)}")
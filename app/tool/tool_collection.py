@@ -1,11 +1,36 @@
 # app/tool/tool_collection.py
 
 """Collection classes for managing multiple tools."""
-from typing import Any, Dict, List
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Tuple
 
+from app import metrics
 from app.exceptions import ToolError
 from app.logger import logger
-from app.tool.base import BaseTool, ToolFailure, ToolResult
+from app.tool.base import GLOBAL_RESOURCE, BaseTool, ToolAccess, ToolFailure, ToolResult
+from app.tool.result_cache import ToolResultCache, UIEvent
+from app.tool.selection import ToolSelector
+from app.tracing import tracer
+
+
+# UI events sent by the cacheable call running in the current task, if any
+_recorded_events: ContextVar[Optional[List[UIEvent]]] = ContextVar(
+    "tool_ui_events", default=None
+)
+
+
+class _RecordingHandler:
+    """Wraps a tool's callback_handler to record the events of cacheable calls."""
+
+    def __init__(self, handler: Callable[..., Any]):
+        self.handler = handler
+
+    async def __call__(self, event_type: str, **kwargs) -> None:
+        events = _recorded_events.get()
+        if events is not None:
+            events.append((event_type, dict(kwargs)))
+        await self.handler(event_type, **kwargs)
 
 
 class ToolCollection:
@@ -15,29 +40,166 @@ class ToolCollection:
         arbitrary_types_allowed = True
 
     def __init__(self, *tools: BaseTool):
+        self.version = 0
+        self._params: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+        self._schema_tokens: Dict[Any, Tuple[int, Dict[str, int]]] = {}
+        self._selector: Optional[Tuple[int, ToolSelector]] = None
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
 
     def __iter__(self):
         return iter(self.tools)
 
-    def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+    @property
+    def tools(self) -> Tuple[BaseTool, ...]:
+        return self._tools
+
+    @tools.setter
+    def tools(self, tools: Tuple[BaseTool, ...]) -> None:
+        # Any change to the tool set invalidates the cached schemas
+        self._tools = tools
+        self.invalidate_cache()
+
+    def invalidate_cache(self) -> None:
+        """Drop the cached tool schemas, e.g. after a tool's parameters changed."""
+        self.version += 1
+
+    def to_params(self, names: Optional[Collection[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Function call schemas of every tool, or of the tools in `names`.
+
+        Schemas are rebuilt only when the tool set changes.
+        """
+        if self._params is None or self._params[0] != self.version:
+            self._params = (self.version, [tool.to_param() for tool in self.tools])
+        if names is None:
+            return list(self._params[1])
+        return [param for param in self._params[1] if param["function"]["name"] in names]
+
+    def count_schema_tokens(
+        self, count_tokens: Callable[[str], int], names: Optional[Collection[str]] = None
+    ) -> int:
+        """
+        Token cost of the tool schemas (of `names` only if given), cached per tokenizer
+        and tool set version.
+
+        Args:
+            count_tokens: Token counting function, e.g. `LLM.count_tokens`
+            names: Tools whose schemas are counted, all of them if None
+        """
+        owner = getattr(count_tokens, "__self__", count_tokens)
+        cached = self._schema_tokens.get(owner)
+        if cached is None or cached[0] != self.version:
+            per_tool = {
+                param["function"]["name"]: count_tokens(str(param)) for param in self.to_params()
+            }
+            cached = self._schema_tokens[owner] = (self.version, per_tool)
+        if names is None:
+            return sum(cached[1].values())
+        return sum(tokens for name, tokens in cached[1].items() if name in names)
+
+    def select(self, query: str, top_k: int, always: Iterable[str] = ()) -> Optional[List[str]]:
+        """Names of the tools relevant to `query`, see `ToolSelector.select`."""
+        if self._selector is None or self._selector[0] != self.version:
+            self._selector = (self.version, ToolSelector(self.tools))
+        return self._selector[1].select(query, top_k, always)
+
+    def access(self, name: str, tool_input: Dict[str, Any] = None) -> ToolAccess:
+        """Resources touched by a call, unknown tools and bad arguments conflicting with everything."""
+        tool = self.tool_map.get(name)
+        if tool:
+            try:
+                return tool.access(**(tool_input or {}))
+            except Exception as e:
+                logger.debug(f"Cannot derive the resources of {name}: {e}")
+        return ToolAccess(resources=frozenset({GLOBAL_RESOURCE}))
 
     # --- INIZIO BLOCCO MODIFICATO ---
     async def execute(
-        self, *, name: str, tool_input: Dict[str, Any] = None
+        self,
+        *,
+        name: str,
+        tool_input: Dict[str, Any] = None,
+        cache: Optional[ToolResultCache] = None,
     ) -> ToolResult:
         """
         Executes a tool and ensures the output is always a ToolResult object.
+
+        With a `cache`, results of cacheable read-only tools are reused for identical
+        arguments and calls writing resources invalidate the entries reading them.
+        The UI events a cached call sent are sent again on every hit.
         """
+        with tracer.span("tool.execute", tool=name) as span:
+            result = await self._execute_with_cache(name, tool_input, cache)
+            if span:
+                span.set(bytes=len(str(result)), error=bool(result.error))
+            return result
+
+    async def _execute_with_cache(
+        self, name: str, tool_input: Optional[Dict[str, Any]], cache: Optional[ToolResultCache]
+    ) -> ToolResult:
         tool = self.tool_map.get(name)
         if not tool:
             return ToolFailure(error=f"Tool {name} is invalid")
 
+        # Assicuriamoci che tool_input non sia None per evitare errori
+        args = tool_input or {}
+        if cache is None:
+            return await self._execute(tool, args)
+
+        access = self.access(name, args)
+        key = cache.make_key(name, args) if tool.cacheable and access.read_only else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                logger.info(f"♻️ Tool '{name}' result reused from the session cache")
+                tracer.set_attributes(cached=True)
+                if tool.callback_handler:
+                    for event_type, kwargs in cache.events(key):
+                        await tool.callback_handler(event_type, **kwargs)
+                return cached
+            self._record_events(tool)
+
+        generation = self._invalidate(cache, tool, access)
+        stamp = cache.file_stamp(access) if key is not None else None
+        events: List[UIEvent] = []
+        token = _recorded_events.set(events if key is not None else None)
+        try:
+            result = await self._execute(tool, args)
+        finally:
+            _recorded_events.reset(token)
+            # Reads that overlapped a write must not be stored
+            self._invalidate(cache, tool, access)
+        if key is not None:
+            cache.set(key, access, result, generation, events, stamp)
+        return result
+
+    @staticmethod
+    def _record_events(tool: BaseTool) -> None:
+        """Route the tool's UI events through a recorder, wrapping each handler once."""
+        handler = tool.callback_handler
+        if handler is not None and not isinstance(handler, _RecordingHandler):
+            tool.callback_handler = _RecordingHandler(handler)
+
+    @staticmethod
+    def _invalidate(cache: ToolResultCache, tool: BaseTool, access: ToolAccess) -> int:
+        if not access.read_only:
+            cache.invalidate(access)
+        if tool.invalidates:
+            cache.invalidate(ToolAccess(resources=frozenset(tool.invalidates)))
+        return cache.generation
+
+    async def _execute(self, tool: BaseTool, args: Dict[str, Any]) -> ToolResult:
+        start = time.perf_counter()
+        result = await self._run_tool(tool, args)
+        metrics.TOOL_SECONDS.labels(tool.name, "error" if result.error else "ok").observe(
+            time.perf_counter() - start
+        )
+        return result
+
+    async def _run_tool(self, tool: BaseTool, args: Dict[str, Any]) -> ToolResult:
+        name = tool.name
         try:
-            # Assicuriamoci che tool_input non sia None per evitare errori
-            args = tool_input or {}
             result = await tool(**args)
 
             # --- QUESTA È LA CORREZIONE FONDAMENTALE ---
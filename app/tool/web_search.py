@@ -8,7 +8,9 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.config import config
 from app.logger import logger
+from app.token_ledger import current_session
 from app.tool.base import BaseTool, ToolResult
+from app.tool.prefetch import page_prefetcher
 from app.tool.search import (
     BaiduSearchEngine,
     BingSearchEngine,
@@ -85,6 +87,10 @@ class SearchResponse(ToolResult):
 class WebContentFetcher:
     @staticmethod
     async def fetch_content(url: str, timeout: int = 10) -> Optional[str]:
+        prefetched = await page_prefetcher.get(url)
+        if prefetched:
+            return WebContentFetcher.extract_text(prefetched.html)
+
         headers = {
             "WebSearch": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
@@ -97,19 +103,26 @@ class WebContentFetcher:
                     f"Failed to fetch content from {url}: HTTP {response.status_code}"
                 )
                 return None
-            soup = BeautifulSoup(response.text, "html.parser")
-            for script in soup(["script", "style", "header", "footer", "nav"]):
-                script.extract()
-            text = soup.get_text(separator="\n", strip=True)
-            text = " ".join(text.split())
-            return text[:10000] if text else None
+            return WebContentFetcher.extract_text(response.text)
         except Exception as e:
             logger.warning(f"Error fetching content from {url}: {e}")
             return None
 
+    @staticmethod
+    def extract_text(html: str) -> Optional[str]:
+        soup = BeautifulSoup(html, "html.parser")
+        for script in soup(["script", "style", "header", "footer", "nav"]):
+            script.extract()
+        text = soup.get_text(separator="\n", strip=True)
+        text = " ".join(text.split())
+        return text[:10000] if text else None
+
 
 class WebSearch(BaseTool):
     name: str = "web_search"
+    read_only: bool = True
+    cacheable: bool = True
+    resource: str = "web"
     description: str = "Search the web for real-time information about any topic."
     parameters: dict = {
         "type": "object",
@@ -157,6 +170,13 @@ class WebSearch(BaseTool):
             if results:
                 if fetch_content:
                     results = await self._fetch_content_for_results(results)
+                else:
+                    # The next step usually opens one of the top results
+                    session = current_session()
+                    page_prefetcher.schedule(
+                        (result.url for result in results),
+                        owner=session.session_id if session else None,
+                    )
 
                 if self.callback_handler:
                     summary_message = f"Ho trovato i seguenti risultati per '{query}':\n\n"
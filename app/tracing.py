@@ -0,0 +1,338 @@
+"""Structured tracing spans for agent steps, LLM requests, tools and callbacks.
+
+Spans nest through a context variable, so concurrent sessions and concurrently
+executed tool calls each get the right parent. When a root span (usually
+``agent.run`` or ``flow.execute``) ends, its trace is written to
+``[tracing] output_dir`` as Chrome trace-event JSON (chrome://tracing, Perfetto)
+and/or OTLP-compatible JSON (Jaeger, otel-desktop-viewer, ...).
+
+Tracing is disabled by default and then costs a single attribute lookup per span.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import PROJECT_ROOT, TracingSettings, config
+from app.logger import logger
+
+
+# Ids of exported traces remembered to drop their late spans
+FINISHED_TRACES_KEPT = 1024
+
+
+class Span:
+    """A timed operation with attributes, part of a trace."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "lane",
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        # Concurrent tasks are drawn on separate rows of the Chrome trace
+        task = _current_task()
+        self.lane = f"task-{id(task)}" if task else f"thread-{threading.get_ident()}"
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, **counts: float) -> None:
+        """Add to numeric attributes, e.g. the tokens of several requests."""
+        for key, value in counts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return None
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class _NoopSpanContext:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NOOP = _NoopSpanContext()
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "span", "token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.span = Span(name, _current_span.get(), attributes)
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.span.end_ns = time.time_ns()
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self.token)
+        self.tracer._finish(self.span)
+        return False
+
+
+class Tracer:
+    """Collects spans per trace and exports each trace when its root span ends."""
+
+    def __init__(self, settings: Optional[TracingSettings] = None):
+        self.settings = settings or config.tracing_config or TracingSettings()
+        self._traces: Dict[str, List[Span]] = {}
+        self._dropped: Dict[str, int] = {}
+        self._finished: "OrderedDict[str, None]" = OrderedDict()
+        self.exported: List[Path] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.enabled
+
+    def span(self, name: str, **attributes: Any):
+        """Context manager timing a span; yields the `Span` or None when tracing is off."""
+        if not self.settings.enabled:
+            return _NOOP
+        return _SpanContext(self, name, attributes)
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current_span.get()
+
+    def set_attributes(self, **attributes: Any) -> None:
+        """Set attributes on the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def add_to_current(self, **counts: float) -> None:
+        """Add to numeric attributes of the current span, if any."""
+        span = _current_span.get()
+        if span is not None:
+            span.add(**counts)
+
+    def _finish(self, span: Span) -> None:
+        if span.trace_id in self._finished:
+            # A child outliving its root (e.g. a detached task): the trace is already written
+            logger.debug(
+                f"Span '{span.name}' ended after its trace {span.trace_id} was exported"
+            )
+            return
+        spans = self._traces.setdefault(span.trace_id, [])
+        if len(spans) < self.settings.max_spans_per_trace:
+            spans.append(span)
+        else:
+            self._dropped[span.trace_id] = self._dropped.get(span.trace_id, 0) + 1
+        if span.parent_id is None:
+            spans = self._traces.pop(span.trace_id)
+            dropped = self._dropped.pop(span.trace_id, 0)
+            self._finished[span.trace_id] = None
+            while len(self._finished) > FINISHED_TRACES_KEPT:
+                self._finished.popitem(last=False)
+            if dropped:
+                logger.warning(
+                    f"Trace {span.trace_id} exceeded max_spans_per_trace, {dropped} spans dropped"
+                )
+            try:
+                self.export(spans, span)
+            except Exception as e:
+                logger.error(f"Failed to export trace {span.trace_id}: {e}")
+
+    def export(self, spans: List[Span], root: Span) -> List[Path]:
+        """Write a finished trace in the configured formats."""
+        directory = Path(self.settings.output_dir)
+        if not directory.is_absolute():
+            directory = PROJECT_ROOT / directory
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(root.start_ns / 1e9))
+        prefix = f"{stamp}-{root.name.replace('.', '_')}-{root.trace_id[:8]}"
+
+        paths = []
+        for fmt in self.settings.formats:
+            exporter = EXPORTERS.get(fmt)
+            if exporter is None:
+                logger.warning(
+                    f"Unknown trace format '{fmt}', expected one of {list(EXPORTERS)}"
+                )
+                continue
+            path = directory / f"{prefix}.{fmt}.json"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(exporter(spans), f, default=str)
+            paths.append(path)
+        self.exported.extend(paths)
+        logger.info(
+            f"🧭 Trace of '{root.name}' ({len(spans)} spans, {root.duration_ms:.0f}ms) written to {directory}"
+        )
+        return paths
+
+
+def to_chrome_trace(spans: List[Span]) -> Dict[str, Any]:
+    """Chrome trace-event JSON: one complete ("X") event per span, one row per task."""
+    pid = os.getpid()
+    lanes: Dict[str, int] = {}
+    events = []
+    for span in sorted(spans, key=lambda s: s.start_ns):
+        tid = lanes.setdefault(span.lane, len(lanes) + 1)
+        args = dict(span.attributes)
+        if span.error:
+            args["error"] = span.error
+        events.append(
+            {
+                "name": span.name,
+                "cat": span.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": ((span.end_ns or span.start_ns) - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+    events.extend(
+        {
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": tid,
+            "args": {"name": lane},
+        }
+        for lane, tid in lanes.items()
+    )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp_json(spans: List[Span]) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest with every span of the trace."""
+    otlp_spans = []
+    for span in spans:
+        item = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_id:
+            item["parentSpanId"] = span.parent_id
+        otlp_spans.append(item)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "openmanus"}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": otlp_spans}],
+            }
+        ]
+    }
+
+
+EXPORTERS: Dict[str, Callable[[List[Span]], Dict[str, Any]]] = {
+    "chrome": to_chrome_trace,
+    "otlp": to_otlp_json,
+}
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorator recording every call of a function as a span."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.settings.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.settings.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_callback(handler: Optional[Callable]) -> Optional[Callable]:
+    """Wrap a frontend callback handler so that every send is recorded as a span."""
+    if handler is None or getattr(handler, "__traced__", False):
+        return handler
+
+    @functools.wraps(handler)
+    async def send(event_type: str, *args, **kwargs):
+        if not tracer.settings.enabled:
+            return await handler(event_type, *args, **kwargs)
+        content = kwargs.get("content", args[0] if args else None)
+        with tracer.span("callback.send", event=event_type) as span:
+            span.set(
+                bytes=len(content)
+                if isinstance(content, (str, bytes))
+                else len(str(content))
+            )
+            return await handler(event_type, *args, **kwargs)
+
+    send.__traced__ = True
+    return send
+
+
+tracer = Tracer()
@@ -0,0 +1,170 @@
+"""Versioned UI state for the editor, terminal and plan panels of the frontend.
+
+File tools send the whole file as a ``code_editor`` event, ``shell_view`` the whole
+accumulated output and the planning tool the whole plan, on every call. For each
+stream (a file path, a shell session, a plan) ``UIStateTracker`` remembers what
+the client was last sent and turns the next event into a delta against it:
+
+- text: ``{"start": i, "end": j, "text": s}``, meaning ``new = old[:i] + s + old[j:]``
+  (appended output is ``start == end == len(old)``);
+- lists (plan steps): ``{"length": n, "items": {"index": item}}`` with the changed items.
+
+Every event carries the stream ``version``, deltas the ``base_version`` they apply
+to, and both the ``hash`` of the resulting content. A client that finds itself out
+of sync asks for a ``resync`` and gets the full snapshot again.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+
+# Event type -> field identifying its stream
+STREAM_KEYS = {"code_editor": "path", "terminal_output": "shell_id", "plan": "plan_id"}
+# Event type -> field holding the streamed content
+STREAM_VALUES = {
+    "code_editor": "content",
+    "terminal_output": "content",
+    "plan": "steps",
+}
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+# Deltas larger than this share of the new content are sent as snapshots instead
+MAX_DELTA_RATIO = 0.5
+
+Value = Union[str, List[Any]]
+
+
+def content_hash(value: Value) -> str:
+    if isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        data = json.dumps(value, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()[:16]
+
+
+def _common_prefix(old: str, new: str) -> int:
+    """Length of the common prefix, by binary search over slice comparisons."""
+    low, high = 0, min(len(old), len(new))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[:mid] == new[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix(old: str, new: str, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if old[len(old) - mid :] == new[len(new) - mid :]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def text_delta(old: str, new: str) -> Dict[str, Any]:
+    """The single splice turning `old` into `new`."""
+    prefix = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    return {
+        "start": prefix,
+        "end": len(old) - suffix,
+        "text": new[prefix : len(new) - suffix],
+    }
+
+
+def list_delta(old: List[Any], new: List[Any]) -> Dict[str, Any]:
+    """The items of `new` that differ from `old`, by index."""
+    items = {
+        str(index): item
+        for index, item in enumerate(new)
+        if index >= len(old) or old[index] != item
+    }
+    return {"length": len(new), "items": items}
+
+
+def _delta_size(delta: Dict[str, Any]) -> int:
+    return len(delta["text"]) if "text" in delta else len(delta["items"])
+
+
+@dataclass
+class _Stream:
+    event: Dict[str, Any]
+    version: int
+    # False after a resync request: the next event is sent as a snapshot
+    synced: bool = True
+
+
+class UIStateTracker:
+    """What one client was last sent for each stream, to send it deltas."""
+
+    def __init__(self, max_streams: int = 64):
+        self.max_streams = max_streams
+        self._streams: "OrderedDict[str, _Stream]" = OrderedDict()
+
+    @staticmethod
+    def stream_id(event: Dict[str, Any]) -> Optional[str]:
+        kind = event.get("type")
+        key_field = STREAM_KEYS.get(kind)
+        if not key_field or event.get(key_field) is None:
+            return None
+        if not isinstance(event.get(STREAM_VALUES[kind]), (str, list)):
+            return None
+        return f"{kind}:{event[key_field]}"
+
+    def encode(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """The event to send for `event`: unchanged, a versioned snapshot or a delta."""
+        stream_id = self.stream_id(event)
+        if stream_id is None:
+            return event
+        field = STREAM_VALUES[event["type"]]
+        value = event[field]
+        stream = self._streams.get(stream_id)
+        version = stream.version + 1 if stream else 1
+        encoded = {
+            **event,
+            "stream": stream_id,
+            "version": version,
+            "hash": content_hash(value),
+        }
+
+        delta = None
+        if stream is not None and stream.synced:
+            old = stream.event[field]
+            if isinstance(value, str) and isinstance(old, str):
+                delta = text_delta(old, value)
+            elif isinstance(value, list) and isinstance(old, list):
+                delta = list_delta(old, value)
+            if delta is not None and _delta_size(delta) > MAX_DELTA_RATIO * len(value):
+                delta = None
+        if delta is None:
+            encoded["mode"] = SNAPSHOT
+        else:
+            del encoded[field]
+            encoded.update(mode=DELTA, base_version=stream.version, delta=delta)
+
+        self._streams[stream_id] = _Stream(dict(event), version)
+        self._streams.move_to_end(stream_id)
+        while len(self._streams) > self.max_streams:
+            self._streams.popitem(last=False)
+        return encoded
+
+    def resync(self, stream_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Last events of a stream (or of all of them) to be sent again as snapshots.
+
+        The returned events must go through `encode` like any other.
+        """
+        stream_ids = [stream_id] if stream_id is not None else list(self._streams)
+        events = []
+        for sid in stream_ids:
+            stream = self._streams.get(sid)
+            if stream is not None:
+                stream.synced = False
+                events.append(dict(stream.event))
+        return events
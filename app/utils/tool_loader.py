@@ -2,7 +2,7 @@ import os
 import importlib.util
 import inspect
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple, Type
 from app.tool.base import BaseTool
 from app.logger import logger
 
@@ -18,25 +18,30 @@ EXCLUDED_FILES = [
     "mcp.py" # Escludiamo anche questo per ora per evitare dipendenze complesse all'avvio
 ]
 
-def load_tools_from_directory(directory: Path) -> List[BaseTool]:
-    """
-    Scansiona una directory, importa dinamicamente i moduli Python
-    e restituisce un'istanza di ogni classe che eredita da BaseTool.
+# Classi degli strumenti già scoperte, per directory: i moduli vengono eseguiti
+# una sola volta per processo, non a ogni nuovo agente.
+_tool_classes: Dict[Path, List[Tuple[Type[BaseTool], str]]] = {}
 
-    Args:
-        directory: Il percorso della cartella contenente gli strumenti.
 
-    Returns:
-        Una lista di istanze degli strumenti trovati.
+def discover_tool_classes(directory: Path) -> List[Tuple[Type[BaseTool], str]]:
     """
-    loaded_tools = []
+    Importa dinamicamente i moduli Python di una directory e restituisce
+    le classi che ereditano da BaseTool, con il file che le definisce.
+
+    Il risultato è memorizzato per directory.
+    """
+    directory = Path(directory).resolve()
+    if directory in _tool_classes:
+        return _tool_classes[directory]
+
+    classes = []
     logger.info(f"🔎 Scansione della directory '{directory}' per gli strumenti...")
 
     for filename in os.listdir(directory):
         if filename.endswith(".py") and filename not in EXCLUDED_FILES:
             module_path = directory / filename
             module_name = filename[:-3]
-            
+
             try:
                 # Importa il modulo dinamicamente dal suo percorso
                 spec = importlib.util.spec_from_file_location(module_name, module_path)
@@ -48,13 +53,35 @@ def load_tools_from_directory(directory: Path) -> List[BaseTool]:
                     # Controlla se la classe è una sottoclasse di BaseTool
                     # e non è BaseTool stessa.
                     if issubclass(obj, BaseTool) and obj is not BaseTool:
-                        # Crea un'istanza dello strumento e aggiungila alla lista
-                        tool_instance = obj()
-                        loaded_tools.append(tool_instance)
-                        logger.info(f"  -> Caricato strumento: {tool_instance.name} da {filename}")
-            
+                        classes.append((obj, filename))
+
             except Exception as e:
                 logger.error(f"⚠️ Errore durante il caricamento dello strumento da {filename}: {e}")
 
+    _tool_classes[directory] = classes
+    return classes
+
+
+def load_tools_from_directory(directory: Path) -> List[BaseTool]:
+    """
+    Restituisce un'istanza nuova di ogni classe che eredita da BaseTool
+    nei moduli di una directory (vedi `discover_tool_classes`).
+
+    Args:
+        directory: Il percorso della cartella contenente gli strumenti.
+
+    Returns:
+        Una lista di istanze degli strumenti trovati.
+    """
+    loaded_tools = []
+    for tool_class, filename in discover_tool_classes(directory):
+        try:
+            # Crea un'istanza dello strumento e aggiungila alla lista
+            tool_instance = tool_class()
+            loaded_tools.append(tool_instance)
+            logger.debug(f"  -> Caricato strumento: {tool_instance.name} da {filename}")
+        except Exception as e:
+            logger.error(f"⚠️ Errore durante la creazione dello strumento {tool_class.__name__}: {e}")
+
     logger.info(f"✅ Caricamento completato. Trovati {len(loaded_tools)} strumenti.")
     return loaded_tools
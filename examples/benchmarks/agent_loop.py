@@ -0,0 +1,344 @@
+"""
+Offline agent-loop benchmark for Manus, SWEAgent and OrchestratorFlow.
+
+Each scenario replays a recorded trajectory (``examples/benchmarks/trajectories``)
+through a fake OpenAI-compatible client, runs the real tools in a temporary
+directory and reports where the time goes outside the model and the tools:
+message formatting, token counting, tool dispatch, callbacks, memory and the
+agent loop itself. Wall time, peak RSS and event loop lag are reported as well.
+
+Usage:
+    python -m examples.benchmarks.agent_loop --repeat 3 --output results.json
+    python -m examples.benchmarks.agent_loop --baseline results.json --max-regression 0.25
+
+With ``--baseline`` the exit status is 1 if any scenario's median framework
+overhead per step regressed by more than ``--max-regression``.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from app.agent.base import BaseAgent
+from app.agent.manus import Manus
+from app.agent.react import ReActAgent
+from app.agent.swe import SWEAgent
+from app.config import config
+from app.flow.orchestrator import OrchestratorFlow
+from app.llm import LLM
+from app.logger import logger
+from app.schema import Memory, ThinkMode
+from app.tool.base import BaseTool
+from app.tool.tool_collection import ToolCollection
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    LatencyModel,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+from examples.benchmarks.profiler import (
+    EventLoopLagMonitor,
+    OverheadProfiler,
+    peak_rss_mb,
+)
+
+
+TRAJECTORY_DIR = Path(__file__).parent / "trajectories"
+
+# Functions profiled on every run: (owner, attribute, category)
+PROFILED = [
+    (LLM, "format_messages", "formatting"),
+    (LLM, "count_message_tokens", "token_counting"),
+    (LLM, "count_tokens", "token_counting"),
+    (ToolCollection, "to_params", "tool_schemas"),
+    (ToolCollection, "execute", "tool_dispatch"),
+    (BaseTool, "__call__", "tool_execution"),
+    (Memory, "add_message", "memory"),
+    (Memory, "add_messages", "memory"),
+    (BaseAgent, "compact_memory", "memory"),
+    (Manus, "step", "agent_loop"),
+    (ReActAgent, "step", "agent_loop"),
+    (FakeChatClient, "create", "llm"),
+]
+
+# Categories that are not framework overhead
+EXCLUDED = {"llm", "tool_execution"}
+
+
+class CallbackRecorder:
+    """Callback handler that serializes events the way the web frontend would receive them."""
+
+    def __init__(self):
+        self.events = 0
+        self.bytes = 0
+
+    async def __call__(self, event_type: str, content: Any = None, **kwargs) -> None:
+        payload = json.dumps(
+            {"type": event_type, "content": content, **kwargs}, default=str
+        )
+        self.events += 1
+        self.bytes += len(payload)
+
+
+def load_trajectory(name: str, workdir: str) -> Dict[str, Any]:
+    with open(TRAJECTORY_DIR / f"{name}.json", encoding="utf-8") as f:
+        data = json.load(f)
+    data["replayer"] = TrajectoryReplayer.from_dict(data, workdir)
+    return data
+
+
+def fake_llm(name: str, replayer: TrajectoryReplayer, latency: LatencyModel):
+    client = FakeChatClient(replayer, latency=latency)
+    return create_fake_llm(f"benchmark-{name}", client), client
+
+
+Scenario = Tuple[Callable[[], Awaitable[Any]], List[FakeChatClient]]
+
+
+def build_manus(workdir: str, latency: LatencyModel, callback) -> Scenario:
+    trajectory = load_trajectory("manus", workdir)
+    llm, client = fake_llm("manus", trajectory["replayer"], latency)
+    agent = Manus(
+        llm=llm,
+        callback_handler=callback,
+        max_steps=len(trajectory["replies"]),
+    )
+    return lambda: agent.run(trajectory["task"]), [client]
+
+
+def build_swe(workdir: str, latency: LatencyModel, callback) -> Scenario:
+    trajectory = load_trajectory("swe", workdir)
+    llm, client = fake_llm("swe", trajectory["replayer"], latency)
+    agent = SWEAgent(
+        llm=llm,
+        callback_handler=callback,
+        max_steps=len(trajectory["replies"]) + 1,
+    )
+    return lambda: agent.run(trajectory["task"]), [client]
+
+
+def build_orchestrator(workdir: str, latency: LatencyModel, callback) -> Scenario:
+    trajectory = load_trajectory("orchestrator", workdir)
+    manus_llm, manus_client = fake_llm(
+        "orchestrator-manus", trajectory["replayer"], latency
+    )
+    swe_llm, swe_client = fake_llm(
+        "orchestrator-swe", load_trajectory("swe", workdir)["replayer"], latency
+    )
+    agents = {
+        "manus": Manus(
+            llm=manus_llm,
+            callback_handler=callback,
+            max_steps=len(trajectory["replies"]),
+        ),
+        "swe": SWEAgent(llm=swe_llm, callback_handler=callback),
+    }
+    flow = OrchestratorFlow(
+        agents, primary_agent_key="manus", callback_handler=callback
+    )
+    return lambda: flow.execute(trajectory["task"]), [manus_client, swe_client]
+
+
+# Agents are built outside the timed region, only their runs are measured
+SCENARIOS: Dict[str, Callable[..., Scenario]] = {
+    "manus": build_manus,
+    "swe": build_swe,
+    "orchestrator": build_orchestrator,
+}
+
+
+async def run_scenario(name: str, latency: LatencyModel) -> Dict[str, Any]:
+    """Run one scenario once and collect its timings."""
+    profiler = OverheadProfiler()
+    monitor = EventLoopLagMonitor()
+    callback = CallbackRecorder()
+    callback_call = profiler.wrap(callback.__call__, "callbacks")
+
+    async def profiled_callback(*args, **kwargs):
+        await callback_call(*args, **kwargs)
+
+    with tempfile.TemporaryDirectory(prefix=f"benchmark-{name}-") as workdir:
+        run, clients = SCENARIOS[name](workdir, latency, profiled_callback)
+        with profiler.patched(PROFILED):
+            monitor.start()
+            start = time.perf_counter()
+            await run()
+            wall = time.perf_counter() - start
+            await monitor.stop()
+
+    steps = profiler.calls["agent_loop"]
+    seconds = dict(profiler.seconds)
+    overhead = wall - sum(seconds.get(c, 0.0) for c in EXCLUDED)
+    breakdown = {
+        category: value
+        for category, value in seconds.items()
+        if category not in EXCLUDED
+    }
+    breakdown["other"] = overhead - sum(breakdown.values())
+
+    def per_step_ms(value: float) -> float:
+        return round(value / max(steps, 1) * 1000, 3)
+
+    return {
+        "scenario": name,
+        "steps": steps,
+        "llm_requests": sum(c.requests for c in clients),
+        "prompt_tokens": sum(c.prompt_tokens for c in clients),
+        "wall_time_s": round(wall, 4),
+        "llm_time_s": round(seconds.get("llm", 0.0), 4),
+        "simulated_llm_latency_s": round(sum(c.simulated_latency for c in clients), 4),
+        "tool_execution_s": round(seconds.get("tool_execution", 0.0), 4),
+        "framework_overhead_s": round(overhead, 4),
+        "overhead_per_step_ms": per_step_ms(overhead),
+        "overhead_breakdown_ms_per_step": {
+            category: per_step_ms(value)
+            for category, value in sorted(breakdown.items())
+        },
+        "callback_events": callback.events,
+        "callback_bytes": callback.bytes,
+        "peak_rss_mb": peak_rss_mb(),
+        "event_loop_lag": monitor.summary(),
+    }
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of the key metrics over repeated runs of one scenario."""
+    return {
+        "scenario": runs[0]["scenario"],
+        "runs": len(runs),
+        "median_wall_time_s": statistics.median(r["wall_time_s"] for r in runs),
+        "median_overhead_per_step_ms": statistics.median(
+            r["overhead_per_step_ms"] for r in runs
+        ),
+        "max_event_loop_lag_ms": max(r["event_loop_lag"]["max_ms"] for r in runs),
+        "peak_rss_mb": max((r["peak_rss_mb"] or 0.0) for r in runs),
+    }
+
+
+def find_regressions(
+    summaries: List[Dict[str, Any]], baseline: Dict[str, Any], max_regression: float
+) -> List[str]:
+    """Describe scenarios whose overhead per step grew beyond the allowed ratio."""
+    previous = {s["scenario"]: s for s in baseline.get("summary", [])}
+    regressions = []
+    for summary in summaries:
+        before = previous.get(summary["scenario"])
+        if not before or not before["median_overhead_per_step_ms"]:
+            continue
+        ratio = (
+            summary["median_overhead_per_step_ms"]
+            / before["median_overhead_per_step_ms"]
+        )
+        if ratio > 1 + max_regression:
+            regressions.append(
+                f"{summary['scenario']}: {before['median_overhead_per_step_ms']}ms -> "
+                f"{summary['median_overhead_per_step_ms']}ms per step ({ratio - 1:+.0%})"
+            )
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Offline agent-loop overhead benchmark"
+    )
+    parser.add_argument(
+        "--scenario",
+        choices=[*SCENARIOS, "all"],
+        default="all",
+        help="Scenario to run",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=1,
+        help="Discarded runs per scenario before measuring",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Simulated seconds per LLM request"
+    )
+    parser.add_argument(
+        "--think-mode",
+        choices=[mode.value for mode in ThinkMode],
+        help="Override the configured think mode",
+    )
+    parser.add_argument(
+        "--select-tools",
+        action="store_true",
+        help="Send only the relevant tool schemas per step ([tool_selection])",
+    )
+    parser.add_argument("--output", type=str, help="Optional path for JSON results")
+    parser.add_argument(
+        "--baseline", type=str, help="Previous JSON results to compare with"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Allowed relative growth of overhead per step before failing",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Keep agent INFO logs")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+    if args.think_mode:
+        config.agent_config.think_mode = args.think_mode
+    if args.select_tools:
+        config.tool_selection_config.enabled = True
+
+    latency = LatencyModel(base=args.latency)
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    runs: Dict[str, List[Dict[str, Any]]] = {}
+    for name in names:
+        for _ in range(args.warmup):
+            await run_scenario(name, latency)
+        runs[name] = [await run_scenario(name, latency) for _ in range(args.repeat)]
+
+    summaries = [summarize(scenario_runs) for scenario_runs in runs.values()]
+    for summary, scenario_runs in zip(summaries, runs.values()):
+        last = scenario_runs[-1]
+        print(
+            f"{summary['scenario']:<13} steps={last['steps']:<3} "
+            f"wall={summary['median_wall_time_s']:.3f}s "
+            f"overhead/step={summary['median_overhead_per_step_ms']:.2f}ms "
+            f"loop_lag_max={summary['max_event_loop_lag_ms']:.2f}ms "
+            f"peak_rss={summary['peak_rss_mb']}MiB"
+        )
+        print(
+            "  "
+            + ", ".join(
+                f"{category}={value:.2f}ms"
+                for category, value in last["overhead_breakdown_ms_per_step"].items()
+            )
+        )
+
+    results = {
+        "python": sys.version.split()[0],
+        "latency_s": args.latency,
+        "think_mode": config.agent_config.think_mode,
+        "select_tools": config.tool_selection_config.enabled,
+        "summary": summaries,
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(summaries, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
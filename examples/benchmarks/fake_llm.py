@@ -0,0 +1,301 @@
+"""
+Scripted, OpenAI-compatible chat client used to benchmark agents offline.
+
+The client implements the subset of ``AsyncOpenAI`` that ``app.llm.LLM`` uses
+(``client.chat.completions.create``), answers from a responder callable instead
+of the network, and simulates provider latency so framework overhead can be
+measured without an API key.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.completion_usage import CompletionUsage
+
+from app.config import LLMSettings
+from app.llm import LLM, TokenCounter
+
+
+@dataclass
+class ScriptedReply:
+    """A single completion returned by the fake client."""
+
+    content: Optional[str] = None
+    tool_calls: Optional[
+        List[Dict[str, str]]
+    ] = None  # [{"name": ..., "arguments": ...}]
+
+
+@dataclass
+class LatencyModel:
+    """Simulated provider latency: a fixed cost plus per-token costs."""
+
+    base: float = 0.05
+    per_input_token: float = 0.0
+    per_output_token: float = 0.0
+
+    def delay(self, input_tokens: int, output_tokens: int) -> float:
+        return (
+            self.base
+            + input_tokens * self.per_input_token
+            + output_tokens * self.per_output_token
+        )
+
+
+Responder = Callable[[Dict[str, Any]], ScriptedReply]
+
+
+class TrajectoryReplayer:
+    """Responder replaying a recorded trajectory, one reply per tool request.
+
+    Trajectory files are JSON objects with a ``replies`` list of
+    ``{"content": ..., "tool_calls": [{"name": ..., "arguments": {...}}]}``.
+    String arguments may contain ``{workdir}``, replaced by ``workdir``. Text-only
+    requests (two-phase reasoning) get the content of the upcoming reply, and the
+    last reply is repeated once the trajectory is exhausted.
+    """
+
+    def __init__(self, replies: List[ScriptedReply]):
+        if not replies:
+            raise ValueError("A trajectory needs at least one reply")
+        self.replies = replies
+        self.position = 0
+
+    @classmethod
+    def from_file(cls, path: Path, workdir: str = ".") -> "TrajectoryReplayer":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.from_dict(data, workdir)
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], workdir: str = "."
+    ) -> "TrajectoryReplayer":
+        def substitute(value: Any) -> Any:
+            if isinstance(value, str):
+                return value.replace("{workdir}", workdir)
+            if isinstance(value, dict):
+                return {k: substitute(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [substitute(v) for v in value]
+            return value
+
+        replies = []
+        for reply in data["replies"]:
+            tool_calls = [
+                {
+                    "name": call["name"],
+                    "arguments": json.dumps(substitute(call.get("arguments", {}))),
+                }
+                for call in reply.get("tool_calls", [])
+            ]
+            replies.append(
+                ScriptedReply(
+                    content=reply.get("content"), tool_calls=tool_calls or None
+                )
+            )
+        return cls(replies)
+
+    def __call__(self, params: Dict[str, Any]) -> ScriptedReply:
+        reply = self.replies[min(self.position, len(self.replies) - 1)]
+        if not params.get("tools"):
+            return ScriptedReply(content=reply.content or "Continuing with the plan.")
+        self.position += 1
+        return reply
+
+
+class FakeChatClient:
+    """Drop-in replacement for the ``AsyncOpenAI`` client used by ``LLM``."""
+
+    def __init__(
+        self,
+        responder: Responder,
+        latency: Optional[LatencyModel] = None,
+        count_message_tokens: Optional[Callable[[List[dict]], int]] = None,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.responder = responder
+        self.latency = latency or LatencyModel()
+        self.count_message_tokens = count_message_tokens or (
+            lambda messages: sum(len(str(m)) // 4 for m in messages)
+        )
+        self.count_tokens = count_tokens or (lambda text: len(text or "") // 4)
+        self.chat = SimpleNamespace(completions=self)
+
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.simulated_latency = 0.0
+
+    async def create(self, **params) -> Any:
+        """Answer a chat completion request from the responder."""
+        self.requests += 1
+        reply = self.responder(params)
+
+        prompt_tokens = self.count_message_tokens(params.get("messages", []))
+        for tool in params.get("tools") or []:
+            prompt_tokens += self.count_tokens(str(tool))
+        completion_tokens = self.count_tokens(reply.content or "") + sum(
+            self.count_tokens(call["name"] + call["arguments"])
+            for call in reply.tool_calls or []
+        )
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+        delay = self.latency.delay(prompt_tokens, completion_tokens)
+        self.simulated_latency += delay
+        await asyncio.sleep(delay)
+
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": self.cached_tokens(params)},
+        }
+        if params.get("stream"):
+            # Like OpenAI, usage is only streamed when the request asks for it
+            include_usage = (params.get("stream_options") or {}).get("include_usage")
+            return self._stream(
+                params["model"], reply, usage if include_usage else None
+            )
+        return self._completion(params["model"], reply, usage)
+
+    def cached_tokens(self, params: Dict[str, Any]) -> int:
+        """Prompt tokens reported as read from the provider's cache, none by default."""
+        return 0
+
+    def _tool_calls(self, reply: ScriptedReply) -> Optional[List[dict]]:
+        if not reply.tool_calls:
+            return None
+        return [
+            {
+                "id": f"call_{self.requests}_{i}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": call["arguments"]},
+            }
+            for i, call in enumerate(reply.tool_calls)
+        ]
+
+    def _completion(
+        self, model: str, reply: ScriptedReply, usage: Dict[str, Any]
+    ) -> ChatCompletion:
+        return ChatCompletion.model_validate(
+            {
+                "id": f"fake-{self.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "tool_calls" if reply.tool_calls else "stop",
+                        "message": {
+                            "role": "assistant",
+                            "content": reply.content,
+                            "tool_calls": self._tool_calls(reply),
+                        },
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    async def _stream(
+        self,
+        model: str,
+        reply: ScriptedReply,
+        usage: Optional[Dict[str, Any]] = None,
+        fragment_size: int = 16,
+    ):
+        """Yield the reply as chunks, splitting content and arguments into fragments.
+
+        With `usage`, a last chunk without choices carries it, as OpenAI does for
+        ``stream_options={"include_usage": True}``.
+        """
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None):
+            return ChatCompletionChunk.model_validate(
+                {
+                    "id": f"fake-{self.requests}",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                }
+            )
+
+        content = reply.content or ""
+        for start in range(0, len(content), fragment_size):
+            yield chunk({"content": content[start : start + fragment_size]})
+
+        for i, call in enumerate(self._tool_calls(reply) or []):
+            function = call["function"]
+            yield chunk(
+                {
+                    "tool_calls": [
+                        {
+                            "index": i,
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": function["name"], "arguments": ""},
+                        }
+                    ]
+                }
+            )
+            arguments = function["arguments"]
+            for start in range(0, len(arguments), fragment_size):
+                yield chunk(
+                    {
+                        "tool_calls": [
+                            {
+                                "index": i,
+                                "function": {
+                                    "arguments": arguments[
+                                        start : start + fragment_size
+                                    ]
+                                },
+                            }
+                        ]
+                    }
+                )
+
+        yield chunk({}, finish_reason="tool_calls" if reply.tool_calls else "stop")
+        if usage is not None:
+            final = chunk({})
+            final.choices = []
+            final.usage = CompletionUsage.model_validate(usage)
+            yield final
+
+
+def create_fake_llm(
+    config_name: str,
+    client: FakeChatClient,
+    model: str = "gpt-4o",
+    max_tokens: int = 4096,
+) -> LLM:
+    """Create an ``LLM`` instance whose requests are served by ``client``."""
+    settings = LLMSettings(
+        model=model,
+        base_url="http://fake-llm.local/v1",
+        api_key="fake",
+        max_tokens=max_tokens,
+        temperature=0.0,
+        api_type="openai",
+        api_version="",
+    )
+    LLM._instances.pop(config_name, None)
+    llm = LLM(config_name=config_name, llm_config={"default": settings})
+    llm.client = client
+    # Count "provider side" tokens with a separate counter so the agent's
+    # token count cache and profiling are not affected by the fake provider
+    provider_counter = TokenCounter(llm.tokenizer)
+    client.count_message_tokens = provider_counter.count_message_tokens
+    client.count_tokens = provider_counter.count_text
+    return llm
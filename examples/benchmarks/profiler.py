@@ -0,0 +1,147 @@
+"""
+Instrumentation for the offline agent-loop benchmarks.
+
+``OverheadProfiler`` temporarily wraps the framework functions that run on every
+step and attributes their *exclusive* time (time not spent in another profiled
+call) to a category, so the LLM and the tools themselves can be subtracted from
+the wall time and the remaining framework overhead broken down.
+``EventLoopLagMonitor`` measures how late the event loop wakes up a sleeping task.
+"""
+import asyncio
+import functools
+import inspect
+import statistics
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of the process so far, in MiB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+class OverheadProfiler:
+    """Accumulates exclusive time per category for the wrapped functions."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        # Frames of the profiled calls in progress: [category, child seconds]
+        self._stack: List[list] = []
+        self._patches: List[Tuple[Any, str, Any]] = []
+
+    def _enter(self, category: str) -> Tuple[list, float]:
+        frame = [category, 0.0]
+        self._stack.append(frame)
+        return frame, time.perf_counter()
+
+    def _exit(self, frame: list, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        if frame in self._stack:
+            self._stack.remove(frame)
+        self.seconds[frame[0]] += elapsed - frame[1]
+        self.calls[frame[0]] += 1
+        if self._stack:
+            self._stack[-1][1] += elapsed
+
+    def wrap(self, func: Callable, category: str) -> Callable:
+        """Return a version of `func` whose time is attributed to `category`."""
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                frame, start = self._enter(category)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self._exit(frame, start)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            frame, start = self._enter(category)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit(frame, start)
+
+        return wrapper
+
+    def patch(self, owner: Any, attribute: str, category: str) -> None:
+        """Replace `owner.attribute` with a profiled version until `restore` is called."""
+        original = inspect.getattr_static(owner, attribute)
+        if isinstance(original, staticmethod):
+            patched = staticmethod(self.wrap(original.__func__, category))
+        else:
+            patched = self.wrap(original, category)
+        self._patches.append((owner, attribute, original))
+        setattr(owner, attribute, patched)
+
+    def restore(self) -> None:
+        for owner, attribute, original in reversed(self._patches):
+            setattr(owner, attribute, original)
+        self._patches.clear()
+
+    @contextmanager
+    def patched(
+        self, targets: List[Tuple[Any, str, str]]
+    ) -> Iterator["OverheadProfiler"]:
+        """Profile `(owner, attribute, category)` targets within the block."""
+        for owner, attribute, category in targets:
+            self.patch(owner, attribute, category)
+        try:
+            yield self
+        finally:
+            self.restore()
+
+
+class EventLoopLagMonitor:
+    """Measures event loop lag by sleeping for a fixed interval and timing the wake-up."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, float]:
+        """Lag statistics in milliseconds."""
+        if not self.samples:
+            return {"max_ms": 0.0, "mean_ms": 0.0, "p99_ms": 0.0}
+        ordered = sorted(self.samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {
+            "max_ms": round(ordered[-1] * 1000, 3),
+            "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+            "p99_ms": round(p99 * 1000, 3),
+        }
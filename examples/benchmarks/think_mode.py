@@ -0,0 +1,128 @@
+"""
+Compare ToolCallAgent think modes: two-phase (reasoning + tool selection) vs single call.
+
+Runs Manus against a scripted fake LLM so no network access is needed, and reports
+LLM requests, steps/sec and tokens per task for each mode.
+
+Usage:
+    python -m examples.benchmarks.think_mode --steps 10 --latency 0.2 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict
+
+from app.agent.manus import Manus
+from app.schema import ThinkMode
+from app.tool import IdleTool, ToolCollection
+from app.tool.base import BaseTool, ToolResult
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    LatencyModel,
+    ScriptedReply,
+    create_fake_llm,
+)
+
+
+TASK = "Collect the benchmark observations and report when finished."
+
+
+class EchoTool(BaseTool):
+    """Returns a fixed-size observation so the history grows like a real run."""
+
+    name: str = "benchmark_echo"
+    description: str = "Return a synthetic observation for the given step."
+    parameters: dict = {
+        "type": "object",
+        "properties": {"step": {"type": "integer", "description": "Step number"}},
+        "required": ["step"],
+    }
+    observation_size: int = 2000
+
+    async def execute(self, step: int) -> ToolResult:
+        return ToolResult(output=f"observation {step}: " + "x" * self.observation_size)
+
+
+class TrajectoryResponder:
+    """Calls `benchmark_echo` for a fixed number of steps, then `idle`."""
+
+    def __init__(self, steps: int):
+        self.steps = steps
+        self.tool_requests = 0
+
+    def __call__(self, params: Dict[str, Any]) -> ScriptedReply:
+        if not params.get("tools"):
+            # Text-only reasoning request (two-phase mode)
+            return ScriptedReply(
+                content=f"Next I will run step {self.tool_requests + 1}."
+            )
+
+        self.tool_requests += 1
+        if self.tool_requests > self.steps:
+            call = {"name": "idle", "arguments": json.dumps({"status": "success"})}
+        else:
+            call = {
+                "name": "benchmark_echo",
+                "arguments": json.dumps({"step": self.tool_requests}),
+            }
+        return ScriptedReply(
+            content=f"Running step {self.tool_requests}.", tool_calls=[call]
+        )
+
+
+async def run_mode(
+    mode: ThinkMode, steps: int, latency: LatencyModel
+) -> Dict[str, Any]:
+    """Run one task in the given think mode and collect its statistics."""
+    client = FakeChatClient(TrajectoryResponder(steps), latency=latency)
+    llm = create_fake_llm(f"benchmark-{mode.value}", client)
+    agent = Manus(
+        llm=llm,
+        available_tools=ToolCollection(EchoTool(), IdleTool()),
+        think_mode=mode,
+        max_steps=steps + 1,
+    )
+
+    start = time.perf_counter()
+    await agent.run(TASK)
+    elapsed = time.perf_counter() - start
+
+    agent_steps = steps + 1
+    return {
+        "mode": mode.value,
+        "steps": agent_steps,
+        "llm_requests": client.requests,
+        "wall_time_s": round(elapsed, 4),
+        "steps_per_sec": round(agent_steps / elapsed, 3),
+        "input_tokens_per_task": client.prompt_tokens,
+        "completion_tokens_per_task": client.completion_tokens,
+        "tokens_per_task": client.prompt_tokens + client.completion_tokens,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ToolCallAgent think modes")
+    parser.add_argument("--steps", type=int, default=10, help="Tool steps per task")
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="Simulated seconds per LLM request"
+    )
+    parser.add_argument("--output", type=str, help="Optional path for JSON results")
+    args = parser.parse_args()
+
+    latency = LatencyModel(base=args.latency)
+    results = [await run_mode(mode, args.steps, latency) for mode in ThinkMode]
+
+    for result in results:
+        print(
+            f"{result['mode']:<12} requests={result['llm_requests']:<4} "
+            f"steps/sec={result['steps_per_sec']:<8} tokens/task={result['tokens_per_task']}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
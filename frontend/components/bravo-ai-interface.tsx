@@ -2,6 +2,7 @@
 
 import React, { useState, useRef, useEffect, FC, ReactNode, ChangeEvent, KeyboardEvent } from 'react';
 import { createPortal } from 'react-dom';
+import { UIStateStore } from '@/lib/ui-state';
 import {
     Plus,
     Search,
@@ -62,8 +63,42 @@ import {
 // =================================================================================
 
 interface Message {
-    type: 'system' | 'user_message' | 'agent_response' | 'error';
+    type: 'system' | 'user_message' | 'agent_response' | 'error' | 'thought' | 'thought_delta'
+        | 'task_complete' | 'task_cancelled';
     content: string;
+    // True while a thought is still being streamed as thought_delta fragments
+    streaming?: boolean;
+}
+
+// Appends received events to the chat. Consecutive thought_delta fragments grow a
+// single in-progress thought, replaced by the full thought when the step completes.
+function appendEvents(prev: Message[], events: Message[]): Message[] {
+    const messages = [...prev];
+    // Index of the thought still being streamed, -1 if none
+    let streaming = messages.findIndex(m => m.streaming);
+    for (const event of events) {
+        if (event.type === 'thought_delta') {
+            if (streaming >= 0 && streaming === messages.length - 1) {
+                const current = messages[streaming];
+                messages[streaming] = { ...current, content: current.content + event.content };
+                continue;
+            }
+            // A new step: the previous thought stops growing
+            if (streaming >= 0) {
+                messages[streaming] = { ...messages[streaming], streaming: false };
+            }
+            messages.push({ type: 'thought', content: event.content, streaming: true });
+            streaming = messages.length - 1;
+        } else if (event.type === 'thought' && streaming >= 0 &&
+                   (event.content ?? '').startsWith(messages[streaming].content)) {
+            // The full thought of the step that was being streamed
+            messages[streaming] = event;
+            streaming = -1;
+        } else {
+            messages.push(event);
+        }
+    }
+    return messages;
 }
 
 interface ChatHistoryItem {
@@ -591,7 +626,14 @@ const App: FC = () => {
 
     // --- EFFECT FOR WEBSOCKET CONNECTION ---
     useEffect(() => {
-        webSocketRef.current = new WebSocket(`${WEBSOCKET_URL}/ws/${SESSION_ID}`);
+        const socket = new WebSocket(`${WEBSOCKET_URL}/ws/${SESSION_ID}`);
+        webSocketRef.current = socket;
+        // Editor, terminal and plan updates arrive as deltas against the previous version
+        const uiState = new UIStateStore(stream => {
+            if (socket.readyState === WebSocket.OPEN) {
+                socket.send(JSON.stringify({ type: 'resync', stream }));
+            }
+        });
 
         webSocketRef.current.onopen = () => {
             console.log("WebSocket connection established.");
@@ -599,11 +641,17 @@ const App: FC = () => {
         };
 
         webSocketRef.current.onmessage = (event: MessageEvent) => {
-            const data: Message = JSON.parse(event.data);
-            console.log("Received message:", data);
-            setMessages(prev => [...prev, data]);
-
-            if (data.type === 'agent_response' || data.type === 'error') {
+            const data = JSON.parse(event.data);
+            // Bursts of events arrive as a single batched frame
+            const frameEvents: any[] = data.type === 'batch' ? data.events : [data];
+            const events = frameEvents
+                .map(e => uiState.apply(e))
+                .filter(e => e !== null) as Message[];
+            console.log("Received messages:", events);
+            setMessages(prev => appendEvents(prev, events));
+
+            const finished = ['agent_response', 'error', 'task_complete', 'task_cancelled'];
+            if (events.some(e => finished.includes(e.type))) {
                 setIsAgentThinking(false);
             }
         };
@@ -0,0 +1,106 @@
+// Rebuilds editor, terminal and plan events sent as versioned deltas (see app/ui_state.py).
+//
+// A "snapshot" carries the full content of a stream, a "delta" only the change
+// against the version named by `base_version`. When a delta does not apply to the
+// version we hold, or the rebuilt content does not match `hash`, the stream is
+// out of sync: its events are skipped until the server sends a new snapshot.
+
+type StreamEvent = { [key: string]: any };
+
+type Stream = { version: number; event: StreamEvent };
+
+const VALUE_FIELDS: { [type: string]: string } = {
+    code_editor: 'content',
+    terminal_output: 'content',
+    plan: 'steps',
+};
+
+// The server counts string offsets in code points, JavaScript in UTF-16 units
+function toUtf16Offset(text: string, codePoints: number): number {
+    if (!/[\uD800-\uDFFF]/.test(text)) {
+        return codePoints;
+    }
+    let offset = 0;
+    for (let i = 0; i < codePoints && offset < text.length; i++) {
+        offset += text.codePointAt(offset)! > 0xffff ? 2 : 1;
+    }
+    return offset;
+}
+
+function applyDelta(old: any, delta: any): any {
+    if (typeof old === 'string') {
+        const start = toUtf16Offset(old, delta.start);
+        const end = toUtf16Offset(old, delta.end);
+        return old.slice(0, start) + delta.text + old.slice(end);
+    }
+    const items = (old as any[]).slice(0, delta.length);
+    for (const [index, item] of Object.entries(delta.items)) {
+        items[Number(index)] = item;
+    }
+    return items;
+}
+
+async function sha1Prefix(text: string): Promise<string | null> {
+    if (!globalThis.crypto?.subtle) {
+        return null;
+    }
+    const digest = await crypto.subtle.digest('SHA-1', new TextEncoder().encode(text));
+    return Array.from(new Uint8Array(digest))
+        .map(byte => byte.toString(16).padStart(2, '0'))
+        .join('')
+        .slice(0, 16);
+}
+
+export class UIStateStore {
+    private streams = new Map<string, Stream>();
+    private resyncing = new Set<string>();
+
+    // `requestResync` is called with the id of a stream that must be sent again in full
+    constructor(private requestResync: (stream: string) => void) {}
+
+    // The full event for `event`, or null if it cannot be applied (a resync is requested)
+    apply(event: StreamEvent): StreamEvent | null {
+        const streamId: string | undefined = event.stream;
+        if (!streamId || !event.mode) {
+            return event;
+        }
+        const field = VALUE_FIELDS[event.type];
+        const current = this.streams.get(streamId);
+        let value: any;
+        if (event.mode === 'snapshot') {
+            value = event[field];
+            this.resyncing.delete(streamId);
+        } else if (current && current.version === event.base_version) {
+            value = applyDelta(current.event[field], event.delta);
+        } else {
+            this.outOfSync(streamId);
+            return null;
+        }
+
+        const { delta, base_version, mode, ...rest } = event;
+        const full = { ...rest, [field]: value };
+        this.streams.set(streamId, { version: event.version, event: full });
+        if (typeof value === 'string') {
+            this.verify(streamId, event.version, value, event.hash);
+        }
+        return full;
+    }
+
+    private verify(streamId: string, version: number, value: string, hash: string) {
+        sha1Prefix(value).then(actual => {
+            const stream = this.streams.get(streamId);
+            if (actual !== null && actual !== hash && stream?.version === version) {
+                this.outOfSync(streamId);
+            }
+        });
+    }
+
+    private outOfSync(streamId: string) {
+        // Deltas are ignored until the snapshot arrives
+        this.streams.delete(streamId);
+        if (!this.resyncing.has(streamId)) {
+            this.resyncing.add(streamId);
+            this.requestResync(streamId);
+        }
+    }
+}
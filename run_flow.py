@@ -12,7 +12,9 @@ from app.config import config
 # --- INIZIO MODIFICA: Importiamo il nuovo OrchestratorFlow ---
 from app.flow.orchestrator import OrchestratorFlow
 # --- FINE MODIFICA ---
+from app.llm_scheduler import RequestPriority, request_priority
 from app.logger import logger
+from app.tracing import tracer
 
 
 async def run_flow():
@@ -51,10 +53,14 @@ async def run_flow():
 
         try:
             start_time = time.time()
-            result = await asyncio.wait_for(
-                flow.execute(prompt),
-                timeout=3600,  # 60 minuti di timeout per l'intera esecuzione
-            )
+            # Batch flows yield to interactive web sessions sharing the same LLM limits
+            with request_priority(RequestPriority.BACKGROUND), tracer.span(
+                "flow.execute", flow=type(flow).__name__
+            ):
+                result = await asyncio.wait_for(
+                    flow.execute(prompt),
+                    timeout=3600,  # 60 minuti di timeout per l'intera esecuzione
+                )
             elapsed_time = time.time() - start_time
             logger.info(f"Request processed in {elapsed_time:.2f} seconds")
             logger.info(f"Final Result:\n{result}")
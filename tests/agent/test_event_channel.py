@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+import pytest
+
+from app.config import WebSocketSettings
+from app.event_channel import SLOW_CONSUMER_CLOSE_CODE, EventChannel
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames = []
+        self.closed_with = None
+        self.unblocked = asyncio.Event()
+        self.unblocked.set()
+
+    async def send_text(self, text: str):
+        await self.unblocked.wait()
+        self.frames.append(json.loads(text))
+
+    async def close(self, code: int):
+        self.closed_with = code
+
+
+def make_channel(socket: FakeSocket, **settings) -> EventChannel:
+    settings.setdefault("coalesce_window", 0.01)
+    channel = EventChannel(
+        socket.send_text, socket.close, WebSocketSettings(**settings)
+    )
+    channel.start()
+    return channel
+
+
+@pytest.mark.asyncio
+async def test_bursts_are_batched_and_merged():
+    socket = FakeSocket()
+    channel = make_channel(socket)
+
+    for i in range(3):
+        channel.publish({"type": "terminal_output", "content": f"line {i}"})
+    channel.publish({"type": "thought_delta", "content": "Hel"})
+    channel.publish({"type": "thought_delta", "content": "lo"})
+    channel.publish({"type": "code_editor", "content": "v1", "language": "python"})
+    channel.publish({"type": "code_editor", "content": "v2", "language": "python"})
+    await channel.drain()
+
+    assert len(socket.frames) == 1
+    events = socket.frames[0]["events"]
+    assert [e["type"] for e in events] == ["terminal_output"] * 3 + [
+        "thought_delta",
+        "code_editor",
+    ]
+    assert events[3]["content"] == "Hello"
+    assert events[4]["content"] == "v2"
+    await channel.close()
+
+
+@pytest.mark.asyncio
+async def test_final_events_are_sent_without_waiting():
+    socket = FakeSocket()
+    channel = make_channel(socket, coalesce_window=10.0)
+
+    channel.publish({"type": "agent_response", "content": "done"})
+    await asyncio.wait_for(channel.drain(), 1.0)
+
+    assert socket.frames == [{"type": "agent_response", "content": "done"}]
+    await channel.close()
+
+
+@pytest.mark.asyncio
+async def test_stalled_client_never_blocks_and_loses_only_progress_events():
+    """Tests that a full queue drops the oldest progress events, keeping final ones."""
+    socket = FakeSocket()
+    socket.unblocked.clear()
+    channel = make_channel(socket, max_pending_events=3, max_batch_events=1)
+    channel.publish({"type": "thought", "content": "first"})
+    await asyncio.sleep(0.05)  # the sender is now stuck on this frame
+
+    channel.publish({"type": "terminal_output", "content": "old"})
+    channel.publish({"type": "agent_response", "content": "answer"})
+    channel.publish({"type": "terminal_output", "content": "newer"})
+    channel.publish({"type": "terminal_output", "content": "newest"})
+    assert channel.dropped == 1
+
+    socket.unblocked.set()
+    await channel.drain()
+    contents = [frame["content"] for frame in socket.frames]
+    assert contents == ["first", "answer", "newer", "newest"]
+    await channel.close()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_slow_clients():
+    socket = FakeSocket()
+    socket.unblocked.clear()
+    closed = []
+    channel = EventChannel(
+        socket.send_text,
+        socket.close,
+        WebSocketSettings(max_pending_events=1, slow_consumer_policy="disconnect"),
+        on_closed=closed.append,
+    )
+    channel.start()
+    channel.publish({"type": "thought", "content": "first"})
+    await asyncio.sleep(0.01)
+    channel.publish({"type": "thought", "content": "second"})
+    channel.publish({"type": "thought", "content": "third"})
+    await asyncio.sleep(0.01)
+
+    assert socket.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert closed == [channel] and channel.closed
+    channel.publish({"type": "thought", "content": "ignored"})
+    assert len(channel) == 0
+
+
+@pytest.mark.asyncio
+async def test_stalled_send_times_out():
+    socket = FakeSocket()
+    socket.unblocked.clear()
+    channel = make_channel(socket, send_timeout=0.02)
+
+    channel.publish({"type": "thought", "content": "stuck"})
+    await asyncio.sleep(0.1)
+
+    assert channel.closed and socket.closed_with == SLOW_CONSUMER_CLOSE_CODE
+
+
+@pytest.mark.asyncio
+async def test_editor_deltas_are_encoded_against_what_was_sent():
+    socket = FakeSocket()
+    channel = make_channel(socket)
+    base = "print('hi')\n" * 30
+    channel.publish({"type": "code_editor", "content": base, "path": "/a.py"})
+    await channel.drain()
+    # Only the last of these is sent, so the delta must be against the first version
+    channel.publish(
+        {"type": "code_editor", "content": base + "x = 1\n", "path": "/a.py"}
+    )
+    channel.publish(
+        {"type": "code_editor", "content": base + "x = 2\n", "path": "/a.py"}
+    )
+    await channel.drain()
+
+    first, second = socket.frames
+    assert first["mode"] == "snapshot" and first["content"] == base
+    assert second["mode"] == "delta" and second["base_version"] == 1
+    assert second["delta"] == {"start": len(base), "end": len(base), "text": "x = 2\n"}
+
+    channel.resync("code_editor:/a.py")
+    await channel.drain()
+    assert socket.frames[-1]["mode"] == "snapshot" and socket.frames[-1]["version"] == 3
+    assert socket.frames[-1]["content"] == base + "x = 2\n"
+    await channel.close()
+
+
+@pytest.mark.asyncio
+async def test_edits_of_different_files_are_not_merged():
+    socket = FakeSocket()
+    channel = make_channel(socket)
+    channel.publish({"type": "code_editor", "content": "a", "path": "/a"})
+    channel.publish({"type": "code_editor", "content": "b", "path": "/b"})
+    await channel.drain()
+
+    assert [e["path"] for e in socket.frames[0]["events"]] == ["/a", "/b"]
+    await channel.close()
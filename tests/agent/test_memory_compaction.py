@@ -0,0 +1,107 @@
+import pytest
+
+from app.compaction import SUMMARY_PREFIX, MemoryCompactor, group_segments
+from app.config import MemorySettings
+from app.schema import Function, Memory, Message, Role, ToolCall
+from examples.benchmarks.fake_llm import FakeChatClient, ScriptedReply, create_fake_llm
+
+
+def tool_turn(i: int, size: int = 400) -> list:
+    call = ToolCall(id=f"call_{i}", function=Function(name="echo", arguments="{}"))
+    # Distinct words, so that any tokenizer counts several tokens per observation
+    observation = " ".join(f"w{i}_{j}" for j in range(size // 4))
+    return [
+        Message.from_tool_calls([call], content=f"step {i}"),
+        Message.tool_message(observation, name="echo", tool_call_id=f"call_{i}"),
+    ]
+
+
+def history(turns: int) -> Memory:
+    memory = Memory()
+    memory.add_message(Message.system_message("system prompt"))
+    memory.add_message(Message.user_message("the task"))
+    for i in range(turns):
+        memory.add_messages(tool_turn(i))
+    return memory
+
+
+@pytest.fixture
+def llm():
+    client = FakeChatClient(lambda params: ScriptedReply(content="short summary"))
+    client.latency.base = 0.0
+    return create_fake_llm("test-memory-compaction", client)
+
+
+def test_group_segments_keeps_tool_results_with_their_call():
+    """Tests that tool results are grouped with the assistant message that called them."""
+    segments = group_segments(history(2).messages)
+    assert [len(s) for s in segments] == [1, 1, 2, 2]
+
+
+@pytest.mark.asyncio
+async def test_compaction_respects_budget_and_pairing(llm):
+    """Tests that old turns are dropped as a whole until the history fits the budget."""
+    memory = history(20)
+    budget = MemoryCompactor(llm).count_tokens(memory.messages) // 3
+    compactor = MemoryCompactor(
+        llm, MemorySettings(token_budget=budget, keep_recent_messages=4)
+    )
+
+    assert await compactor.compact(memory)
+    assert compactor.count_tokens(memory.messages) <= budget
+    assert [m.content for m in memory.messages[:2]] == ["system prompt", "the task"]
+    assert memory.messages[2].role == Role.ASSISTANT
+    assert memory.messages[-1].tool_call_id == "call_19"
+    for segment in group_segments(memory.messages):
+        assert segment[0].role != Role.TOOL
+
+
+@pytest.mark.asyncio
+async def test_compaction_summarizes_removed_turns(llm):
+    """Tests that removed turns are replaced by a summary from the summary model."""
+    memory = history(20)
+    budget = MemoryCompactor(llm).count_tokens(memory.messages) // 2
+    compactor = MemoryCompactor(
+        llm,
+        MemorySettings(token_budget=budget, summarize=True, summary_max_tokens=100),
+    )
+
+    assert await compactor.compact(memory)
+    assert memory.messages[2].content == f"{SUMMARY_PREFIX}\nshort summary"
+
+
+@pytest.mark.asyncio
+async def test_reserved_tokens_are_taken_from_the_budget(llm):
+    """Tests that the system prompt and tool schemas count against the budget."""
+    memory = history(20)
+    total = MemoryCompactor(llm).count_tokens(memory.messages)
+    compactor = MemoryCompactor(llm, MemorySettings(token_budget=total + 10))
+
+    assert not await compactor.compact(memory)
+    assert await compactor.compact(memory, reserved_tokens=total // 2)
+    assert compactor.count_tokens(memory.messages) <= total + 10 - total // 2
+
+
+@pytest.mark.asyncio
+async def test_old_images_are_stripped(llm):
+    """Tests that only the most recent image attachments are kept."""
+    memory = Memory()
+    for i in range(4):
+        memory.add_message(Message.user_message(f"screen {i}", base64_image="aGVsbG8="))
+    compactor = MemoryCompactor(llm, MemorySettings(keep_images=1))
+
+    await compactor.compact(memory)
+    assert [bool(m.base64_image) for m in memory.messages] == [
+        False,
+        False,
+        False,
+        True,
+    ]
+
+
+def test_count_trim_never_orphans_tool_results():
+    """Tests that trimming by message count drops tool results whose call was cut off."""
+    memory = Memory(max_messages=3)
+    for i in range(3):
+        memory.add_messages(tool_turn(i))
+    assert memory.messages[0].role == Role.ASSISTANT
@@ -0,0 +1,122 @@
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.config import RoutingSettings
+from app.llm_router import ModelRouter, StepFeatures, model_router
+from app.schema import Message
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+class ShellView(BaseTool):
+    name: str = "shell_view"
+    description: str = "Shows the shell output"
+    parameters: dict = {"type": "object", "properties": {}}
+
+    async def execute(self) -> str:
+        return "build finished"
+
+
+def fake_client(replies) -> FakeChatClient:
+    client = FakeChatClient(TrajectoryReplayer.from_dict({"replies": replies}))
+    client.latency.base = 0.0
+    return client
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    monkeypatch.setattr(
+        model_router,
+        "settings",
+        RoutingSettings(enabled=True, light_config="test-route-light"),
+    )
+    monkeypatch.setattr(model_router, "stats", {})
+    return model_router
+
+
+@pytest.mark.asyncio
+async def test_step_after_polling_goes_to_light_model(routing):
+    """Tests that the step following a light tool is served by the light config."""
+    full = fake_client(
+        [
+            {
+                "content": "Check the build.",
+                "tool_calls": [{"name": "shell_view", "arguments": {}}],
+            }
+        ]
+    )
+    light = fake_client(
+        [
+            {
+                "content": "Done.",
+                "tool_calls": [
+                    {"name": "terminate", "arguments": {"status": "success"}}
+                ],
+            }
+        ]
+    )
+    create_fake_llm("test-route-light", light, model="gpt-4o-mini")
+    agent = ToolCallAgent(
+        llm=create_fake_llm("test-route-full", full),
+        available_tools=ToolCollection(ShellView(), Terminate()),
+        max_steps=3,
+    )
+
+    await agent.run("wait for the build")
+
+    assert full.requests == 2  # reasoning + tool selection of the first step
+    assert light.requests == 2
+    stats = routing.get_stats()
+    assert stats["test-route-full/new_task"]["steps"] == 1
+    assert stats["test-route-light/light_tools"]["steps"] == 1
+    assert stats["test-route-light/light_tools"]["input_tokens"] > 0
+
+
+def features(*tools, content="ok", streak=0) -> StepFeatures:
+    messages = [Message.user_message("task"), Message.assistant_message("thinking")]
+    messages += [
+        Message.tool_message(content, name=name, tool_call_id=name) for name in tools
+    ]
+    messages.append(Message.user_message("next step?"))
+    return StepFeatures.from_messages(messages, streak, next_step_prompt="next step?")
+
+
+def test_routing_rules():
+    router = ModelRouter(RoutingSettings(enabled=True, max_consecutive_light_steps=2))
+
+    assert router.decide(features(), "default").reason == "new_task"
+    assert router.decide(features("file_read"), "default").light
+    assert (
+        router.decide(features("file_read", "shell_exec"), "default").reason
+        == "default"
+    )
+    assert (
+        router.decide(
+            features("file_read", content="Error: no such file"), "default"
+        ).reason
+        == "tool_error"
+    )
+    assert (
+        router.decide(features("file_read", streak=2), "default").reason
+        == "light_streak"
+    )
+
+    # A new request after the previous run ended with a light tool
+    follow_up = [
+        Message.user_message("task"),
+        Message.tool_message("done", name="file_read", tool_call_id="t"),
+        Message.user_message("another task"),
+        Message.user_message("next step?"),
+    ]
+    step = StepFeatures.from_messages(follow_up, next_step_prompt="next step?")
+    assert step.last_tools == []
+    assert router.decide(step, "default").reason == "new_task"
+
+    router.classifier = lambda step: 0.9 if step.history_messages < 10 else 0.1
+    decision = router.decide(features("shell_exec"), "default")
+    assert decision.light and decision.reason == "classifier"
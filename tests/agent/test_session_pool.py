@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agent.session_pool import AgentSessionPool, WarmAgentPool
+from app.config import SessionPoolSettings
+from app.schema import Memory, Message
+from app.token_ledger import token_ledger
+
+
+class FakeAgent:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.memory = Memory()
+        self.cleanups = 0
+
+    async def cleanup(self):
+        self.cleanups += 1
+
+
+def make_pool(**settings) -> AgentSessionPool:
+    return AgentSessionPool(FakeAgent, SessionPoolSettings(**settings))
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_session_is_evicted_and_cleaned_up():
+    pool = make_pool(max_sessions=2)
+    first = await pool.get("a")
+    second = await pool.get("b")
+    await pool.get("a")  # "b" is now the least recently used
+    await pool.get("c")
+
+    assert "a" in pool and "c" in pool and "b" not in pool
+    assert second.cleanups == 1 and first.cleanups == 0
+    assert pool.get_stats()["evicted_lru"] == 1
+
+
+@pytest.mark.asyncio
+async def test_evicted_session_is_rehydrated_with_its_history():
+    """Tests that a new agent gets the history of the evicted one, without screenshots."""
+    pool = make_pool(max_sessions=1)
+    agent = await pool.get("a")
+    agent.memory.add_messages(
+        [
+            Message.user_message("build the site"),
+            Message.tool_message(
+                "ok", name="browser_view", tool_call_id="1", base64_image="x" * 1000
+            ),
+        ]
+    )
+    await pool.get("b")
+
+    rehydrated = await pool.get("a")
+
+    assert rehydrated is not agent
+    assert [m.content for m in rehydrated.memory.messages] == ["build the site", "ok"]
+    assert rehydrated.memory.messages[1].base64_image is None
+    assert agent.memory.messages[
+        1
+    ].base64_image  # the evicted agent's memory is untouched
+    assert pool.get_stats()["rehydrated"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sessions_in_use_are_never_evicted():
+    pool = make_pool(max_sessions=1, idle_timeout=0.0)
+    async with pool.lease("a") as busy:
+        await pool.get("b")
+        assert "a" in pool and "b" in pool  # over capacity rather than evicting "a"
+        assert await pool.reap_idle(now=float("inf")) == 1
+        assert busy.cleanups == 0
+    assert "a" in pool and "b" not in pool
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_reaped():
+    pool = make_pool(idle_timeout=60.0)
+    agent = await pool.get("a")
+    await pool.get("b")
+
+    assert await pool.reap_idle() == 0
+    assert await pool.reap_idle(now=time.monotonic() + 3600) == 2
+    assert len(pool) == 0 and agent.cleanups == 1
+    assert pool.get_stats()["evicted_idle"] == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_create_one_agent():
+    pool = make_pool()
+    agents = await asyncio.gather(*(pool.get("a") for _ in range(5)))
+    assert all(agent is agents[0] for agent in agents)
+
+
+@pytest.mark.asyncio
+async def test_forgotten_sessions_leave_the_token_ledger():
+    pool = make_pool(max_sessions=1, max_snapshots=1)
+    token_ledger.session("pool-a").record("default", None, 10, 1)
+    await pool.get("pool-a")
+    await pool.get("pool-b")
+    assert token_ledger.get("pool-a") is not None  # evicted, history still kept
+
+    await pool.get("pool-c")  # evicts "pool-b", whose snapshot pushes out "pool-a"
+
+    assert token_ledger.get("pool-a") is None
+    assert pool.get_stats()["snapshots"] == 1
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_hands_out_ready_agents_and_refills():
+    created = []
+
+    async def factory():
+        agent = FakeAgent(f"warm-{len(created)}")
+        created.append(agent)
+        return agent
+
+    warm = WarmAgentPool(factory, target=2)
+    assert warm.take() is None  # empty at first, but the refill starts
+    await asyncio.sleep(0)
+    assert len(warm) == 2
+
+    agent = warm.take()
+    assert agent is created[0]
+    await asyncio.sleep(0)
+    assert len(warm) == 2 and len(created) == 3
+    assert warm.get_stats()["hits"] == 1 and warm.get_stats()["misses"] == 1
+
+    await warm.close()
+    assert len(warm) == 0
+    assert [a.cleanups for a in created] == [0, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_session_pool_accepts_async_factories():
+    async def factory(session_id):
+        return FakeAgent(session_id)
+
+    pool = AgentSessionPool(factory, SessionPoolSettings())
+    assert (await pool.get("a")).session_id == "a"
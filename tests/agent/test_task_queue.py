@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.config import TaskQueueSettings
+from app.schema import Message, ToolCall
+from app.task_queue import AgentTaskQueue, TaskQueueFull
+from app.token_ledger import current_session, token_ledger, usage_scope
+from app.tool.shell_manager import shell_manager, shell_owner
+
+
+def make_queue(**settings) -> AgentTaskQueue:
+    return AgentTaskQueue(TaskQueueSettings(**settings))
+
+
+@pytest.mark.asyncio
+async def test_runs_of_a_session_are_ordered_and_sessions_share_the_limit():
+    queue = make_queue(max_concurrent_runs=2)
+    log = []
+    active = []
+    peak = []
+
+    def job(name):
+        async def run():
+            active.append(name)
+            peak.append(len(active))
+            log.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            log.append(f"end {name}")
+            active.remove(name)
+
+        return run
+
+    assert queue.submit("a", job("a1")) == 0
+    assert queue.submit("a", job("a2")) == 1
+    queue.submit("b", job("b1"))
+    queue.submit("c", job("c1"))
+    await queue.join()
+
+    assert log.index("end a1") < log.index("start a2")
+    assert max(peak) == 2
+    assert queue.get_stats()["queued"] == 0 and queue.get_stats()["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_backlog_beyond_the_limit_is_rejected_with_a_retry_hint():
+    queue = make_queue(max_concurrent_runs=1, max_queued_runs=2, retry_after=7.0)
+    release = asyncio.Event()
+
+    async def run():
+        await release.wait()
+
+    queue.submit("a", run)
+    queue.submit("b", run)
+    with pytest.raises(TaskQueueFull) as error:
+        queue.submit("c", run)
+    assert error.value.retry_after == 7.0
+
+    release.set()
+    await queue.join()
+    queue.submit("c", run)  # room again
+    await queue.join()
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_the_running_task_and_drops_queued_ones():
+    queue = make_queue()
+    started = asyncio.Event()
+    outcomes = []
+
+    async def slow():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            outcomes.append("cancelled")
+            raise
+
+    async def never():
+        outcomes.append("ran")
+
+    queue.submit("a", slow)
+    queue.submit("a", never)
+    await started.wait()
+
+    assert queue.cancel("a") == (True, 1)
+    await queue.join()
+    assert outcomes == ["cancelled"]
+
+    queue.submit("a", never)  # the session keeps working after a cancel
+    await queue.join()
+    assert outcomes == ["cancelled", "ran"]
+
+
+@pytest.fixture
+def ledger_sessions():
+    """Session ids the test creates in the process-wide token ledger, dropped afterwards."""
+    session_ids = ["ctx-a", "ctx-b"]
+    yield session_ids
+    for session_id in session_ids:
+        token_ledger.drop(session_id)
+
+
+@pytest.mark.asyncio
+async def test_runs_keep_the_context_they_were_submitted_in(ledger_sessions):
+    queue = make_queue()
+    seen = []
+
+    async def run():
+        seen.append(current_session().session_id)
+
+    for session_id in ledger_sessions:
+        with usage_scope(session_id=session_id):
+            queue.submit("same", run)
+    await queue.join()
+
+    assert seen == ledger_sessions
+
+
+def test_close_pending_tool_calls_answers_unfinished_calls():
+    agent = ToolCallAgent()
+    calls = [
+        ToolCall(id=f"call_{i}", function={"name": "bash", "arguments": "{}"})
+        for i in range(2)
+    ]
+    agent.memory.add_messages(
+        [
+            Message.user_message("run it"),
+            Message.from_tool_calls(content="", tool_calls=calls),
+            Message.tool_message("done", name="bash", tool_call_id="call_0"),
+        ]
+    )
+
+    assert agent.close_pending_tool_calls("cancelled") == 1
+    assert agent.memory.messages[-1].tool_call_id == "call_1"
+    assert agent.close_pending_tool_calls("cancelled") == 0
+
+
+def is_alive(pid: int) -> bool:
+    """Whether a process exists and is not a zombie waiting to be reaped."""
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.asyncio
+async def test_shell_processes_are_killed_by_owner():
+    async def start(owner):
+        shell_owner.set(owner)
+        # Like shell_exec: a compound command whose child outlives the shell's own pid
+        process = await asyncio.create_subprocess_shell(
+            "sleep 987 & echo $!; wait",
+            stdout=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        child = int(await process.stdout.readline())
+        return shell_manager.create_session("sleep 987", process), process, child
+
+    mine, my_process, my_child = await asyncio.create_task(start("owner-a"))
+    other, other_process, other_child = await asyncio.create_task(start("owner-b"))
+    try:
+        assert shell_manager.kill_sessions("owner-a") == 1
+        assert await my_process.wait() != 0
+        for _ in range(50):
+            if not is_alive(my_child):
+                break
+            await asyncio.sleep(0.01)
+        assert not is_alive(my_child)
+        assert shell_manager.get_session(mine) is None
+        assert shell_manager.get_session(other) is not None
+        assert other_process.returncode is None and is_alive(other_child)
+    finally:
+        shell_manager.kill_sessions("owner-b")
+        await other_process.wait()
@@ -0,0 +1,109 @@
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import ThinkMode, ToolChoice
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+REPLIES = [
+    {
+        "content": "I will echo first.",
+        "tool_calls": [{"name": "echo", "arguments": {"text": "hello"}}],
+    },
+    {
+        "content": "The echo worked, done.",
+        "tool_calls": [{"name": "terminate", "arguments": {"status": "success"}}],
+    },
+]
+
+
+class EchoTool(BaseTool):
+    name: str = "echo"
+    description: str = "Echoes its text"
+    parameters: dict = {"type": "object", "properties": {"text": {"type": "string"}}}
+
+    async def execute(self, text: str = "") -> str:
+        return text
+
+
+class RecordingClient(FakeChatClient):
+    """Fake provider keeping the parameters of every request."""
+
+    def __init__(self):
+        super().__init__(TrajectoryReplayer.from_dict({"replies": REPLIES}))
+        self.latency.base = 0.0
+        self.params = []
+
+    async def create(self, **params):
+        self.params.append(params)
+        return await super().create(**params)
+
+
+def make_agent(config_name: str, mode: ThinkMode, client: RecordingClient):
+    return ToolCallAgent(
+        llm=create_fake_llm(config_name, client),
+        available_tools=ToolCollection(EchoTool(), Terminate()),
+        think_mode=mode,
+        tool_choices=ToolChoice.REQUIRED,
+        max_steps=4,
+    )
+
+
+@pytest.mark.asyncio
+async def test_single_call_sends_one_tool_request_per_step():
+    """Tests that each step is a single ask_tool request with the required tool choice."""
+    client = RecordingClient()
+    agent = make_agent("test-think-single", ThinkMode.SINGLE_CALL, client)
+
+    await agent.run("Echo hello, then stop.")
+
+    assert client.requests == len(REPLIES)
+    for params in client.params:
+        assert params["tool_choice"] == ToolChoice.REQUIRED
+        assert {tool["function"]["name"] for tool in params["tools"]} == {
+            "echo",
+            "terminate",
+        }
+
+
+@pytest.mark.asyncio
+async def test_single_call_keeps_reasoning_and_tool_calls_in_one_message():
+    """Tests that the reasoning and the tool calls of a step form one assistant message."""
+    client = RecordingClient()
+    agent = make_agent("test-think-single-memory", ThinkMode.SINGLE_CALL, client)
+
+    await agent.run("Echo hello, then stop.")
+
+    assistant = [m for m in agent.memory.messages if m.role == "assistant"]
+    assert [m.content for m in assistant] == [reply["content"] for reply in REPLIES]
+    assert [[call.function.name for call in m.tool_calls] for m in assistant] == [
+        ["echo"],
+        ["terminate"],
+    ]
+    # Every tool call is answered by the tool message right after its assistant message
+    first_call = assistant[0].tool_calls[0]
+    index = agent.memory.messages.index(assistant[0])
+    assert agent.memory.messages[index + 1].tool_call_id == first_call.id
+
+
+@pytest.mark.asyncio
+async def test_two_phase_sends_a_reasoning_request_before_each_tool_request():
+    """Tests the default mode for comparison: two requests per step."""
+    client = RecordingClient()
+    agent = make_agent("test-think-two-phase", ThinkMode.TWO_PHASE, client)
+
+    await agent.run("Echo hello, then stop.")
+
+    assert client.requests == 4
+    assert ["tools" in params for params in client.params] == [
+        False,
+        True,
+        False,
+        True,
+    ]
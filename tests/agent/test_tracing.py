@@ -0,0 +1,154 @@
+import asyncio
+import json
+
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.config import TracingSettings
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+from app.tracing import to_chrome_trace, tracer
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+class EchoTool(BaseTool):
+    name: str = "echo"
+    description: str = "Echoes its text"
+    parameters: dict = {"type": "object", "properties": {"text": {"type": "string"}}}
+
+    async def execute(self, text: str = "") -> str:
+        if self.callback_handler:
+            await self.callback_handler("action", content=text)
+        return text
+
+
+@pytest.fixture
+def tracing(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        tracer, "settings", TracingSettings(enabled=True, output_dir=str(tmp_path))
+    )
+    tracer.exported.clear()
+    return tmp_path
+
+
+def make_agent() -> ToolCallAgent:
+    replayer = TrajectoryReplayer.from_dict(
+        {
+            "replies": [
+                {
+                    "content": "Echo first.",
+                    "tool_calls": [{"name": "echo", "arguments": {"text": "hello"}}],
+                },
+                {
+                    "content": "Done.",
+                    "tool_calls": [
+                        {"name": "terminate", "arguments": {"status": "success"}}
+                    ],
+                },
+            ]
+        }
+    )
+    client = FakeChatClient(replayer)
+    client.latency.base = 0.0
+
+    async def callback(event_type, content=None, **kwargs):
+        pass
+
+    return ToolCallAgent(
+        llm=create_fake_llm("test-tracing", client),
+        available_tools=ToolCollection(EchoTool(), Terminate()),
+        callback_handler=callback,
+        max_steps=3,
+    )
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.asyncio
+async def test_agent_run_is_exported_as_chrome_and_otlp(tracing):
+    """Tests that a run produces nested spans with attributes in both export formats."""
+    agent = make_agent()
+    agent.available_tools.get_tool("echo").callback_handler = agent.callback_handler
+    await agent.run("say hello")
+
+    chrome_path, otlp_path = sorted(tracer.exported, key=lambda p: p.name)
+    events = load(chrome_path)["traceEvents"]
+    spans = load(otlp_path)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    names = [e["name"] for e in events if e["ph"] == "X"]
+
+    for name in (
+        "agent.run",
+        "agent.step",
+        "think.reasoning",
+        "think.ask_tool",
+        "llm.format_messages",
+        "llm.count_message_tokens",
+        "tool.execute",
+        "callback.send",
+    ):
+        assert name in names
+    reasoning = next(e for e in events if e["name"] == "think.reasoning")
+    assert reasoning["args"]["input_tokens"] > 0
+    tool = next(
+        e for e in events if e["name"] == "tool.execute" and e["args"]["tool"] == "echo"
+    )
+    assert tool["args"]["bytes"] == len("hello")
+
+    by_id = {s["spanId"]: s for s in spans}
+    roots = [s for s in spans if "parentSpanId" not in s]
+    assert [s["name"] for s in roots] == ["agent.run"]
+    assert len({s["traceId"] for s in spans}) == 1
+    step = next(s for s in spans if s["name"] == "think.ask_tool")
+    assert by_id[step["parentSpanId"]]["name"] == "agent.step"
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracing_records_nothing(tmp_path, monkeypatch):
+    """Tests that no span is recorded nor file written when tracing is off."""
+    monkeypatch.setattr(
+        tracer, "settings", TracingSettings(enabled=False, output_dir=str(tmp_path))
+    )
+    with tracer.span("agent.run") as span:
+        assert span is None
+        assert tracer.current() is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_chrome_trace_puts_concurrent_tasks_on_separate_rows(tracing):
+    """Tests that spans from different lanes get distinct thread ids."""
+    with tracer.span("root") as root:
+        with tracer.span("child") as child:
+            child.lane = "task-other"
+    events = to_chrome_trace([root, child])["traceEvents"]
+    tids = {e["name"]: e["tid"] for e in events if e["ph"] == "X"}
+    assert tids["root"] != tids["child"]
+
+
+@pytest.mark.asyncio
+async def test_spans_ending_after_their_root_are_dropped(tracing):
+    """Tests that a detached task outliving its root does not leave a trace behind."""
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def background():
+        with tracer.span("late"):
+            started.set()
+            await release.wait()
+
+    with tracer.span("root") as root:
+        task = asyncio.create_task(background())
+        await started.wait()
+    release.set()
+    await task
+
+    assert root.trace_id not in tracer._traces
+    (chrome,) = [p for p in tracer.exported if p.name.endswith(".chrome.json")]
+    names = [e["name"] for e in load(chrome)["traceEvents"] if e["ph"] == "X"]
+    assert names == ["root"]
@@ -0,0 +1,145 @@
+import pytest
+
+from app.ui_state import UIStateTracker, content_hash, text_delta
+
+
+def apply(old, delta):
+    if "text" in delta:
+        return old[: delta["start"]] + delta["text"] + old[delta["end"] :]
+    items = list(old[: delta["length"]])
+    for index, item in delta["items"].items():
+        if int(index) < len(items):
+            items[int(index)] = item
+        else:
+            items.append(item)
+    return items
+
+
+class Client:
+    """Rebuilds full events like the frontend does."""
+
+    def __init__(self):
+        self.streams = {}
+
+    def receive(self, event):
+        field = "steps" if event["type"] == "plan" else "content"
+        if event["mode"] == "snapshot":
+            value = event[field]
+        else:
+            version, old = self.streams[event["stream"]]
+            assert version == event["base_version"]
+            value = apply(old, event["delta"])
+        assert content_hash(value) == event["hash"]
+        self.streams[event["stream"]] = (event["version"], value)
+        return value
+
+
+@pytest.mark.parametrize(
+    "old, new, expected",
+    [
+        ("abc", "abcdef", (3, 3, "def")),
+        ("abcdef", "abc", (3, 6, "")),
+        ("hello world", "hello brave world", (6, 6, "brave ")),
+        ("aaaa", "aaaaa", (4, 4, "a")),
+        ("same", "same", (4, 4, "")),
+        ("", "new", (0, 0, "new")),
+        ("x🙂y", "x🙂🙂y", (2, 2, "🙂")),
+    ],
+)
+def test_text_delta_is_a_minimal_splice(old, new, expected):
+    delta = text_delta(old, new)
+    assert (delta["start"], delta["end"], delta["text"]) == expected
+    assert apply(old, delta) == new
+
+
+def test_growing_terminal_output_is_sent_as_appends():
+    tracker = UIStateTracker()
+    client = Client()
+    output = "root@agent:~$ view_session s1\n" + "line\n" * 200
+    first = tracker.encode(
+        {"type": "terminal_output", "content": output, "shell_id": "s1"}
+    )
+    assert first["mode"] == "snapshot" and first["version"] == 1
+    client.receive(first)
+
+    output += "one more line\n"
+    second = tracker.encode(
+        {"type": "terminal_output", "content": output, "shell_id": "s1"}
+    )
+    assert second["mode"] == "delta" and "content" not in second
+    assert (
+        second["delta"]["start"]
+        == second["delta"]["end"]
+        == len(output) - len("one more line\n")
+    )
+    assert client.receive(second) == output
+
+
+def test_files_and_plans_are_separate_streams():
+    tracker = UIStateTracker()
+    client = Client()
+    code = "def f():\n    return 1\n" * 50
+    events = [
+        {"type": "code_editor", "content": code, "path": "/a.py", "language": "python"},
+        {
+            "type": "code_editor",
+            "content": "other file",
+            "path": "/b.py",
+            "language": "python",
+        },
+        {
+            "type": "code_editor",
+            "content": code.replace("return 1", "return 2", 1),
+            "path": "/a.py",
+        },
+        {
+            "type": "plan",
+            "plan_id": "p",
+            "steps": [{"id": "0", "status": "pending"}] * 4,
+        },
+        {
+            "type": "plan",
+            "plan_id": "p",
+            "steps": [{"id": "0", "status": "completed"}]
+            + [{"id": "0", "status": "pending"}] * 4,
+        },
+    ]
+    encoded = [tracker.encode(event) for event in events]
+
+    assert [e["mode"] for e in encoded] == [
+        "snapshot",
+        "snapshot",
+        "delta",
+        "snapshot",
+        "delta",
+    ]
+    assert encoded[2]["base_version"] == 1 and encoded[2]["delta"]["text"] == "2"
+    assert sorted(encoded[4]["delta"]["items"]) == ["0", "4"]
+    for event, sent in zip(events, encoded):
+        field = "steps" if event["type"] == "plan" else "content"
+        assert client.receive(sent) == event[field]
+
+
+def test_events_without_a_stream_pass_through_and_big_changes_are_snapshots():
+    tracker = UIStateTracker()
+    event = {"type": "code_editor", "content": "no path"}
+    assert tracker.encode(event) is event
+
+    tracker.encode({"type": "code_editor", "content": "a" * 10, "path": "/f"})
+    rewritten = tracker.encode(
+        {"type": "code_editor", "content": "b" * 10, "path": "/f"}
+    )
+    assert rewritten["mode"] == "snapshot" and rewritten["version"] == 2
+
+
+def test_resync_resends_a_snapshot_with_a_newer_version():
+    tracker = UIStateTracker(max_streams=2)
+    for path in ("/a", "/b", "/c"):
+        tracker.encode({"type": "code_editor", "content": "x" * 20, "path": path})
+    assert tracker.resync("code_editor:/a") == []  # evicted
+
+    (event,) = tracker.resync("code_editor:/b")
+    again = tracker.encode(event)
+    assert again["mode"] == "snapshot" and again["version"] == 2
+    after = tracker.encode({"type": "code_editor", "content": "x" * 21, "path": "/b"})
+    assert after["mode"] == "delta" and after["base_version"] == 2
@@ -0,0 +1,60 @@
+import pytest
+
+from examples.benchmarks.agent_loop import find_regressions, run_scenario
+from examples.benchmarks.fake_llm import LatencyModel, TrajectoryReplayer
+
+
+def test_replayer_substitutes_workdir_and_repeats_last_reply():
+    """Tests that trajectories are replayed in order with the workdir substituted."""
+    replayer = TrajectoryReplayer.from_dict(
+        {
+            "replies": [
+                {
+                    "tool_calls": [
+                        {"name": "file_read", "arguments": {"file": "{workdir}/a"}}
+                    ]
+                },
+                {"content": "done"},
+            ]
+        },
+        workdir="/tmp/run",
+    )
+    tools = {"tools": [{"type": "function"}]}
+
+    assert replayer(tools).tool_calls[0]["arguments"] == '{"file": "/tmp/run/a"}'
+    assert replayer({}).content == "done"
+    assert replayer(tools).content == "done"
+    assert replayer(tools).content == "done"
+
+
+@pytest.mark.asyncio
+async def test_swe_scenario_reports_overhead():
+    """Tests that the SWE scenario runs offline and reports per-step overhead."""
+    result = await run_scenario("swe", LatencyModel(base=0.0))
+
+    assert result["steps"] == 7
+    assert result["llm_requests"] >= 7
+    assert result["framework_overhead_s"] >= 0
+    assert "token_counting" in result["overhead_breakdown_ms_per_step"]
+
+
+def test_find_regressions():
+    """Tests that only scenarios slower than the allowed ratio are reported."""
+    baseline = {"summary": [{"scenario": "swe", "median_overhead_per_step_ms": 1.0}]}
+
+    assert (
+        find_regressions(
+            [{"scenario": "swe", "median_overhead_per_step_ms": 1.2}], baseline, 0.25
+        )
+        == []
+    )
+    assert (
+        len(
+            find_regressions(
+                [{"scenario": "swe", "median_overhead_per_step_ms": 2.0}],
+                baseline,
+                0.25,
+            )
+        )
+        == 1
+    )
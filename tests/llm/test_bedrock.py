@@ -0,0 +1,172 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.bedrock import ChatCompletions
+from app.llm import ToolCallStreamAssembler
+
+
+class BlockingBedrock:
+    """Synchronous stand-in for the boto3 bedrock-runtime client."""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.requests = []
+
+    def converse(self, **request):
+        self.requests.append(request)
+        time.sleep(self.delay)
+        return {
+            "output": {
+                "message": {
+                    "role": "assistant",
+                    "content": [
+                        {"text": "Reading it."},
+                        {
+                            "toolUse": {
+                                "toolUseId": "t1",
+                                "name": "file_read",
+                                "input": {"file": "/a"},
+                            }
+                        },
+                    ],
+                }
+            },
+            "stopReason": "tool_use",
+            "usage": {"inputTokens": 12, "outputTokens": 5, "totalTokens": 17},
+        }
+
+    def converse_stream(self, **request):
+        self.requests.append(request)
+
+        def events():
+            yield {"messageStart": {"role": "assistant"}}
+            for text in ("Hel", "lo"):
+                time.sleep(self.delay / 4)
+                yield {
+                    "contentBlockDelta": {
+                        "contentBlockIndex": 0,
+                        "delta": {"text": text},
+                    }
+                }
+            yield {
+                "contentBlockStart": {
+                    "contentBlockIndex": 1,
+                    "start": {"toolUse": {"toolUseId": "t2", "name": "idle"}},
+                }
+            }
+            for part in ('{"status"', ': "ok"}'):
+                yield {
+                    "contentBlockDelta": {
+                        "contentBlockIndex": 1,
+                        "delta": {"toolUse": {"input": part}},
+                    }
+                }
+            yield {"messageStop": {"stopReason": "tool_use"}}
+            yield {
+                "metadata": {
+                    "usage": {"inputTokens": 9, "outputTokens": 4, "totalTokens": 13}
+                }
+            }
+
+        return {"stream": events()}
+
+
+@pytest.fixture
+def completions():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield ChatCompletions(BlockingBedrock(), executor)
+
+
+@pytest.mark.asyncio
+async def test_converse_does_not_block_event_loop(completions):
+    """Tests that concurrent Bedrock calls run in the pool while the loop keeps ticking."""
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *(
+            completions.create(
+                model="m",
+                messages=[{"role": "user", "content": "hi"}],
+                max_completion_tokens=100,
+                stream=False,
+            )
+            for _ in range(3)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    task.cancel()
+
+    assert elapsed < 0.5
+    assert ticks >= 10
+    message = responses[0].choices[0].message
+    assert message.tool_calls[0].id == "t1"
+    assert responses[0].usage.prompt_tokens == 12
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_deltas_tool_calls_and_usage(completions):
+    """Tests that streaming yields OpenAI-style chunks ending with usage."""
+    stream = await completions.create(
+        model="m", messages=[{"role": "user", "content": "hi"}], stream=True
+    )
+    assembler = ToolCallStreamAssembler()
+    content, usage = "", None
+    async for chunk in stream:
+        if chunk.usage:
+            usage = chunk.usage
+        if not chunk.choices:
+            continue
+        content += chunk.choices[0].delta.content or ""
+        assembler.feed(chunk.choices[0].delta.tool_calls)
+    assembler.finish()
+
+    assert content == "Hello"
+    assert assembler.tool_calls[0].function.arguments == '{"status": "ok"}'
+    assert usage.completion_tokens == 4
+
+
+def test_tool_results_use_their_own_call_ids(completions):
+    """Tests that tool results are matched by tool_call_id rather than global state."""
+    _, messages = completions._convert_openai_messages_to_bedrock_format(
+        [
+            {"role": "user", "content": "go"},
+            {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [
+                    {
+                        "id": "a",
+                        "type": "function",
+                        "function": {"name": "x", "arguments": "{}"},
+                    },
+                    {
+                        "id": "b",
+                        "type": "function",
+                        "function": {"name": "y", "arguments": "{}"},
+                    },
+                ],
+            },
+            {"role": "tool", "tool_call_id": "a", "content": "1"},
+            {"role": "tool", "tool_call_id": "b", "content": "2"},
+        ]
+    )
+
+    assert [block["toolUse"]["toolUseId"] for block in messages[1]["content"]] == [
+        "a",
+        "b",
+    ]
+    assert [block["toolResult"]["toolUseId"] for block in messages[2]["content"]] == [
+        "a",
+        "b",
+    ]
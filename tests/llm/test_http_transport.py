@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.config import LLMSettings
+from app.llm import SharedHTTPClients
+
+
+def make_settings(base_url: str, **overrides) -> LLMSettings:
+    return LLMSettings(
+        model="gpt-4o",
+        base_url=base_url,
+        api_key="key",
+        api_type="openai",
+        api_version="",
+        **overrides,
+    )
+
+
+@pytest.mark.asyncio
+async def test_clients_share_pool_per_base_url():
+    """Tests that configs with the same base_url reuse one pooled client."""
+    try:
+        first = SharedHTTPClients.get(make_settings("https://api.example.com/v1/"))
+        second = SharedHTTPClients.get(make_settings("https://api.example.com/v1"))
+        other = SharedHTTPClients.get(make_settings("https://other.example.com/v1"))
+
+        assert first is second
+        assert first is not other
+    finally:
+        await SharedHTTPClients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_closed_client_is_recreated():
+    """Tests that a new pool is created after shutdown."""
+    settings = make_settings("https://api.example.com/v1", read_timeout=30.0)
+    client = SharedHTTPClients.get(settings)
+    await SharedHTTPClients.aclose()
+
+    recreated = SharedHTTPClients.get(settings)
+    try:
+        assert recreated is not client
+        assert recreated.timeout.read == 30.0
+    finally:
+        await SharedHTTPClients.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_settings_are_part_of_the_key():
+    """Tests that configs with different pool settings do not share a client."""
+    try:
+        small = SharedHTTPClients.get(
+            make_settings("https://api.example.com/v1", max_connections=2)
+        )
+        large = SharedHTTPClients.get(
+            make_settings("https://api.example.com/v1", max_connections=200)
+        )
+
+        assert small is not large
+        assert small._transport._pool._max_connections == 2
+        assert large._transport._pool._max_connections == 200
+    finally:
+        await SharedHTTPClients.aclose()
+
+
+def test_each_event_loop_gets_its_own_client():
+    """Tests that a client is never reused from another event loop."""
+    settings = make_settings("https://api.example.com/v1")
+
+    async def get_and_close():
+        client = SharedHTTPClients.get(settings)
+        assert SharedHTTPClients.get(settings) is client
+        await SharedHTTPClients.aclose()
+        return client
+
+    first = asyncio.run(get_and_close())
+    second = asyncio.run(get_and_close())
+    assert first is not second
+    assert first.is_closed and second.is_closed
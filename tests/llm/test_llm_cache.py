@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from app.llm_cache import LLMResponseCache
+from examples.benchmarks.fake_llm import FakeChatClient, ScriptedReply, create_fake_llm
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_round_trip_and_key_sensitivity(tmp_path):
+    """Tests that stored responses are returned only for identical requests."""
+    cache = LLMResponseCache(tmp_path / "cache.sqlite")
+    key = cache.make_key("ask", "gpt-4o", MESSAGES, temperature=0.0)
+
+    assert cache.get(key) is None
+    cache.set(key, "ask", "world")
+    assert cache.get(key) == "world"
+    assert cache.make_key("ask", "gpt-4o", MESSAGES, temperature=0.5) != key
+    assert (
+        cache.make_key("ask", "gpt-4o", MESSAGES, temperature=0.0, max_tokens=10) != key
+    )
+    assert cache.get_stats()["hits"] == 1
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_ttl_expiry(tmp_path):
+    """Tests that entries older than the TTL are treated as misses and removed."""
+    cache = LLMResponseCache(tmp_path / "cache.sqlite", ttl_seconds=0.01)
+    cache.set("k", "ask", "value")
+    time.sleep(0.05)
+
+    assert cache.get("k") is None
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_lru_eviction(tmp_path):
+    """Tests that the least recently used entry is evicted past the entry cap."""
+    cache = LLMResponseCache(tmp_path / "cache.sqlite", max_entries=2)
+    cache.set("a", "ask", "1")
+    time.sleep(0.01)
+    cache.set("b", "ask", "2")
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.set("c", "ask", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_size_cap_and_replaced_entries(tmp_path):
+    """Tests that the in-memory totals follow replacements and the size cap is enforced."""
+    cache = LLMResponseCache(tmp_path / "cache.sqlite", max_size_mb=100 / (1024 * 1024))
+    cache.set("a", "ask", "x" * 40)
+    cache.set("a", "ask", "y" * 40)  # replaced, not counted twice
+    time.sleep(0.01)
+    cache.set("b", "ask", "z" * 40)
+    assert cache.get_stats()["evictions"] == 0
+
+    time.sleep(0.01)
+    cache.set("c", "ask", "w" * 40)
+    assert cache.get("a") is None
+    assert cache.get("b") and cache.get("c")
+
+
+def test_persists_across_instances(tmp_path):
+    """Tests that responses survive reopening the cache file."""
+    LLMResponseCache(tmp_path / "cache.sqlite").set("k", "ask", "value")
+    assert LLMResponseCache(tmp_path / "cache.sqlite").get("k") == "value"
+
+
+@pytest.mark.asyncio
+async def test_llm_replays_cached_tool_response(tmp_path):
+    """Tests that repeated ask_tool requests are served from the cache."""
+    client = FakeChatClient(
+        lambda params: ScriptedReply(
+            content="ok", tool_calls=[{"name": "terminate", "arguments": "{}"}]
+        ),
+        latency=None,
+    )
+    client.latency.base = 0.0
+    llm = create_fake_llm("test-llm-cache", client)
+    llm.response_cache = LLMResponseCache(tmp_path / "cache.sqlite")
+
+    first = await llm.ask_tool(MESSAGES, tools=[])
+    second = await llm.ask_tool(MESSAGES, tools=[])
+    third = await llm.ask_tool(MESSAGES, tools=[])
+
+    assert client.requests == 1
+    assert second.tool_calls[0].function.name == first.tool_calls[0].function.name
+    assert llm.response_cache.get_stats()["hits"] == 2
+    # Replays get their own tool call ids, which must be unique in a history
+    ids = {message.tool_calls[0].id for message in (first, second, third)}
+    assert len(ids) == 3
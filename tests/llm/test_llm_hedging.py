@@ -0,0 +1,213 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError, InternalServerError, RateLimitError
+
+from app.llm import LLM
+from app.llm_hedging import FALLBACK, HEDGE, PRIMARY, LatencyWindow, hedged_request
+from app.llm_scheduler import TokenBucket
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+TOOLS = [
+    {"type": "function", "function": {"name": "idle", "parameters": {"type": "object"}}}
+]
+MESSAGES = [{"role": "user", "content": "Do it."}]
+
+
+def make_error(error_cls, status_code: int, headers=None):
+    request = httpx.Request("POST", "http://llm.local/v1/chat/completions")
+    response = httpx.Response(status_code, request=request, headers=headers)
+    return error_cls("error", response=response, body=None)
+
+
+def make_llm(
+    config_name: str, content: str, latency: float, model: str = "gpt-4o"
+) -> LLM:
+    client = FakeChatClient(
+        TrajectoryReplayer.from_dict({"replies": [{"content": content}]})
+    )
+    client.latency.base = latency
+    return create_fake_llm(config_name, client, model=model)
+
+
+def hedged_pair(primary_latency: float, fallback_latency: float):
+    fallback = make_llm(
+        "test-hedge-fallback", "from fallback", fallback_latency, model="gpt-4o-mini"
+    )
+    primary = make_llm("test-hedge-primary", "from primary", primary_latency)
+    primary.fallback_config = fallback.config_name
+    primary.hedge_percentile = 95
+    primary.hedge_min_delay = 0.02
+    for _ in range(primary.hedge_min_samples):
+        primary.tool_latency.add(0.01)
+    return primary, fallback
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged_to_the_fallback():
+    """Tests that a request slower than the percentile loses to a hedged duplicate."""
+    primary, fallback = hedged_pair(primary_latency=1.0, fallback_latency=0.01)
+
+    message = await primary.ask_tool(MESSAGES, tools=TOOLS)
+
+    assert message.content == "from fallback"
+    assert primary.hedge_stats["hedged"] == 1
+    assert primary.hedge_stats["hedge_wins"] == 1
+    assert primary.hedge_stats["wasted_tokens"] > 0
+    # Tokens are counted on the config that answered
+    assert fallback.total_completion_tokens > 0
+    assert primary.total_completion_tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_fast_request_is_not_hedged():
+    """Tests that no duplicate is sent when the primary answers in time."""
+    primary, fallback = hedged_pair(primary_latency=0.0, fallback_latency=0.0)
+
+    message = await primary.ask_tool(MESSAGES, tools=TOOLS)
+
+    assert message.content == "from primary"
+    assert fallback.client.requests == 0
+    assert primary.hedge_stats["hedged"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedges_are_capped_by_token_budget():
+    """Tests that hedging stops once the per-minute hedge budget is spent."""
+    primary, fallback = hedged_pair(primary_latency=0.1, fallback_latency=0.0)
+    primary.hedge_budget = TokenBucket(1)
+    primary.hedge_budget.consume(1, time.monotonic())
+
+    message = await primary.ask_tool(MESSAGES, tools=TOOLS)
+
+    assert message.content == "from primary"
+    assert fallback.client.requests == 0
+
+
+@pytest.mark.asyncio
+async def test_server_error_fails_over_to_fallback():
+    """Tests that a 5xx error of the primary is answered by the fallback config."""
+    primary, fallback = hedged_pair(primary_latency=0.0, fallback_latency=0.0)
+    primary.hedge_percentile = None
+    primary.fallback_after_retries = 0
+
+    async def failing_create(**params):
+        raise make_error(InternalServerError, 503)
+
+    primary.client.chat.completions.create = failing_create
+
+    message = await primary.ask_tool(MESSAGES, tools=TOOLS)
+
+    assert message.content == "from fallback"
+    assert primary.hedge_stats["failovers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_primary_keeps_its_own_retries():
+    """Tests that a throttled primary is retried as usual rather than capped to fallback_after_retries."""
+    primary, fallback = hedged_pair(primary_latency=0.0, fallback_latency=0.0)
+    primary.hedge_percentile = None
+    primary.fallback_after_retries = 0
+    create = primary.client.chat.completions.create
+    throttled = []
+
+    async def throttled_create(**params):
+        if len(throttled) < 2:
+            throttled.append(params)
+            raise make_error(RateLimitError, 429, headers={"retry-after-ms": "1"})
+        return await create(**params)
+
+    primary.client.chat.completions.create = throttled_create
+
+    message = await primary.ask_tool(MESSAGES, tools=TOOLS)
+
+    assert message.content == "from primary"
+    assert len(throttled) == 2
+    assert fallback.client.requests == 0
+
+
+@pytest.mark.asyncio
+async def test_client_errors_do_not_fail_over():
+    """Tests that errors of the request itself are raised instead of retried elsewhere."""
+
+    async def primary():
+        raise make_error(BadRequestError, 400)
+
+    async def backup():
+        raise AssertionError("backup must not run")
+
+    with pytest.raises(BadRequestError):
+        await hedged_request(
+            primary,
+            backup,
+            None,
+            lambda: True,
+            can_fail_over=lambda e: isinstance(e, InternalServerError),
+        )
+
+
+@pytest.mark.asyncio
+async def test_loser_is_cancelled_and_reported():
+    """Tests that the slower request is cancelled and passed to on_loser."""
+    cancelled = asyncio.Event()
+    losers = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def backup():
+        return "fast"
+
+    result, winner = await hedged_request(
+        primary,
+        backup,
+        0.01,
+        lambda: True,
+        on_loser=lambda label, task: losers.append(label),
+    )
+    await asyncio.sleep(0)
+
+    assert (result, winner) == ("fast", HEDGE)
+    assert losers == [PRIMARY]
+    assert cancelled.is_set()
+
+
+def test_latency_percentile():
+    window = LatencyWindow(size=100)
+    for i in range(1, 101):
+        window.add(i / 100)
+    assert window.percentile(95) == 0.95
+    assert window.percentile(50) == 0.5
+    assert LatencyWindow().percentile(95) is None
+
+
+@pytest.mark.asyncio
+async def test_vetoed_hedge_still_fails_over():
+    """Tests that a hedge refused by the budget does not prevent a later fail-over."""
+
+    async def primary():
+        await asyncio.sleep(0.02)
+        raise make_error(InternalServerError, 502)
+
+    async def backup():
+        return "fallback"
+
+    result, winner = await hedged_request(
+        primary,
+        backup,
+        0.01,
+        lambda: False,
+        can_fail_over=lambda e: isinstance(e, InternalServerError),
+    )
+    assert (result, winner) == ("fallback", FALLBACK)
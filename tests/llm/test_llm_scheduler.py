@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import AuthenticationError, RateLimitError
+
+from app.llm_scheduler import (
+    LLMRequestScheduler,
+    RequestPriority,
+    TokenBucket,
+    request_priority,
+    retry_after_seconds,
+)
+
+
+def make_error(error_cls, status_code: int, headers: dict = None):
+    request = httpx.Request("POST", "http://llm.local/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return error_cls("error", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_error_is_raised_immediately():
+    """Tests that authentication errors are not retried."""
+    scheduler = LLMRequestScheduler("test", backoff_base=0)
+    calls = 0
+
+    async def request():
+        nonlocal calls
+        calls += 1
+        raise make_error(AuthenticationError, 401)
+
+    with pytest.raises(AuthenticationError):
+        await scheduler.submit(request)
+    assert calls == 1
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_honors_retry_after():
+    """Tests that a 429 pauses the config for the Retry-After interval."""
+    scheduler = LLMRequestScheduler("test")
+    attempts = []
+
+    async def request():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise make_error(RateLimitError, 429, {"retry-after-ms": "100"})
+        return "ok"
+
+    assert await scheduler.submit(request) == "ok"
+    assert attempts[1] - attempts[0] >= 0.09
+    assert scheduler.get_stats()["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_first():
+    """Tests that queued interactive requests are admitted before background ones."""
+    scheduler = LLMRequestScheduler("test", max_concurrent_requests=1)
+    release = asyncio.Event()
+    order = []
+
+    async def blocking():
+        await release.wait()
+
+    def record(name):
+        async def request():
+            order.append(name)
+
+        return request
+
+    holder = asyncio.create_task(scheduler.submit(blocking))
+    await asyncio.sleep(0)
+    with request_priority(RequestPriority.BACKGROUND):
+        background = asyncio.create_task(scheduler.submit(record("background")))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(
+        scheduler.submit(record("interactive"), priority=RequestPriority.INTERACTIVE)
+    )
+    await asyncio.sleep(0)
+    assert scheduler.queue_depth == 2
+
+    release.set()
+    await asyncio.gather(holder, background, interactive)
+    assert order == ["interactive", "background"]
+
+
+async def chunks(*items, fail_at=None):
+    for index, item in enumerate(items):
+        if index == fail_at:
+            raise make_error(RateLimitError, 429, {"retry-after-ms": "1"})
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_stream_holds_its_slot_until_consumed():
+    """Tests that max_concurrent_requests also limits streamed responses."""
+    scheduler = LLMRequestScheduler("test", max_concurrent_requests=1)
+
+    async def request():
+        return chunks("a", "b")
+
+    stream = await scheduler.submit(request, stream=True)
+    assert scheduler.in_flight == 1
+    second = asyncio.create_task(scheduler.submit(request, stream=True))
+    await asyncio.sleep(0.01)
+    assert not second.done()
+
+    assert [chunk async for chunk in stream] == ["a", "b"]
+    other = await asyncio.wait_for(second, 1.0)
+    await other.aclose()  # closed without being read
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_before_output_are_retried():
+    """Tests that a stream failing before its first chunk is retried, a later failure raised."""
+    scheduler = LLMRequestScheduler("test", backoff_base=0)
+    attempts = []
+
+    async def request():
+        attempts.append(1)
+        return chunks("a", "b", fail_at=0 if len(attempts) == 1 else 1)
+
+    stream = await scheduler.submit(request, stream=True)
+    assert len(attempts) == 2
+    assert await stream.__anext__() == "a"
+    with pytest.raises(RateLimitError):
+        await stream.__anext__()
+    assert scheduler.in_flight == 0
+
+
+def test_token_bucket_wait_time():
+    """Tests that an empty bucket reports the refill time of the request."""
+    bucket = TokenBucket(per_minute=600)
+    now = time.monotonic()
+    bucket.consume(600, now)
+    assert bucket.time_until(10, now) == pytest.approx(1.0)
+
+
+def test_retry_after_parsing():
+    """Tests Retry-After header parsing in seconds."""
+    assert (
+        retry_after_seconds(make_error(RateLimitError, 429, {"retry-after": "3"})) == 3
+    )
+    assert retry_after_seconds(make_error(RateLimitError, 429)) is None
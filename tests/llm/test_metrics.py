@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app import metrics
+from app.tool import ToolCollection
+from app.tool.base import BaseTool
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+class FailingTool(BaseTool):
+    name: str = "metrics_failing"
+    description: str = "Always fails"
+    parameters: dict = {"type": "object", "properties": {}}
+
+    async def execute(self) -> str:
+        raise ValueError("boom")
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_llm_requests_and_tokens_are_recorded():
+    """Tests that an LLM request updates the latency histogram and token counters."""
+    client = FakeChatClient(
+        TrajectoryReplayer.from_dict({"replies": [{"content": "Hi."}]})
+    )
+    client.latency.base = 0.0
+    llm = create_fake_llm("test-metrics", client)
+    labels = {"config_name": "test-metrics", "model": llm.model}
+    before = sample(
+        "openmanus_llm_request_duration_seconds_count", {**labels, "stream": "false"}
+    )
+
+    await llm.ask([{"role": "user", "content": "hello"}], stream=False)
+
+    assert (
+        sample(
+            "openmanus_llm_request_duration_seconds_count",
+            {**labels, "stream": "false"},
+        )
+        == before + 1
+    )
+    assert sample("openmanus_llm_tokens_total", {**labels, "kind": "prompt"}) > 0
+    body, content_type = metrics.render_latest()
+    assert content_type.startswith("text/plain")
+    assert b'openmanus_llm_queued_requests{config_name="test-metrics"} 0.0' in body
+    assert b"openmanus_pool_in_use" in body
+
+
+@pytest.mark.asyncio
+async def test_tool_durations_are_labelled_by_outcome():
+    """Tests that failed tool executions are counted separately from successful ones."""
+    labels = {"tool": "metrics_failing", "outcome": "error"}
+    before = sample("openmanus_tool_duration_seconds_count", labels)
+
+    result = await ToolCollection(FailingTool()).execute(
+        name="metrics_failing", tool_input={}
+    )
+
+    assert result.error
+    assert sample("openmanus_tool_duration_seconds_count", labels) == before + 1
+
+
+@pytest.mark.asyncio
+async def test_event_loop_lag_is_sampled():
+    """Tests that the lag monitor keeps observing while it runs."""
+    before = sample("openmanus_event_loop_lag_seconds_count", {})
+    task = asyncio.create_task(metrics.monitor_event_loop_lag(interval=0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert sample("openmanus_event_loop_lag_seconds_count", {}) > before
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.bedrock import CACHE_POINT, ChatCompletions
+from app.token_ledger import token_ledger, usage_scope
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+SYSTEM = [{"role": "system", "content": "You are a careful agent. " * 40}]
+MESSAGES = [{"role": "user", "content": "List the files."}]
+
+
+def tool(name: str) -> dict:
+    return {
+        "type": "function",
+        "function": {"name": name, "parameters": {"type": "object"}},
+    }
+
+
+class PrefixCachingClient(FakeChatClient):
+    """Fake provider reporting the system prompt as cached once it has seen it."""
+
+    def __init__(self):
+        super().__init__(
+            TrajectoryReplayer.from_dict({"replies": [{"content": "Ok."}]})
+        )
+        self.latency.base = 0.0
+        self.params = []
+        self.seen_prefixes = set()
+
+    async def create(self, **params):
+        self.params.append(params)
+        return await super().create(**params)
+
+    def cached_tokens(self, params):
+        prefix = (
+            params["messages"][0]["content"],
+            tuple(t["function"]["name"] for t in params["tools"]),
+        )
+        seen = prefix in self.seen_prefixes
+        self.seen_prefixes.add(prefix)
+        return self.count_message_tokens(params["messages"][:1]) if seen else 0
+
+
+@pytest.mark.asyncio
+async def test_tool_order_and_cache_key_are_stable():
+    """Tests that tools registered in any order produce the same request prefix and cache key."""
+    client = PrefixCachingClient()
+    llm = create_fake_llm("test-prompt-cache-order", client)
+    llm.prompt_cache_hints = True
+
+    await llm.ask_tool(MESSAGES, system_msgs=SYSTEM, tools=[tool("b"), tool("a")])
+    await llm.ask_tool(MESSAGES, system_msgs=SYSTEM, tools=[tool("a"), tool("b")])
+
+    first, second = client.params
+    assert [t["function"]["name"] for t in first["tools"]] == ["a", "b"]
+    assert first["tools"] == second["tools"]
+    assert (
+        first["extra_body"]["prompt_cache_key"]
+        == second["extra_body"]["prompt_cache_key"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_cached_tokens_are_recorded_per_session():
+    """Tests that cached prompt tokens reach the LLM counters and the session hit rate."""
+    client = PrefixCachingClient()
+    llm = create_fake_llm("test-prompt-cache-usage", client)
+
+    with usage_scope(session_id="prefix-cache"):
+        for _ in range(2):
+            await llm.ask_tool(MESSAGES, system_msgs=SYSTEM, tools=[tool("a")])
+
+    usage = token_ledger.drop("prefix-cache").to_dict()
+    assert llm.total_cached_tokens > 0
+    assert usage["cached_tokens"] == llm.total_cached_tokens
+    assert 0 < usage["prefix_cache_hit_rate"] < 1
+    assert "extra_body" not in client.params[0]  # Hints are opt-in
+
+
+@pytest.mark.asyncio
+async def test_cached_tokens_are_recorded_from_streamed_responses():
+    """Tests that streamed requests ask for usage and record its cached tokens."""
+    client = PrefixCachingClient()
+    llm = create_fake_llm("test-prompt-cache-stream", client)
+
+    with usage_scope(session_id="prefix-cache-stream"):
+        for _ in range(2):
+            await llm.ask_tool_stream(MESSAGES, system_msgs=SYSTEM, tools=[tool("a")])
+
+    usage = token_ledger.drop("prefix-cache-stream").to_dict()
+    assert client.params[0]["stream_options"] == {"include_usage": True}
+    assert llm.total_cached_tokens == client.count_message_tokens(SYSTEM)
+    assert usage["cached_tokens"] == llm.total_cached_tokens
+
+
+class RecordingBedrock:
+    def __init__(self):
+        self.requests = []
+
+    def converse(self, **request):
+        self.requests.append(request)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": "Ok."}]}},
+            "stopReason": "end_turn",
+            "usage": {
+                "inputTokens": 10,
+                "outputTokens": 5,
+                "cacheReadInputTokens": 300,
+                "cacheWriteInputTokens": 0,
+                "totalTokens": 315,
+            },
+        }
+
+
+@pytest.mark.asyncio
+async def test_bedrock_cache_points_and_cached_usage():
+    """Tests that Bedrock requests get cache points and report cache reads as cached tokens."""
+    bedrock = RecordingBedrock()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        response = await ChatCompletions(bedrock, executor).create(
+            model="claude",
+            messages=SYSTEM + MESSAGES,
+            stream=False,
+            tools=[tool("a")],
+            prompt_cache=True,
+        )
+
+    request = bedrock.requests[0]
+    assert request["system"][-1] == CACHE_POINT
+    assert request["toolConfig"]["tools"][-1] == CACHE_POINT
+    assert request["messages"][-1]["content"][-1] == CACHE_POINT
+    assert response.usage.prompt_tokens == 310
+    assert response.usage.prompt_tokens_details.cached_tokens == 300
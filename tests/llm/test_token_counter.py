@@ -0,0 +1,71 @@
+import pytest
+
+from app.llm import TokenCounter
+
+
+class CountingTokenizer:
+    """Whitespace tokenizer that records how many times it was invoked."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text: str):
+        self.calls += 1
+        return text.split()
+
+
+@pytest.fixture(scope="function")
+def counter() -> TokenCounter:
+    return TokenCounter(CountingTokenizer())
+
+
+def test_cached_count_matches_uncached(counter: TokenCounter):
+    """Tests that caching does not change the reported token count."""
+    messages = [
+        {"role": "system", "content": "you are helpful"},
+        {"role": "user", "content": "hello there"},
+    ]
+    expected = counter.FORMAT_TOKENS + sum(
+        counter.count_single_message_tokens(m) for m in messages
+    )
+
+    assert counter.count_message_tokens(messages) == expected
+    assert counter.count_message_tokens(messages) == expected
+
+
+def test_growing_history_only_tokenizes_new_messages(counter: TokenCounter):
+    """Tests that repeated counts over a growing history hit the cache."""
+    history = [{"role": "user", "content": "start the task"}]
+    counter.count_message_tokens(history)
+
+    for i in range(5):
+        history.append({"role": "assistant", "content": f"step {i}"})
+        counter.count_message_tokens(history)
+
+    info = counter.cache_info()
+    assert info["misses"] == 6
+    assert info["hits"] == 1 + 2 + 3 + 4 + 5
+    assert info["size"] == 6
+
+
+def test_changed_message_is_recounted(counter: TokenCounter):
+    """Tests that a modified message is treated as a new cache entry."""
+    message = {"role": "assistant", "content": "thinking"}
+    counter.count_message_tokens([message])
+    message["tool_calls"] = [
+        {"id": "1", "type": "function", "function": {"name": "idle", "arguments": "{}"}}
+    ]
+    counter.count_message_tokens([message])
+
+    assert counter.cache_info()["misses"] == 2
+
+
+def test_cache_is_bounded():
+    """Tests LRU eviction once the cache exceeds its size."""
+    counter = TokenCounter(CountingTokenizer(), cache_size=2)
+    for i in range(3):
+        counter.count_message_tokens([{"role": "user", "content": f"m{i}"}])
+
+    assert counter.cache_info()["size"] == 2
+    counter.count_message_tokens([{"role": "user", "content": "m0"}])
+    assert counter.cache_info()["hits"] == 0
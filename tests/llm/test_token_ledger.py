@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.exceptions import TokenLimitExceeded
+from app.token_ledger import current_session, token_ledger, usage_scope
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+def make_llm(config_name: str, replies: int = 4):
+    client = FakeChatClient(
+        TrajectoryReplayer.from_dict({"replies": [{"content": "Ok."}] * replies})
+    )
+    client.latency.base = 0.0
+    return create_fake_llm(config_name, client)
+
+
+MESSAGES = [{"role": "user", "content": "hello " * 50}]
+
+
+@pytest.fixture(autouse=True)
+def clean_ledger():
+    yield
+    for session_id in ("alice", "bob", "carol"):
+        token_ledger.drop(session_id)
+
+
+@pytest.mark.asyncio
+async def test_budget_is_enforced_per_session():
+    """Tests that one session exhausting the budget does not block another one."""
+    llm = make_llm("test-ledger-budget")
+    budget = llm.count_message_tokens(MESSAGES) + 10
+    llm.max_input_tokens = budget
+
+    with usage_scope(session_id="alice"):
+        await llm.ask(MESSAGES, stream=False)
+        with pytest.raises(TokenLimitExceeded):
+            await llm.ask(MESSAGES, stream=False)
+
+    with usage_scope(session_id="bob"):
+        assert await llm.ask(MESSAGES, stream=False) == "Ok."
+
+    assert token_ledger.get("alice").total.requests == 1
+    assert token_ledger.get("bob").total.requests == 1
+    # The process counters keep the overall aggregate
+    assert llm.total_input_tokens > budget
+
+
+@pytest.mark.asyncio
+async def test_usage_is_attributed_to_session_and_agent_across_tasks():
+    """Tests that agent scopes inherit the session and tasks inherit both."""
+    llm = make_llm("test-ledger-attribution")
+
+    async def agent_request(name: str):
+        with usage_scope(agent=name):
+            await llm.ask(MESSAGES, stream=False)
+
+    with usage_scope(session_id="carol"):
+        await asyncio.gather(agent_request("planner"), agent_request("coder"))
+        assert current_session() is token_ledger.get("carol")
+    assert current_session() is None
+
+    usage = token_ledger.get("carol").to_dict()
+    assert usage["requests"] == 2
+    assert set(usage["by_agent"]) == {"planner", "coder"}
+    assert (
+        usage["by_config"]["test-ledger-attribution"]["input_tokens"]
+        == usage["input_tokens"]
+    )
+    assert token_ledger.totals().requests >= 2
+
+
+@pytest.mark.asyncio
+async def test_requests_outside_sessions_use_the_process_budget():
+    """Tests that code without a session keeps the process-wide limit."""
+    llm = make_llm("test-ledger-process")
+    llm.max_input_tokens = llm.count_message_tokens(MESSAGES) + 10
+    sessions_before = len(token_ledger)
+
+    await llm.ask(MESSAGES, stream=False)
+    with pytest.raises(TokenLimitExceeded):
+        await llm.ask(MESSAGES, stream=False)
+    # No session was created nor charged for these requests
+    assert len(token_ledger) == sessions_before
+    assert all(
+        token_ledger.get(session_id).input_tokens("test-ledger-process") == 0
+        for session_id in list(token_ledger._sessions)
+    )
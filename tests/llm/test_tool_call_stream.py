@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from app.llm import ToolCallStreamAssembler
+from examples.benchmarks.fake_llm import FakeChatClient, LatencyModel, ScriptedReply
+
+
+def make_client(reply: ScriptedReply) -> FakeChatClient:
+    return FakeChatClient(lambda params: reply, latency=LatencyModel(base=0))
+
+
+async def collect_deltas(reply: ScriptedReply):
+    client = make_client(reply)
+    stream = await client.chat.completions.create(
+        model="fake", messages=[], stream=True
+    )
+    return [chunk.choices[0].delta async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_tool_call_released_when_json_closes():
+    """Tests that a call is released before the stream moves on to the next one."""
+    first = json.dumps(
+        {"file": "/tmp/a.txt", "content": 'text with "quotes" and } braces'}
+    )
+    reply = ScriptedReply(
+        tool_calls=[
+            {"name": "file_write", "arguments": first},
+            {"name": "idle", "arguments": json.dumps({"status": "success"})},
+        ]
+    )
+    assembler = ToolCallStreamAssembler()
+    released_at = []
+    for position, delta in enumerate(await collect_deltas(reply)):
+        for call in assembler.feed(delta.tool_calls):
+            released_at.append((position, call.function.name))
+    released_at += [(None, call.function.name) for call in assembler.finish()]
+
+    assert [name for _, name in released_at] == ["file_write", "idle"]
+    # file_write is complete before the idle call's first chunk arrives
+    assert released_at[0][0] is not None and released_at[0][0] < released_at[1][0]
+    assert (
+        json.loads(assembler.tool_calls[0].function.arguments)["file"] == "/tmp/a.txt"
+    )
+
+
+def test_finish_releases_incomplete_calls():
+    """Tests that calls whose arguments never close are released at stream end."""
+
+    class Delta:
+        def __init__(self, index, arguments, id=None, name=None):
+            self.index = index
+            self.id = id
+            self.function = type("F", (), {"name": name, "arguments": arguments})()
+
+    assembler = ToolCallStreamAssembler()
+    assert assembler.feed([Delta(0, "", id="call_0", name="terminate")]) == []
+    assert assembler.feed([Delta(0, '{"status": "succ')]) == []
+
+    remaining = assembler.finish()
+    assert [call.id for call in remaining] == ["call_0"]
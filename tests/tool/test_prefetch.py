@@ -0,0 +1,187 @@
+import asyncio
+
+import httpx
+import pytest
+
+import app.tool.web_search as web_search
+from app.config import PrefetchSettings
+from app.tool.prefetch import PagePrefetcher, route_prefetched_document
+
+
+class FakeSite:
+    """httpx transport serving small HTML pages slowly, recording concurrency."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.peak = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(str(request.url))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/html"},
+            text=f"<html><body><p>Page {request.url.path}</p></body></html>",
+        )
+
+
+def prefetcher(site: FakeSite, **settings) -> PagePrefetcher:
+    prefetcher = PagePrefetcher(PrefetchSettings(enabled=True, **settings))
+    prefetcher._client = httpx.AsyncClient(transport=httpx.MockTransport(site.handler))
+    return prefetcher
+
+
+URLS = [f"https://example.com/{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_top_results_are_prefetched_with_bounded_concurrency():
+    """Tests that only the top-k pages are fetched, at most max_concurrency at a time."""
+    site = FakeSite()
+    pages = prefetcher(site, top_k=3, max_concurrency=2)
+
+    assert pages.schedule(URLS) == 3
+    await asyncio.sleep(0.2)
+
+    assert sorted(site.requests) == URLS[:3]
+    assert site.peak == 2
+    page = await pages.get(URLS[0] + "#section")
+    assert "Page /0" in page.html
+    assert await pages.get(URLS[3]) is None
+
+
+@pytest.mark.asyncio
+async def test_get_waits_for_a_fetch_in_progress():
+    """Tests that a consumer arriving mid-fetch reuses it instead of fetching again."""
+    site = FakeSite(delay=0.1)
+    pages = prefetcher(site)
+
+    pages.schedule(URLS[:1])
+    await asyncio.sleep(0.01)
+    page = await pages.get(URLS[0])
+
+    assert page is not None
+    assert site.requests == URLS[:1]
+
+
+@pytest.mark.asyncio
+async def test_new_search_cancels_prefetches_not_started():
+    """Tests that queued prefetches of an earlier search are dropped by a new one."""
+    site = FakeSite(delay=0.05)
+    pages = prefetcher(site, top_k=3, max_concurrency=1)
+
+    pages.schedule(URLS[:3])
+    await asyncio.sleep(0.01)
+    pages.schedule(URLS[3:])
+    await asyncio.sleep(0.2)
+
+    assert URLS[1] not in site.requests and URLS[2] not in site.requests
+    assert {URLS[0], URLS[3], URLS[4]} <= set(site.requests)
+
+
+@pytest.mark.asyncio
+async def test_a_search_only_cancels_its_own_owners_prefetches():
+    """Tests that one session's new search leaves other sessions' queued prefetches alone."""
+    site = FakeSite(delay=0.05)
+    pages = prefetcher(site, top_k=2, max_concurrency=1)
+
+    pages.schedule(URLS[:2], owner="alice")
+    pages.schedule([URLS[1], URLS[2]], owner="bob")
+    await asyncio.sleep(0.01)
+    pages.schedule(URLS[3:4], owner="alice")
+    await asyncio.sleep(0.3)
+
+    # URLS[1] is still wanted by bob, URLS[2] was only ever bob's
+    assert {URLS[0], URLS[1], URLS[2], URLS[3]} == set(site.requests)
+
+
+class FakeRoute:
+    def __init__(self, resource_type: str):
+        self.request = type("Request", (), {"resource_type": resource_type})()
+        self.outcome = None
+
+    async def fulfill(self, **response):
+        self.outcome = response
+
+    async def continue_(self):
+        self.outcome = "network"
+
+
+class FakePage:
+    def __init__(self):
+        self.routes = []
+
+    async def route(self, matches, handler):
+        self.routes.append((matches, handler))
+
+    async def unroute(self, matches, handler):
+        self.routes.remove((matches, handler))
+
+
+@pytest.mark.asyncio
+async def test_only_the_main_document_is_served_from_the_prefetch():
+    """Tests that the prefetched HTML answers the page's document request once, at its own URL."""
+    site = FakeSite(delay=0.0)
+    pages = prefetcher(site)
+    pages.schedule(URLS[:1])
+    await asyncio.sleep(0.02)
+    prefetched = await pages.get(URLS[0])
+    page = FakePage()
+
+    unroute = await route_prefetched_document(page, prefetched)
+    ((matches, handler),) = page.routes
+    assert matches(URLS[0] + "#top") and not matches(URLS[1])
+    routes = [FakeRoute("document"), FakeRoute("script"), FakeRoute("document")]
+    for route in routes:
+        await handler(route)
+    await unroute()
+
+    assert routes[0].outcome["body"] == prefetched.html
+    assert routes[1].outcome == "network" and routes[2].outcome == "network"
+    assert page.routes == []
+
+
+@pytest.mark.asyncio
+async def test_pages_expire():
+    """Tests that prefetched pages are only served within their TTL."""
+    site = FakeSite(delay=0.0)
+    pages = prefetcher(site, ttl_seconds=0.05)
+
+    pages.schedule(URLS[:1])
+    await asyncio.sleep(0.02)
+    assert await pages.get(URLS[0]) is not None
+    await asyncio.sleep(0.06)
+    assert await pages.get(URLS[0]) is None
+
+
+@pytest.mark.asyncio
+async def test_content_fetcher_uses_prefetched_page(monkeypatch):
+    """Tests that WebContentFetcher serves prefetched pages without another request."""
+    site = FakeSite(delay=0.0)
+    pages = prefetcher(site)
+    monkeypatch.setattr(web_search, "page_prefetcher", pages)
+
+    pages.schedule(URLS[:1])
+    await asyncio.sleep(0.02)
+    text = await web_search.WebContentFetcher.fetch_content(URLS[0])
+
+    assert text == "Page /0"
+    assert site.requests == URLS[:1]
+
+
+@pytest.mark.asyncio
+async def test_disabled_prefetcher_does_nothing():
+    """Tests that the prefetcher is inert unless enabled."""
+    site = FakeSite()
+    pages = prefetcher(site)
+    pages.settings.enabled = False
+
+    assert pages.schedule(URLS) == 0
+    assert await pages.get(URLS[0]) is None
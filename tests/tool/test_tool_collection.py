@@ -0,0 +1,51 @@
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+
+
+class CountingTool(BaseTool):
+    name: str = "counting"
+    description: str = "Counts how often its schema is built."
+    to_param_calls: int = 0
+
+    def to_param(self):
+        self.to_param_calls += 1
+        return super().to_param()
+
+    async def execute(self, **kwargs):
+        return "ok"
+
+
+def test_params_cached_until_tool_set_changes():
+    """Tests that schemas are rebuilt only after the tool set changes."""
+    tool = CountingTool()
+    collection = ToolCollection(tool)
+
+    first = collection.to_params()
+    collection.to_params()
+    assert tool.to_param_calls == 1
+
+    collection.add_tool(Terminate())
+    params = collection.to_params()
+    assert tool.to_param_calls == 2
+    assert [p["function"]["name"] for p in params] == ["counting", "terminate"]
+    assert len(first) == 1
+
+
+def test_schema_tokens_cached_per_version():
+    """Tests that the schema token count is computed once per tool set version."""
+    calls = []
+
+    def count_tokens(text: str) -> int:
+        calls.append(text)
+        return len(text)
+
+    collection = ToolCollection(CountingTool())
+    total = collection.count_schema_tokens(count_tokens)
+    assert collection.count_schema_tokens(count_tokens) == total
+    assert len(calls) == 1
+
+    collection.tools = tuple(
+        collection.tools
+    )  # direct reassignment, as MCPClients does
+    collection.count_schema_tokens(count_tokens)
+    assert len(calls) == 2
@@ -0,0 +1,25 @@
+from app.utils import tool_loader
+from app.utils.tool_loader import load_tools_from_directory
+
+
+def test_tool_modules_are_executed_once_per_directory(tmp_path, monkeypatch):
+    """Tests that new agents get fresh tool instances without re-importing the modules."""
+    (tmp_path / "echo.py").write_text(
+        "from app.tool.base import BaseTool\n"
+        "LOADS = []\n"
+        "LOADS.append(1)\n"
+        "class Echo(BaseTool):\n"
+        "    name: str = 'echo'\n"
+        "    description: str = 'Echoes its input.'\n"
+        "    async def execute(self, **kwargs):\n"
+        "        return LOADS\n"
+    )
+    monkeypatch.setattr(tool_loader, "_tool_classes", {})
+
+    first = load_tools_from_directory(tmp_path)
+    second = load_tools_from_directory(tmp_path)
+
+    assert [tool.name for tool in first] == ["echo"]
+    assert first[0] is not second[0]
+    assert type(first[0]) is type(second[0])
+    assert len(tool_loader._tool_classes) == 1
@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+
+from app.tool.base import BaseTool
+from app.tool.file_read import FileReadTool
+from app.tool.file_write import FileWriteTool
+from app.tool.result_cache import ToolResultCache
+from app.tool.tool_collection import ToolCollection
+
+
+class CountingTool(BaseTool):
+    """Returns how many times it ran."""
+
+    name: str = "counting"
+    description: str = "Counts its executions"
+    delay: float = 0.0
+    calls: int = 0
+
+    async def execute(self, **kwargs) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"{self.name} #{self.calls}"
+
+
+def browser_tools():
+    view = CountingTool(name="view", read_only=True, cacheable=True, resource="browser")
+    navigate = CountingTool(name="navigate", resource="browser")
+    search = CountingTool(name="search", read_only=True, cacheable=True, resource="web")
+    return ToolCollection(view, navigate, search), view, search
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_skip_execution():
+    """Tests that a repeated call with canonically equal arguments is served from the cache."""
+    tools, _, search = browser_tools()
+    cache = ToolResultCache()
+
+    first = await tools.execute(
+        name="search", tool_input={"q": "x", "n": 3}, cache=cache
+    )
+    second = await tools.execute(
+        name="search", tool_input={"n": 3, "q": "x"}, cache=cache
+    )
+    second.tool_call_id = "call_2"
+    third = await tools.execute(
+        name="search", tool_input={"q": "x", "n": 3}, cache=cache
+    )
+
+    assert search.calls == 1
+    assert first.output == second.output == third.output == "search #1"
+    assert third.tool_call_id is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_navigation_invalidates_browser_reads_only():
+    """Tests that a browser action drops cached page views but keeps unrelated results."""
+    tools, view, search = browser_tools()
+    cache = ToolResultCache()
+
+    await tools.execute(name="view", cache=cache)
+    await tools.execute(name="search", tool_input={"q": "x"}, cache=cache)
+    await tools.execute(
+        name="navigate", tool_input={"url": "https://example.com"}, cache=cache
+    )
+    result = await tools.execute(name="view", cache=cache)
+    await tools.execute(name="search", tool_input={"q": "x"}, cache=cache)
+
+    assert result.output == "view #2"
+    assert (view.calls, search.calls) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_file_write_invalidates_matching_reads(tmp_path):
+    """Tests that writing a file drops the cached reads of that file only."""
+    tools = ToolCollection(FileReadTool(), FileWriteTool())
+    cache = ToolResultCache()
+    a, b = str(tmp_path / "a.txt"), str(tmp_path / "b.txt")
+    for path in (a, b):
+        await tools.execute(
+            name="file_write", tool_input={"file": path, "content": "old"}, cache=cache
+        )
+        await tools.execute(name="file_read", tool_input={"file": path}, cache=cache)
+
+    await tools.execute(
+        name="file_write", tool_input={"file": a, "content": "new"}, cache=cache
+    )
+    read_a = await tools.execute(name="file_read", tool_input={"file": a}, cache=cache)
+    await tools.execute(name="file_read", tool_input={"file": b}, cache=cache)
+
+    assert "new" in str(read_a)
+    assert cache.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_reads_overlapping_a_write_are_not_stored():
+    """Tests that a read running while the resource is written is not memoized."""
+    view = CountingTool(
+        name="view", read_only=True, cacheable=True, resource="browser", delay=0.05
+    )
+    navigate = CountingTool(name="navigate", resource="browser")
+    tools = ToolCollection(view, navigate)
+    cache = ToolResultCache()
+
+    read = asyncio.create_task(tools.execute(name="view", cache=cache))
+    await asyncio.sleep(0.01)
+    await tools.execute(name="navigate", cache=cache)
+    await read
+
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_tools_without_cache_or_opt_in_always_run():
+    """Tests that memoization needs both a cache and a cacheable tool."""
+    tools, view, _ = browser_tools()
+    cache = ToolResultCache()
+
+    await tools.execute(name="view")
+    await tools.execute(name="view")
+    await tools.execute(name="navigate", cache=cache)
+    await tools.execute(name="navigate", cache=cache)
+
+    assert view.calls == 2
+    assert len(cache) == 0
+
+
+class EditorTool(BaseTool):
+    """Shows a file in the editor, like file_read."""
+
+    name: str = "show"
+    description: str = "Shows a file"
+    read_only: bool = True
+    cacheable: bool = True
+    resource: str = "files"
+    calls: int = 0
+
+    async def execute(self, path: str) -> str:
+        self.calls += 1
+        if self.callback_handler:
+            await self.callback_handler("code_editor", content="text", path=path)
+        return f"{path} #{self.calls}"
+
+
+@pytest.mark.asyncio
+async def test_cache_hits_replay_ui_events():
+    """Tests that a cached call sends its editor event again without running the tool."""
+    sent = []
+
+    async def handler(event_type, **kwargs):
+        sent.append((event_type, kwargs))
+
+    tool = EditorTool(callback_handler=handler)
+    tools = ToolCollection(tool)
+    cache = ToolResultCache()
+
+    first = await tools.execute(name="show", tool_input={"path": "/a"}, cache=cache)
+    second = await tools.execute(name="show", tool_input={"path": "/a"}, cache=cache)
+    await tools.execute(name="show", tool_input={"path": "/b"}, cache=cache)
+
+    assert tool.calls == 2
+    assert first.output == second.output == "/a #1"
+    expected = ("code_editor", {"content": "text", "path": "/a"})
+    assert sent == [
+        expected,
+        expected,
+        ("code_editor", {"content": "text", "path": "/b"}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_reads_of_files_changed_outside_tools_are_not_reused(tmp_path):
+    """Tests that a log file written by a background process is read again."""
+    tools = ToolCollection(FileReadTool())
+    cache = ToolResultCache()
+    log = tmp_path / "log.txt"
+    log.write_text("step 1\n")
+
+    first = await tools.execute(
+        name="file_read", tool_input={"file": str(log)}, cache=cache
+    )
+    again = await tools.execute(
+        name="file_read", tool_input={"file": str(log)}, cache=cache
+    )
+    with open(log, "a") as f:  # no tool call is involved
+        f.write("step 2\n")
+    after = await tools.execute(
+        name="file_read", tool_input={"file": str(log)}, cache=cache
+    )
+
+    assert first.output == again.output
+    assert "step 2" in after.output
+    assert (cache.hits, cache.misses) == (1, 2)
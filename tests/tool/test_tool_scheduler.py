@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+
+from app.tool.base import BaseTool, ToolAccess, file_resource
+from app.tool.file_read import FileReadTool
+from app.tool.file_write import FileWriteTool
+from app.tool.scheduler import ToolCallScheduler
+from app.tool.shell_exec import ShellExecTool
+from app.tool.shell_view import ShellViewTool
+from app.tool.shell_wait import ShellWaitTool
+from app.tool.tool_collection import ToolCollection
+
+
+def access(*resources: str, read_only: bool = False) -> ToolAccess:
+    return ToolAccess(resources=frozenset(resources), read_only=read_only)
+
+
+class SlowTool(BaseTool):
+    name: str = "slow"
+    description: str = "Sleeps, then echoes its argument"
+    read_only: bool = True
+    resource: str = "web"
+
+    async def execute(self, value: str = "", delay: float = 0.2) -> str:
+        await asyncio.sleep(delay)
+        return value
+
+
+def test_conflicts():
+    """Tests that only overlapping resources with at least one writer conflict."""
+    assert not access("browser", read_only=True).conflicts_with(
+        access("browser", read_only=True)
+    )
+    assert access("browser").conflicts_with(access("browser", read_only=True))
+    assert not access("shell:a").conflicts_with(access("shell:b"))
+    assert access("shell").conflicts_with(access("shell:b"))
+    assert access("*").conflicts_with(access("web", read_only=True))
+
+
+def test_tool_access_from_arguments():
+    """Tests that file and shell tools derive their resources from their arguments."""
+    tools = ToolCollection(FileReadTool(), FileWriteTool(), ShellViewTool())
+    read = tools.access("file_read", {"file": "a.txt"})
+    write = tools.access("file_write", {"file": "a.txt", "content": ""})
+
+    assert read.resources == {file_resource("a.txt")}
+    assert read.read_only and not write.read_only
+    assert write.conflicts_with(read)
+    assert not write.conflicts_with(tools.access("file_write", {"file": "b.txt"}))
+    assert tools.access("shell_view", {"id": "s1"}).resources == {"shell:s1", "file"}
+    assert tools.access("missing").resources == {"*"}
+
+
+@pytest.mark.asyncio
+async def test_independent_calls_take_max_time():
+    """Tests that N slow independent calls take about the time of the slowest one."""
+    tools = ToolCollection(SlowTool())
+    scheduler = ToolCallScheduler(max_concurrency=4)
+    start = time.perf_counter()
+    for i in range(4):
+        args = {"value": str(i), "delay": 0.2 - i * 0.04}
+        scheduler.submit(
+            tools.access("slow", args),
+            lambda args=args: tools.execute(name="slow", tool_input=args),
+        )
+    results = await scheduler.gather()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.4
+    assert [r.output for r in results] == ["0", "1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_conflicting_calls_keep_order_and_limit_applies():
+    """Tests that conflicting calls run in submission order and concurrency is bounded."""
+    events = []
+    running = 0
+    peak = 0
+
+    def call(label: str, delay: float):
+        async def run():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            events.append(f"start {label}")
+            await asyncio.sleep(delay)
+            events.append(f"end {label}")
+            running -= 1
+            return label
+
+        return run
+
+    scheduler = ToolCallScheduler(max_concurrency=2)
+    scheduler.submit(access("file:/a"), call("write", 0.05))
+    scheduler.submit(access("file:/a", read_only=True), call("read", 0.01))
+    for i in range(3):
+        scheduler.submit(access("web", read_only=True), call(f"search{i}", 0.02))
+
+    assert await scheduler.gather() == [
+        "write",
+        "read",
+        "search0",
+        "search1",
+        "search2",
+    ]
+    assert events.index("end write") < events.index("start read")
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        (
+            ("file_write", {"file": "a.py", "content": "print(1)"}),
+            ("shell_exec", {"command": "python a.py"}),
+        ),
+        (
+            ("shell_wait", {"id": "s1", "seconds": 5}),
+            ("file_read", {"file": "out.txt"}),
+        ),
+    ],
+)
+async def test_shell_calls_are_ordered_with_file_calls(first, second):
+    """Tests that shell commands never overlap calls on the files they may touch."""
+    tools = ToolCollection(
+        FileReadTool(), FileWriteTool(), ShellExecTool(), ShellWaitTool()
+    )
+    events = []
+
+    def call(label: str, delay: float):
+        async def run():
+            events.append(f"start {label}")
+            await asyncio.sleep(delay)
+            events.append(f"end {label}")
+            return label
+
+        return run
+
+    assert tools.access(*first).conflicts_with(tools.access(*second))
+    scheduler = ToolCallScheduler(max_concurrency=4)
+    scheduler.submit(tools.access(*first), call("first", 0.05))
+    scheduler.submit(tools.access(*second), call("second", 0.01))
+
+    assert await scheduler.gather() == ["first", "second"]
+    assert events == ["start first", "end first", "start second", "end second"]
@@ -0,0 +1,186 @@
+import pytest
+
+from app.agent.toolcall import ToolCallAgent
+from app.config import ToolSelectionSettings, config
+from app.tool import Terminate, ToolCollection
+from app.tool.base import BaseTool
+from app.tool.selection import ToolSelector, tokenize
+from examples.benchmarks.fake_llm import (
+    FakeChatClient,
+    TrajectoryReplayer,
+    create_fake_llm,
+)
+
+
+def make_tool(tool_name: str, tool_description: str, **properties) -> BaseTool:
+    class Tool(BaseTool):
+        name: str = tool_name
+        description: str = tool_description
+        parameters: dict = {
+            "type": "object",
+            "properties": {
+                key: {"type": "string", "description": value}
+                for key, value in properties.items()
+            },
+        }
+
+        async def execute(self, **kwargs) -> str:
+            return f"{tool_name} done"
+
+    return Tool()
+
+
+def sample_tools():
+    return [
+        make_tool(
+            "file_read", "Read the content of a file", file="Absolute path of the file"
+        ),
+        make_tool(
+            "file_write",
+            "Write content to a file",
+            file="Absolute path",
+            content="Text",
+        ),
+        make_tool(
+            "shell_exec", "Run a command in a shell session", command="Shell command"
+        ),
+        make_tool("browser_navigate", "Open a web page in the browser", url="Page URL"),
+        make_tool("web_search", "Search the web for information", query="Search query"),
+        make_tool("python_execute", "Execute Python code", code="Python source"),
+    ]
+
+
+def test_tokenize_splits_snake_case_and_drops_stopwords():
+    assert tokenize("Use the browser_navigate tool") == ["browser", "navigate", "tool"]
+
+
+def test_selector_ranks_relevant_tools_first():
+    """Tests that the best matching tools are kept, in collection order."""
+    selector = ToolSelector(sample_tools())
+
+    selected = selector.select("Open the docs page in the browser", top_k=1)
+    assert selected == ["browser_navigate"]
+
+    selected = selector.select("read the file then run a shell command", top_k=2)
+    assert set(selected) == {"file_read", "shell_exec"}
+    assert selected == ["file_read", "shell_exec"]
+
+
+def test_selector_keeps_always_tools_and_gives_up_without_matches():
+    selector = ToolSelector(sample_tools())
+
+    assert selector.select("xyzzy", top_k=3) is None
+    selected = selector.select(
+        "search the web", top_k=1, always=["python_execute", "missing"]
+    )
+    assert selected == ["web_search", "python_execute"]
+
+
+def test_collection_filters_params_and_schema_tokens():
+    """Tests that subsets reuse the cached schemas and per-tool token counts."""
+    calls = []
+
+    def count_tokens(text: str) -> int:
+        calls.append(text)
+        return len(text)
+
+    collection = ToolCollection(*sample_tools())
+    total = collection.count_schema_tokens(count_tokens)
+    subset = collection.count_schema_tokens(count_tokens, ["file_read", "web_search"])
+
+    params = collection.to_params(["web_search", "file_read"])
+    assert [p["function"]["name"] for p in params] == ["file_read", "web_search"]
+    assert subset == sum(len(str(p)) for p in params)
+    assert subset < total
+    assert len(calls) == len(collection.tools)
+
+
+def fake_client(replies) -> FakeChatClient:
+    client = FakeChatClient(TrajectoryReplayer.from_dict({"replies": replies}))
+    client.latency.base = 0.0
+    return client
+
+
+def record_tools(client: FakeChatClient):
+    """Names of the tools sent with each tool request of a fake client."""
+    sent = []
+    create = client.create
+
+    async def recording_create(**params):
+        if params.get("tools"):
+            sent.append([tool["function"]["name"] for tool in params["tools"]])
+        return await create(**params)
+
+    client.create = recording_create
+    return sent
+
+
+@pytest.fixture
+def tool_selection(monkeypatch):
+    settings = ToolSelectionSettings(enabled=True, top_k=2, min_tools=3)
+    monkeypatch.setattr(config._config, "tool_selection_config", settings)
+    return settings
+
+
+@pytest.mark.asyncio
+async def test_agent_sends_selected_tools_and_recovers_from_unsent_calls(
+    tool_selection,
+):
+    """Tests that a call to an unsent tool still runs and the next step gets every tool."""
+    client = fake_client(
+        [
+            {
+                "content": "Search the web for the release notes.",
+                "tool_calls": [{"name": "python_execute", "arguments": {"code": "1"}}],
+            },
+            {
+                "content": "Search the web again.",
+                "tool_calls": [{"name": "web_search", "arguments": {"query": "notes"}}],
+            },
+            {
+                "content": "The web search found them.",
+                "tool_calls": [
+                    {"name": "terminate", "arguments": {"status": "success"}}
+                ],
+            },
+        ]
+    )
+    sent = record_tools(client)
+    agent = ToolCallAgent(
+        llm=create_fake_llm("test-tool-selection", client),
+        available_tools=ToolCollection(*sample_tools(), Terminate()),
+        max_steps=4,
+    )
+
+    await agent.run("find the release notes")
+
+    assert "web_search" in sent[0] and "terminate" in sent[0]
+    assert "python_execute" not in sent[0]
+    assert len(sent[0]) < len(agent.available_tools.tools)
+    assert any("python_execute done" in (m.content or "") for m in agent.messages)
+    assert len(sent[1]) == len(agent.available_tools.tools)
+    assert len(sent[2]) < len(agent.available_tools.tools)
+
+
+@pytest.mark.asyncio
+async def test_small_collections_are_sent_whole(tool_selection):
+    client = fake_client(
+        [
+            {
+                "content": "Done.",
+                "tool_calls": [
+                    {"name": "terminate", "arguments": {"status": "success"}}
+                ],
+            }
+        ]
+    )
+    sent = record_tools(client)
+    agent = ToolCallAgent(
+        llm=create_fake_llm("test-tool-selection-small", client),
+        available_tools=ToolCollection(*sample_tools()[:2], Terminate()),
+        max_steps=2,
+    )
+
+    await agent.run("finish")
+
+    assert sent == [["file_read", "file_write", "terminate"]]
@@ -1,11 +1,14 @@
 # web_app.py
 
 import asyncio
+import json
+import math
 import os
 import sys  # <-- Aggiunto import mancante
+import uuid
 from pathlib import Path
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,8 +16,17 @@ import uvicorn
 
 # Import specifici del tuo progetto
 from app.agent.manus import Manus
+from app.agent.session_pool import AgentSessionPool, WarmAgentPool
+from app.event_channel import EventChannel
+from app import metrics
+from app.llm import SharedHTTPClients
+from app.tool.prefetch import page_prefetcher
+from app.llm_scheduler import RequestPriority, request_priority
+from app.task_queue import AgentTaskQueue, TaskQueueFull
+from app.tool.shell_manager import shell_manager, shell_owner
+from app.token_ledger import token_ledger, usage_scope
 from app.logger import logger, define_log_level
-from app.config import WORKSPACE_ROOT
+from app.config import WORKSPACE_ROOT, config
 
 # --- INIZIO BLOCCO DI CORREZIONE PER WINDOWS ---
 # Risolve un problema di compatibilità di asyncio/Playwright su Windows.
@@ -41,58 +53,110 @@ app.add_middleware(
 
 # --- 2. Gestione delle Connessioni WebSocket ---
 class ConnectionManager:
-    """Gestisce le connessioni WebSocket attive."""
+    """
+    Gestisce le connessioni WebSocket attive.
+
+    Ogni connessione ha una coda in uscita svuotata da un task dedicato (vedi
+    `EventChannel`): inviare un evento non attende mai il client, quindi un browser
+    lento non rallenta l'agente.
+    """
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, EventChannel] = {}
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def connect(self, websocket: WebSocket, session_id: str) -> EventChannel:
         await websocket.accept()
-        self.active_connections[session_id] = websocket
+        previous = self.active_connections.get(session_id)
+        channel = EventChannel(
+            websocket.send_text,
+            lambda code: websocket.close(code=code),
+            on_closed=lambda closed: self._forget(session_id, closed),
+        )
+        self.active_connections[session_id] = channel
+        channel.start()
+        if previous is not None:
+            # Una nuova scheda della stessa sessione sostituisce la precedente
+            await previous.close()
         logger.info(f"WebSocket connection established for session: {session_id}")
+        return channel
 
-    def disconnect(self, session_id: str):
-        if session_id in self.active_connections:
+    def _forget(self, session_id: str, channel: EventChannel):
+        if self.active_connections.get(session_id) is channel:
             del self.active_connections[session_id]
             logger.info(f"WebSocket connection closed for session: {session_id}")
 
     async def send_json(self, session_id: str, data: Dict[str, Any]):
-        """Invia dati JSON a un client specifico."""
-        if session_id in self.active_connections:
-            try:
-                await self.active_connections[session_id].send_json(data)
-            except Exception as e:
-                logger.warning(f"Could not send message to disconnected session {session_id}: {e}")
-                self.disconnect(session_id)
+        """Accoda dati JSON per un client specifico, senza attendere l'invio."""
+        channel = self.active_connections.get(session_id)
+        if channel is not None:
+            channel.publish(data)
 
 
 manager = ConnectionManager()
 
 # --- 3. Gestione delle Sessioni Agente ---
 class AgentSessionManager:
-    """Gestisce le istanze degli agenti per ogni sessione."""
+    """
+    Gestisce le istanze degli agenti per ogni sessione.
+
+    Le istanze sono tenute in un pool limitato (vedi `[session_pool]`): le sessioni
+    meno usate o inattive vengono rimosse e ricreate, con la loro cronologia,
+    alla richiesta successiva.
+    """
     def __init__(self):
-        self.sessions: Dict[str, Manus] = {}
-        self.locks: Dict[str, asyncio.Lock] = {}
+        # Agenti già pronti (strumenti caricati, server MCP connessi) per le nuove sessioni
+        self.warm_agents = WarmAgentPool(Manus.create, config.session_pool_config.warm_agents)
+        self.pool = AgentSessionPool(self._create_agent)
+
+    def _create_agent(self, session_id: str) -> Manus:
+        async def send_to_frontend(message_type: str, content: any = None, **kwargs):
+            payload = {"type": message_type, "content": content, **kwargs}
+            await manager.send_json(session_id, payload)
+
+        agent = self.warm_agents.take()
+        if agent is None:
+            return Manus(callback_handler=send_to_frontend)
+        agent.bind_callback_handler(send_to_frontend)
+        return agent
 
     async def get_agent(self, session_id: str) -> Manus:
         """Ottiene o crea un'istanza dell'agente per una data sessione."""
-        if session_id not in self.locks:
-            self.locks[session_id] = asyncio.Lock()
+        return await self.pool.get(session_id)
 
-        async with self.locks[session_id]:
-            if session_id not in self.sessions:
-                logger.info(f"Creating new agent for session: {session_id}")
+    def use_agent(self, session_id: str):
+        """Come `get_agent`, ma la sessione non può essere rimossa finché è in uso."""
+        return self.pool.lease(session_id)
 
-                async def send_to_frontend(message_type: str, content: any, **kwargs):
-                    payload = {"type": message_type, "content": content, **kwargs}
-                    await manager.send_json(session_id, payload)
-                    print(f"Sent to frontend ({session_id}): {payload}")
+agent_manager = AgentSessionManager()
 
-                agent = Manus(callback_handler=send_to_frontend)
-                self.sessions[session_id] = agent
-            return self.sessions[session_id]
+# Esecuzioni degli agenti: in ordine per sessione, con un limite globale
+task_queue = AgentTaskQueue()
 
-agent_manager = AgentSessionManager()
+# Letti solo quando /metrics viene interrogato
+metrics.ACTIVE_SESSIONS.set_function(lambda: len(agent_manager.pool))
+metrics.SESSION_MEMORY_BYTES.set_function(agent_manager.pool.memory_bytes)
+metrics.WARM_AGENTS.set_function(lambda: len(agent_manager.warm_agents))
+metrics.WEBSOCKET_CONNECTIONS.set_function(lambda: len(manager.active_connections))
+
+_background_tasks: List[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def start_monitoring():
+    """Avvia la misura del ritardo dell'event loop, la rimozione delle sessioni inattive e il pre-riscaldamento degli agenti."""
+    _background_tasks.append(asyncio.create_task(metrics.monitor_event_loop_lag()))
+    _background_tasks.append(asyncio.create_task(agent_manager.pool.run_reaper()))
+    agent_manager.warm_agents.refill()
+
+
+@app.on_event("shutdown")
+async def close_llm_connections():
+    """Chiude le sessioni agente, i pool di connessioni HTTP condivisi dai client LLM e il prefetch delle ricerche."""
+    for task in _background_tasks:
+        task.cancel()
+    await agent_manager.warm_agents.close()
+    await agent_manager.pool.close()
+    await SharedHTTPClients.aclose()
+    await page_prefetcher.aclose()
 
 
 # --- 4. Modelli di Dati per le Richieste API ---
@@ -107,15 +171,34 @@ async def read_root():
     """Endpoint di benvenuto per l'API."""
     return {"message": "Bravo AI Agent Backend is running."}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Metriche operative in formato Prometheus."""
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     """Endpoint per la comunicazione in tempo reale."""
-    await manager.connect(websocket, session_id)
+    channel = await manager.connect(websocket, session_id)
     try:
         while True:
-            await websocket.receive_text()
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            # Il client può annullare il task in corso (e quelli in coda) con {"type": "cancel"}
+            if isinstance(message, dict) and message.get("type") == "cancel":
+                task_queue.cancel(session_id)
+            # ...e chiedere di nuovo lo stato completo di editor/terminale/piano se perde un delta
+            elif isinstance(message, dict) and message.get("type") == "resync":
+                channel.resync(message.get("stream"))
     except WebSocketDisconnect:
-        manager.disconnect(session_id)
+        pass
+    finally:
+        # Chiude solo questa connessione, non quella di un'altra scheda della sessione
+        await channel.close()
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
@@ -123,16 +206,51 @@ async def chat_endpoint(request: ChatRequest):
     session_id = request.session_id
     prompt = request.prompt
 
-    await manager.send_json(session_id, {"type": "user_message", "content": prompt})
-    asyncio.create_task(run_agent_task(session_id, prompt))
+    # Interactive sessions are served ahead of background flows by the LLM scheduler
+    with request_priority(RequestPriority.INTERACTIVE):
+        try:
+            ahead = task_queue.submit(session_id, lambda: run_agent_task(session_id, prompt))
+        except TaskQueueFull as e:
+            # Rifiutata: il prompt non viene mostrato in chat perché non verrà eseguito
+            return _queue_full_response(e.retry_after)
 
-    return {"status": "Agent task started. Results will be streamed via WebSocket."}
+    # Il task parte solo al prossimo await: l'eco precede comunque i suoi eventi
+    await manager.send_json(session_id, {"type": "user_message", "content": prompt})
+    if ahead:
+        return {"status": "Agent task queued behind the session's previous tasks.", "position": ahead}
+    return {"status": "Agent task started. Results will be streamed via WebSocket.", "position": 0}
+
+def _queue_full_response(retry_after: float) -> JSONResponse:
+    """Risposta 429 con l'attesa consigliata prima di riprovare."""
+    seconds = max(1, math.ceil(retry_after))
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(seconds)},
+        content={"error": "Too many agent tasks, retry later.", "retry_after": seconds},
+    )
+
+@app.post("/api/sessions/{session_id}/cancel")
+async def cancel_session_task(session_id: str):
+    """Annulla il task in corso della sessione e quelli in coda."""
+    cancelled, dropped = task_queue.cancel(session_id)
+    return {"cancelled": cancelled, "dropped": dropped}
 
 async def run_agent_task(session_id: str, prompt: str):
     """Task asincrona per eseguire l'agente e inviare i risultati."""
+    # I processi avviati dagli strumenti appartengono a questa esecuzione: annullarla
+    # non deve terminare quelli (es. server) avviati dai prompt precedenti
+    run_id = f"{session_id}:{uuid.uuid4().hex[:12]}"
+    shell_owner.set(run_id)
     try:
-        agent = await agent_manager.get_agent(session_id)
-        response = await agent.run(prompt)
+        # I token sono conteggiati (e limitati) per sessione. Il conteggio è aperto solo
+        # per le esecuzioni ammesse e vive quanto la sessione nel pool (vedi AgentSessionPool)
+        async with agent_manager.use_agent(session_id) as agent:
+            with usage_scope(session_id=session_id):
+                try:
+                    response = await agent.run(prompt)
+                except asyncio.CancelledError:
+                    agent.close_pending_tool_calls("Error: The task was cancelled by the user.")
+                    raise
         await manager.send_json(session_id, {
             "type": "agent_response",
             "content": response
@@ -141,6 +259,14 @@ async def run_agent_task(session_id: str, prompt: str):
             "type": "task_complete",
             "content": "Task completato."
         })
+    except asyncio.CancelledError:
+        killed = shell_manager.kill_sessions(run_id)
+        logger.info(f"Agent task of session {session_id} cancelled, {killed} processes killed")
+        await manager.send_json(session_id, {
+            "type": "task_cancelled",
+            "content": "Task annullato."
+        })
+        raise
     except Exception as e:
         logger.error(f"Error during agent execution for session {session_id}: {e}", exc_info=True)
         await manager.send_json(session_id, {
@@ -148,6 +274,23 @@ async def run_agent_task(session_id: str, prompt: str):
             "content": f"An error occurred: {str(e)}"
         })
 
+@app.get("/api/sessions")
+async def sessions_stats():
+    """Stato del pool delle sessioni (occupazione, rimozioni, memoria) e della coda dei task."""
+    return {
+        **agent_manager.pool.get_stats(),
+        "warm": agent_manager.warm_agents.get_stats(),
+        "tasks": task_queue.get_stats(),
+    }
+
+@app.get("/api/sessions/{session_id}/usage")
+async def session_usage(session_id: str):
+    """Token consumati dalla sessione, in totale, per agente e per configurazione LLM."""
+    usage = token_ledger.get(session_id)
+    if usage is None:
+        return {"error": "Session not found."}
+    return usage.to_dict()
+
 @app.get("/api/workspace/files")
 async def list_workspace_files():
     """Restituisce la struttura ad albero della cartella workspace."""
@@ -188,7 +331,13 @@ async def read_workspace_file(file_path: str):
 # Comando per avviare: uvicorn web_app:app --reload
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("web_app:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run(
+        "web_app:app",
+        host="0.0.0.0",
+        port=port,
+        reload=True,
+        ws_per_message_deflate=config.websocket_config.per_message_deflate,
+    )
 
 
 